@@ -4,18 +4,22 @@
 # the WPILib BSD license file in the root directory of this project.
 #
 
+from typing import TYPE_CHECKING, Optional
+
 import commands2
 from commands2 import cmd
 from commands2.button import CommandXboxController, Trigger
 from commands2.sysid import SysIdRoutine
 
-from utils import TunerConstants, Telemetry
+from utils import ModuleHealthMonitor, TunerConstants, Telemetry, deferred_command
 
 from phoenix6 import swerve
-from wpilib import DriverStation
+from wpilib import DriverStation, SmartDashboard
 from wpimath.geometry import Rotation2d
 from wpimath.units import rotationsToRadians
-from subsystems import Vision
+
+if TYPE_CHECKING:
+    from subsystems import Vision
 
 
 class RobotContainer:
@@ -48,12 +52,13 @@ class RobotContainer:
         self._brake = swerve.requests.SwerveDriveBrake()
         self._point = swerve.requests.PointWheelsAt()
 
-        self._logger = Telemetry(self._max_speed)
-
         self._joystick = CommandXboxController(0)
 
         self.drivetrain = TunerConstants.create_drivetrain()
-        self.visionSub = Vision(drive_sub=self.drivetrain)
+        self.module_health = ModuleHealthMonitor(self.drivetrain.module_locations)
+        self._logger = Telemetry(self._max_speed, module_health=self.module_health)
+        # Built by create_vision() after robotInit; driving does not need it
+        self.visionSub: Optional["Vision"] = None
 
         # Configure the button bindings
         self.configureButtonBindings()
@@ -69,8 +74,9 @@ class RobotContainer:
         # and Y is defined as to the left according to WPILib convention.
         self.drivetrain.setDefaultCommand(
             # Drivetrain will execute this command periodically
+            # with traction control limiting wheel slip on every control update
             self.drivetrain.apply_request(
-                lambda: (
+                lambda: self.drivetrain.traction_control.with_request(
                     self._drive.with_velocity_x(
                         -self._joystick.getLeftY() * self._max_speed
                     )  # Drive forward with negative Y (forward)
@@ -121,10 +127,33 @@ class RobotContainer:
                 self.drivetrain.runOnce(self.drivetrain.seed_field_centric)
             )
 
-        self.drivetrain.register_telemetry(
-            lambda state: self._logger.telemeterize(state)
+        # Run every drivetrain SysId routine back-to-back from the dashboard,
+        # including in simulation; fit the log with tools/sysid_fit.py
+        SmartDashboard.putData(
+            "Drivetrain Characterization",
+            deferred_command(
+                "SysIdCharacterization",
+                self.drivetrain.sys_id_characterization,
+                self.drivetrain,
+            ),
         )
 
+        def on_drive_state(state: swerve.SwerveDrivetrain.SwerveDriveState):
+            self._logger.telemeterize(state)
+            self.drivetrain.collision_detector.record(state)
+
+        self.drivetrain.register_telemetry(on_drive_state)
+
+    def create_vision(self) -> None:
+        """
+        Construct the vision subsystem. Importing it loads photonlibpy, and in
+        simulation the camera simulation as well, so this is deferred until
+        after robotInit.
+        """
+        from subsystems import Vision
+
+        self.visionSub = Vision(drive_sub=self.drivetrain)
+
     def getAutonomousCommand(self) -> commands2.Command:
         """
         Use this to pass the autonomous command to the main {@link Robot} class.
@@ -1,16 +1,22 @@
 """
 Physics simulation for the robot.
 
-This module provides physics simulation for the shooter flywheel using
-WPILib's DCMotorSim. The simulation takes motor voltage output from
-the TalonFX and calculates the resulting velocity, which is fed back
+This module provides physics simulation for the intake and spindex using
+WPILib's FlywheelSim and DCMotorSim. The simulation takes motor voltage output
+from the TalonFX and calculates the resulting velocity, which is fed back
 to the motor controller's sim state.
+
+All simulated TalonFXs share one battery model: their supply currents are summed
+each step to compute the loaded battery voltage, which is fed back to every
+device on the next step.
 """
 
+import ntcore
 from pyfrc.physics.core import PhysicsInterface
 from phoenix6 import unmanaged
 from phoenix6.hardware import TalonFX
-from wpilib.simulation import FlywheelSim
+from phoenix6.sim import TalonFXSimState
+from wpilib.simulation import BatterySim, DCMotorSim, FlywheelSim, RoboRioSim
 from wpimath.system.plant import DCMotor, LinearSystemId
 from wpimath.units import radiansToRotations
 from typing import TYPE_CHECKING
@@ -19,6 +25,78 @@ if TYPE_CHECKING:
     from robot import Robot
 
 
+class BatteryModel:
+    """Loaded battery voltage from the total current drawn by all simulated motors"""
+
+    NOMINAL_VOLTAGE = 12.5  # V, freshly charged battery
+    RESISTANCE = 0.020  # ohms, battery plus main breaker and wiring
+    BASE_CURRENT = 2.0  # A, roboRIO, radio and other electronics
+
+    def __init__(self, sim_states: list[TalonFXSimState]):
+        self.sim_states = sim_states
+        self.voltage = self.NOMINAL_VOLTAGE
+        self.total_current = 0.0
+        self.min_voltage = self.NOMINAL_VOLTAGE
+
+        table = ntcore.NetworkTableInstance.getDefault().getTable("BatterySim")
+        self._voltage_pub = table.getDoubleTopic("Voltage").publish()
+        self._current_pub = table.getDoubleTopic("TotalCurrent").publish()
+        self._min_voltage_pub = table.getDoubleTopic("MinVoltage").publish()
+        self._browned_out_pub = table.getBooleanTopic("BrownedOut").publish()
+
+    def update(self) -> float:
+        """
+        Compute the battery voltage from the currents of the last step and make
+        it visible to RobotController.getBatteryVoltage().
+
+        :returns: The loaded battery voltage
+        """
+        currents = [abs(state.supply_current) for state in self.sim_states]
+        currents.append(self.BASE_CURRENT)
+        self.total_current = sum(currents)
+        self.voltage = BatterySim.calculate(
+            self.NOMINAL_VOLTAGE, self.RESISTANCE, currents
+        )
+        self.min_voltage = min(self.min_voltage, self.voltage)
+        RoboRioSim.setVInVoltage(self.voltage)
+
+        self._voltage_pub.set(self.voltage)
+        self._current_pub.set(self.total_current)
+        self._min_voltage_pub.set(self.min_voltage)
+        self._browned_out_pub.set(self.voltage < RoboRioSim.getBrownoutVoltage())
+
+        return self.voltage
+
+
+class PositionMechanismSim:
+    """A position-controlled mechanism (intake arm or head) driven by one Kraken X60"""
+
+    def __init__(self, motor: TalonFX, gearing: float, moi: float):
+        self.motor = motor
+        self.sim_state = motor.sim_state
+        self.gearing = gearing
+
+        self.motor_model = DCMotor.krakenX60(1)
+        self.mechanism_sim = DCMotorSim(
+            LinearSystemId.DCMotorSystem(self.motor_model, moi, gearing),
+            self.motor_model,
+        )
+
+    def update_sim(self, tm_diff: float, supply_voltage: float) -> None:
+        self.sim_state.set_supply_voltage(supply_voltage)
+
+        self.mechanism_sim.setInputVoltage(self.sim_state.motor_voltage)
+        self.mechanism_sim.update(tm_diff)
+
+        # The Talon sees rotor rotations, the sim tracks the mechanism output
+        self.sim_state.set_raw_rotor_position(
+            self.mechanism_sim.getAngularPositionRotations() * self.gearing
+        )
+        self.sim_state.set_rotor_velocity(
+            radiansToRotations(self.mechanism_sim.getAngularVelocity()) * self.gearing
+        )
+
+
 class IntakeSim:
     def __init__(self, physics_controller: PhysicsInterface, robot: "Robot"):
         # Get the shooter motor from the robot
@@ -58,10 +136,29 @@ class IntakeSim:
         self.roller_top_sim = self.motor_roller_top.sim_state
         self.roller_bottom_sim = self.motor_roller_bottom.sim_state
 
-    def update_sim(self, now: float, tm_diff: float) -> None:
+        # Arm and head: gearing and inertia are estimates until the mechanism is built
+        self.arm_sim = PositionMechanismSim(
+            robot.intakeSubsystem.motor_arm, gearing=25.0, moi=0.15
+        )
+        self.head_sim = PositionMechanismSim(
+            robot.intakeSubsystem.motor_head, gearing=15.0, moi=0.05
+        )
+
+    def sim_states(self) -> list[TalonFXSimState]:
+        return [
+            self.roller_top_sim,
+            self.roller_bottom_sim,
+            self.arm_sim.sim_state,
+            self.head_sim.sim_state,
+        ]
+
+    def update_sim(self, now: float, tm_diff: float, supply_voltage: float) -> None:
         # Set supply voltage (battery voltage)
-        self.roller_top_sim.set_supply_voltage(12.0)
-        self.roller_bottom_sim.set_supply_voltage(12.0)
+        self.roller_top_sim.set_supply_voltage(supply_voltage)
+        self.roller_bottom_sim.set_supply_voltage(supply_voltage)
+
+        self.arm_sim.update_sim(tm_diff, supply_voltage)
+        self.head_sim.update_sim(tm_diff, supply_voltage)
 
         # Get the voltage being applied to the motor
         motor_voltage_top = self.motor_roller_top.sim_state.motor_voltage
@@ -97,11 +194,55 @@ class IntakeSim:
         self.motor_roller_bottom.sim_state.set_rotor_velocity(velocity_rps_bottom)
 
 
+class SpindexSim:
+    def __init__(self, physics_controller: PhysicsInterface, robot: "Robot"):
+        self.motor_spindex: TalonFX = robot.spindexSubsystem.motor_spindex
+        self.spindex_sim = self.motor_spindex.sim_state
+
+        # Spindex plate modelled as a flywheel; gearing and inertia are estimates
+        self.gearing = 10.0
+        self.moi = 0.05  # kg*m^2
+        self.motor_model = DCMotor.krakenX60(1)
+        self.flywheel_sim = FlywheelSim(
+            LinearSystemId.flywheelSystem(self.motor_model, self.moi, self.gearing),
+            self.motor_model,
+        )
+        self.position_rot = 0.0
+
+    def sim_states(self) -> list[TalonFXSimState]:
+        return [self.spindex_sim]
+
+    def update_sim(self, now: float, tm_diff: float, supply_voltage: float) -> None:
+        self.spindex_sim.set_supply_voltage(supply_voltage)
+
+        self.flywheel_sim.setInputVoltage(self.spindex_sim.motor_voltage)
+        self.flywheel_sim.update(tm_diff)
+
+        velocity_rps = (
+            radiansToRotations(self.flywheel_sim.getAngularVelocity()) * self.gearing
+        )
+        self.position_rot += velocity_rps * tm_diff
+        self.spindex_sim.set_raw_rotor_position(self.position_rot)
+        self.spindex_sim.set_rotor_velocity(velocity_rps)
+
+
 class PhysicsEngine:
     def __init__(self, physics_controller: PhysicsInterface, robot: "Robot"):
         self.physics_controller = physics_controller
 
+        self.drivetrain = robot.container.drivetrain
         self.intake_sim = IntakeSim(physics_controller, robot)
+        self.spindex_sim = SpindexSim(physics_controller, robot)
+
+        swerve_sim_states = []
+        for module in self.drivetrain.modules:
+            swerve_sim_states.append(module.drive_motor.sim_state)
+            swerve_sim_states.append(module.steer_motor.sim_state)
+        self.battery = BatteryModel(
+            swerve_sim_states
+            + self.intake_sim.sim_states()
+            + self.spindex_sim.sim_states()
+        )
 
     def update_sim(self, now: float, tm_diff: float) -> None:
         """
@@ -113,4 +254,10 @@ class PhysicsEngine:
         # Feed the Phoenix6 simulation - required for motor controllers to work
         unmanaged.feed_enable(100)  # Keep motors enabled for 100ms
 
-        self.intake_sim.update_sim(now, tm_diff)
+        # Battery sag from last step's total current draw applies to every motor
+        battery_voltage = self.battery.update()
+
+        # Swerve runs in lock-step with the physics tick (5 x 4 ms sub-steps)
+        self.drivetrain.step_sim(tm_diff, battery_voltage)
+        self.intake_sim.update_sim(now, tm_diff, battery_voltage)
+        self.spindex_sim.update_sim(now, tm_diff, battery_voltage)
@@ -5,14 +5,37 @@
 # the WPILib BSD license file in the root directory of this project.
 #
 
+import sys
+import time
+
+# Timed here so the startup report includes the imports below
+_import_start = time.perf_counter()
+_modules_before_import = set(sys.modules)
+
 import wpilib
+from wpilib import SmartDashboard
 import commands2
 import typing
 
 from core import Controller
-from subsystems import Intake, Spindex
+from subsystems import Intake, PowerManager, Spindex
 from core import RobotContainer
 from phoenix6 import HootAutoReplay
+from utils import (
+    AllocationConstants,
+    AllocationTracker,
+    DeferredInitializer,
+    MechanismVisualizationConstants,
+    MechanismVisualizer,
+    ManualGarbageCollector,
+    PowerConstants,
+    StartupProfiler,
+    StructuredLogger,
+    TunableRegistry,
+    deferred_command,
+)
+
+_import_seconds = time.perf_counter() - _import_start
 
 
 class Robot(commands2.TimedCommandRobot):
@@ -22,6 +45,7 @@ class Robot(commands2.TimedCommandRobot):
     """
 
     autonomousCommand: typing.Optional[commands2.Command] = None
+    allocationTracker: typing.Optional[AllocationTracker] = None
 
     def robotInit(self) -> None:
         """Robot initialization function"""
@@ -30,12 +54,49 @@ class Robot(commands2.TimedCommandRobot):
         initialization code.
         """
 
+        self.startup = StartupProfiler()
+        self.startup.record(
+            "Imports",
+            _import_seconds,
+            [module for module in sys.modules if module not in _modules_before_import],
+        )
+
+        # Loads the values tuned at the last event before any subsystem reads them
+        with self.startup.phase("Tunables"):
+            self.tunables = TunableRegistry.get_default()
+
+        with self.startup.phase("StructuredLogger"):
+            self.structuredLog = StructuredLogger.get_default()
+
         # Instantiate our RobotContainer.  This will perform all our button bindings, and put our
         # autonomous chooser on the dashboard.
-        self.container = RobotContainer()
-        self.intakeSubsystem = Intake()
-        self.spindexSubsystem = Spindex()
-        self.controller = Controller(self.intakeSubsystem, self.spindexSubsystem)
+        with self.startup.phase("RobotContainer"):
+            self.container = RobotContainer()
+        with self.startup.phase("Intake"):
+            self.intakeSubsystem = Intake()
+        with self.startup.phase("Spindex"):
+            self.spindexSubsystem = Spindex()
+        with self.startup.phase("Controller"):
+            self.controller = Controller(self.intakeSubsystem, self.spindexSubsystem)
+        with self.startup.phase("PowerManager"):
+            self.powerManager = self.create_power_manager()
+
+        SmartDashboard.putData(
+            "Intake Characterization",
+            deferred_command(
+                "IntakeCharacterization",
+                self.intakeSubsystem.sys_id_characterization,
+                self.intakeSubsystem,
+            ),
+        )
+        SmartDashboard.putData(
+            "Spindex Characterization",
+            deferred_command(
+                "SpindexCharacterization",
+                self.spindexSubsystem.sys_id_characterization,
+                self.spindexSubsystem,
+            ),
+        )
         self.scheduler = commands2.CommandScheduler.getInstance()
 
         # log and replay timestamp and joystick data
@@ -43,6 +104,71 @@ class Robot(commands2.TimedCommandRobot):
             HootAutoReplay().with_timestamp_replay().with_joystick_replay()
         )
 
+        # Not needed to drive, so built one per loop once the robot is running
+        self.deferredInit = DeferredInitializer(self.startup)
+        self.deferredInit.defer("Vision", self.container.create_vision)
+        self.deferredInit.defer("MechanismVisualizer", self.create_mechanism_visualizer)
+
+        self.garbageCollector = ManualGarbageCollector()
+        if AllocationConstants.TRACK_ALLOCATIONS:
+            # Started last, so every deferred subsystem is tracked too
+            self.allocationTracker = AllocationTracker(self.scheduler)
+            self.deferredInit.defer("AllocationTracker", self.allocationTracker.start)
+
+    def create_mechanism_visualizer(self) -> None:
+        """Build the mechanism visualizer and publish it on its own period"""
+        self.mechanismVisualizer = MechanismVisualizer(
+            self.intakeSubsystem.motor_arm,
+            self.intakeSubsystem.motor_head,
+            self.spindexSubsystem.motor_spindex,
+        )
+        # Mechanism visualization publishes on its own period, off the main loop's rate
+        self.addPeriodic(
+            self.mechanismVisualizer.update,
+            MechanismVisualizationConstants.PUBLISH_PERIOD_SECONDS,
+        )
+
+    def create_power_manager(self) -> PowerManager:
+        """
+        Register every motor with the power manager, highest priority first:
+        the drivetrain, then the intake, then the spindex
+        """
+        power_manager = PowerManager()
+        intake = self.intakeSubsystem
+
+        # The drivetrain is counted toward the budget but always keeps full current
+        drivetrain = self.container.drivetrain
+        for i, module in enumerate(drivetrain.modules):
+            power_manager.register(
+                f"Module{i}", [module.drive_motor, module.steer_motor]
+            )
+
+        power_manager.register(
+            "Arm",
+            [intake.motor_arm],
+            intake.arm_current_limit,
+            PowerConstants.MIN_STATOR_LIMIT,
+        )
+        power_manager.register(
+            "Head",
+            [intake.motor_head],
+            intake.head_current_limit,
+            PowerConstants.MIN_STATOR_LIMIT,
+        )
+        power_manager.register(
+            "Rollers",
+            [intake.motor_roller_top, intake.motor_roller_bottom],
+            intake.roller_current_limit,
+            PowerConstants.MIN_STATOR_LIMIT,
+        )
+        power_manager.register(
+            "Spindex",
+            [self.spindexSubsystem.motor_spindex],
+            self.spindexSubsystem.current_limit,
+            PowerConstants.MIN_STATOR_LIMIT,
+        )
+        return power_manager
+
     def robotPeriodic(self) -> None:
         """This function is called every 20 ms, no matter the mode. Use this for items like diagnostics
         that you want ran during disabled, autonomous, teleoperated and test.
@@ -51,22 +177,31 @@ class Robot(commands2.TimedCommandRobot):
         SmartDashboard integrated updating."""
 
         self._time_and_joystick_replay.update()
-        # Runs the Scheduler.  This is responsible for polling buttons, adding newly-scheduled
-        # commands, running already-scheduled commands, removing finished or interrupted commands,
-        # and running subsystem periodic() methods.  This must be called from the robot's periodic
-        # block in order for anything in the Command-based framework to work.
-        commands2.CommandScheduler.getInstance().run()
+        self.deferredInit.run_next()
+        self.tunables.update()
+        self.structuredLog.periodic()
+        self.garbageCollector.limit_pending()
+        if self.allocationTracker:
+            self.allocationTracker.end_loop()
+        # The Scheduler is run by TimedCommandRobot in its own periodic callback, 5 ms after
+        # this one. Running it here as well would execute every command and subsystem
+        # periodic() twice per loop, which also doubles up SysId samples.
 
     def disabledInit(self) -> None:
         """This function is called once each time the robot enters Disabled mode."""
-        pass
+        self.container.module_health.report()
+        if self.allocationTracker:
+            self.allocationTracker.report()
 
     def disabledPeriodic(self) -> None:
         """This function is called periodically when disabled"""
-        pass
+        self.garbageCollector.collect_idle()
+        self.tunables.save()
 
     def autonomousInit(self) -> None:
         """This autonomous runs the autonomous command selected by your RobotContainer class."""
+        # After a restart mid-match the robot may be enabled before the queue drains
+        self.deferredInit.run_all()
         self.autonomousCommand = self.container.getAutonomousCommand()
 
         if self.autonomousCommand:
@@ -81,6 +216,7 @@ class Robot(commands2.TimedCommandRobot):
         # teleop starts running. If you want the autonomous to
         # continue until interrupted by another command, remove
         # this line or comment it out.
+        self.deferredInit.run_all()
         self.controller.setupTeleop()
         if self.autonomousCommand:
             commands2.CommandScheduler.getInstance().cancel(self.autonomousCommand)
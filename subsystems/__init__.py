@@ -1,7 +1,33 @@
-from .intake import Intake as Intake
-from .intake import IntakePositions as IntakePositions
-from .drivetrain import Drivetrain as Drivetrain
-from .vision import Vision as Vision
-from .spindex import Spindex as Spindex
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-# motor = TalonFX(0)
+# Subsystems are imported on first use, so importing one does not pull in the
+# dependencies of all the others (photonlibpy for vision in particular)
+_EXPORTS = {
+    "Intake": ".intake",
+    "IntakePositions": ".intake",
+    "Drivetrain": ".drivetrain",
+    "Vision": ".vision",
+    "Spindex": ".spindex",
+    "PowerManager": ".power_manager",
+}
+
+if TYPE_CHECKING:
+    from .intake import Intake as Intake
+    from .intake import IntakePositions as IntakePositions
+    from .drivetrain import Drivetrain as Drivetrain
+    from .vision import Vision as Vision
+    from .spindex import Spindex as Spindex
+    from .power_manager import PowerManager as PowerManager
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
@@ -1,13 +1,22 @@
-from commands2 import Command, Subsystem
+from commands2 import Command, Subsystem, cmd
 from commands2.sysid import SysIdRoutine
 import math
-from phoenix6 import SignalLogger, swerve, units, utils
+from ntcore import NetworkTableInstance
+from phoenix6 import BaseStatusSignal, SignalLogger, swerve, units, utils
 from typing import Callable, overload
-from wpilib import DriverStation, Notifier, RobotController
-from wpilib.sysid import SysIdRoutineLog
+from wpilib import DataLogManager, DriverStation, RobotBase, reportWarning
+from wpilib.sysid import State, SysIdRoutineLog
 from wpimath.geometry import Pose2d, Rotation2d
 
-from utils import TunerSwerveDrivetrain
+from utils import (
+    CollisionDetector,
+    DriveConstants,
+    DrivetrainProfile,
+    PoseQualityMonitor,
+    TractionControl,
+    TunerSwerveDrivetrain,
+    sys_id_tests,
+)
 
 
 class Drivetrain(Subsystem, TunerSwerveDrivetrain):
@@ -20,6 +29,7 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
     """
 
     _SIM_LOOP_PERIOD: units.second = 0.004  # 4 ms
+    """Sub-step used by step_sim so PID gains behave more reasonably"""
 
     _BLUE_ALLIANCE_PERSPECTIVE_ROTATION = Rotation2d.fromDegrees(0)
     """Blue alliance sees forward as 0 degrees (toward red alliance wall)"""
@@ -133,12 +143,34 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
             self, drivetrain_constants, arg0, arg1, arg2, arg3
         )
 
-        self._sim_notifier: Notifier | None = None
-        self._last_sim_time: units.second = 0.0
-
         self._has_applied_operator_perspective = False
         """Keep track if we've ever applied the operator perspective before or not"""
 
+        self.pose_quality = PoseQualityMonitor(DriveConstants.POSE_QUALITY_WINDOW)
+        """Agreement between odometry and vision, for deciding when auto-align is safe"""
+        self._pose_quality_publish_counter = 0
+
+        self.profile: DrivetrainProfile | None = None
+        """Odometry rate and std devs this drivetrain was constructed with"""
+        self._odometry_rate_warned = False
+        odometry_table = NetworkTableInstance.getDefault().getTable("DriveState")
+        self._configured_odometry_frequency_pub = odometry_table.getDoubleTopic(
+            "ConfiguredOdometryFrequency"
+        ).publish()
+        self._measured_odometry_frequency_pub = odometry_table.getDoubleTopic(
+            "MeasuredOdometryFrequency"
+        ).publish()
+        self._profile_pub = odometry_table.getStringTopic("Profile").publish()
+
+        self.traction_control = TractionControl(self.pigeon2)
+        """Teleop drive request that keeps the wheels from spinning out"""
+
+        self.collision_detector = CollisionDetector(
+            self.pigeon2, enabled=RobotBase.isReal()
+        )
+        """Fed from the telemetry callback; loosens odometry trust after a hit"""
+        self._odometry_disturbed = False
+
         # Swerve requests to apply during SysId characterization
         self._translation_characterization = swerve.requests.SysIdSwerveTranslation()
         self._steer_characterization = swerve.requests.SysIdSwerveSteerGains()
@@ -149,18 +181,18 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
                 # Use default ramp rate (1 V/s) and timeout (10 s)
                 # Reduce dynamic voltage to 4 V to prevent brownout
                 stepVoltage=4.0,
-                # Log state with SignalLogger class
-                recordState=lambda state: SignalLogger.write_string(
-                    "SysIdTranslation_State", SysIdRoutineLog.stateEnumToString(state)
-                )
-                and None,
+                # Log state with SignalLogger class, and to the DataLog for sysid_fit
+                recordState=lambda state: self._record_sys_id_state(
+                    "SysIdTranslation_State", self._sys_id_routine_translation, state
+                ),
             ),
             SysIdRoutine.Mechanism(
                 lambda output: self.set_control(
                     self._translation_characterization.with_volts(output)
                 ),
-                lambda log: None,
+                lambda log: self._log_sys_id_motors(log, "drive", self._drive_signals),
                 self,
+                "swerve-translation",
             ),
         )
         """SysId routine for characterizing translation. This is used to find PID gains for the drive motors."""
@@ -170,18 +202,18 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
                 # Use default ramp rate (1 V/s) and timeout (10 s)
                 # Use dynamic voltage of 7 V
                 stepVoltage=7.0,
-                # Log state with SignalLogger class
-                recordState=lambda state: SignalLogger.write_string(
-                    "SysIdSteer_State", SysIdRoutineLog.stateEnumToString(state)
-                )
-                and None,
+                # Log state with SignalLogger class, and to the DataLog for sysid_fit
+                recordState=lambda state: self._record_sys_id_state(
+                    "SysIdSteer_State", self._sys_id_routine_steer, state
+                ),
             ),
             SysIdRoutine.Mechanism(
                 lambda output: self.set_control(
                     self._steer_characterization.with_volts(output)
                 ),
-                lambda log: None,
+                lambda log: self._log_sys_id_motors(log, "steer", self._steer_signals),
                 self,
+                "swerve-steer",
             ),
         )
         """SysId routine for characterizing steer. This is used to find PID gains for the steer motors."""
@@ -211,6 +243,7 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
                 and None,
                 lambda log: None,
                 self,
+                "swerve-rotation",
             ),
         )
         """
@@ -222,8 +255,24 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
         self._sys_id_routine_to_apply = self._sys_id_routine_translation
         """The SysId routine to test"""
 
-        if utils.is_simulation():
-            self._start_sim_thread()
+        # Voltage, position and velocity of every module, refreshed together while
+        # a characterization routine logs
+        self._drive_signals = [
+            (
+                module.drive_motor.get_motor_voltage(),
+                module.drive_motor.get_position(),
+                module.drive_motor.get_velocity(),
+            )
+            for module in self.modules
+        ]
+        self._steer_signals = [
+            (
+                module.steer_motor.get_motor_voltage(),
+                module.steer_motor.get_position(),
+                module.steer_motor.get_velocity(),
+            )
+            for module in self.modules
+        ]
 
     def apply_request(
         self, request: Callable[[], swerve.requests.SwerveRequest]
@@ -262,6 +311,71 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
         """
         return self._sys_id_routine_to_apply.dynamic(direction)
 
+    def sys_id_characterization(self) -> Command:
+        """
+        Runs every SysId test of the translation, steer and rotation routines
+        back-to-back, braking between tests so each starts from rest.
+
+        The drive and steer data is written to the WPILib DataLog in the SysId
+        format; fit it offline with ``python -m tools.sysid_fit <log>``.
+
+        :returns: Command to run
+        :rtype: Command
+        """
+        brake = swerve.requests.SwerveDriveBrake()
+        commands = [cmd.runOnce(DataLogManager.start)]
+        for routine in (
+            self._sys_id_routine_translation,
+            self._sys_id_routine_steer,
+            self._sys_id_routine_rotation,
+        ):
+            commands += sys_id_tests(
+                routine,
+                DriveConstants.SYSID_QUASISTATIC_TIMEOUT,
+                DriveConstants.SYSID_DYNAMIC_TIMEOUT,
+                lambda: self.apply_request(lambda: brake).withTimeout(
+                    DriveConstants.SYSID_SETTLE_TIME
+                ),
+            )
+        return cmd.sequence(*commands).withName("SysIdCharacterization")
+
+    def _record_sys_id_state(self, key: str, routine: SysIdRoutine, state: State):
+        """
+        Records the state of a SysId test with SignalLogger, and to the DataLog
+        through the routine's own log.
+
+        :param key:     SignalLogger entry name
+        :type key:      str
+        :param routine: Routine running the test
+        :type routine:  SysIdRoutine
+        :param state:   Current test state
+        :type state:    State
+        """
+        SignalLogger.write_string(key, SysIdRoutineLog.stateEnumToString(state))
+        routine.recordState(state)
+
+    @staticmethod
+    def _log_sys_id_motors(
+        log: SysIdRoutineLog,
+        prefix: str,
+        signals: list[tuple[BaseStatusSignal, BaseStatusSignal, BaseStatusSignal]],
+    ):
+        """
+        Records the voltage, position and velocity of one motor per module.
+
+        :param log:     SysId log of the running routine
+        :type log:      SysIdRoutineLog
+        :param prefix:  Motor name prefix, followed by the module index
+        :type prefix:   str
+        :param signals: Voltage, position and velocity signals of each module
+        :type signals:  list[tuple[BaseStatusSignal, BaseStatusSignal, BaseStatusSignal]]
+        """
+        BaseStatusSignal.refresh_all([signal for group in signals for signal in group])
+        for i, (voltage, position, velocity) in enumerate(signals):
+            log.motor(f"{prefix}-{i}").voltage(voltage.value).value(
+                "position", position.value, "rotations"
+            ).value("velocity", velocity.value, "rotations_per_second")
+
     def periodic(self):
         # Periodically try to apply the operator perspective.
         # If we haven't applied the operator perspective before, then we should apply it regardless of DS state.
@@ -278,29 +392,105 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
                 )
                 self._has_applied_operator_perspective = True
 
-    def _start_sim_thread(self):
-        def _sim_periodic():
-            current_time = utils.get_current_time_seconds()
-            delta_time = current_time - self._last_sim_time
-            self._last_sim_time = current_time
+        self._update_odometry_trust()
+
+        self._pose_quality_publish_counter += 1
+        if (
+            self._pose_quality_publish_counter
+            >= DriveConstants.POSE_QUALITY_PUBLISH_PERIOD_LOOPS
+        ):
+            self._pose_quality_publish_counter = 0
+            self.pose_quality.publish(
+                utils.get_current_time_seconds(), self.is_localized()
+            )
+            self._report_odometry_rate()
+            self.traction_control.publish()
+            self.collision_detector.publish(utils.get_current_time_seconds())
+
+    def set_profile(self, profile: DrivetrainProfile):
+        """
+        Record the profile this drivetrain was constructed with, for reporting.
 
-            # use the measured time delta, get battery voltage from WPILib
-            self.update_sim_state(delta_time, RobotController.getBatteryVoltage())
+        :param profile: The validated profile passed to the constructor
+        :type profile:  DrivetrainProfile
+        """
+        self.profile = profile
+        self._profile_pub.set(profile.name)
+        self._configured_odometry_frequency_pub.set(profile.odometry_frequency)
 
-        # Run simulation at a faster rate so PID gains behave more reasonably
-        self._last_sim_time = utils.get_current_time_seconds()
-        self._sim_notifier = Notifier(_sim_periodic)
-        self._sim_notifier.startPeriodic(self._SIM_LOOP_PERIOD)
+    def _update_odometry_trust(self):
+        """
+        Loosen the odometry standard deviations while the collision detector
+        reports a collision or skid, so vision corrects the pose sooner, and
+        restore the profile's values once it clears.
+        """
+        disturbed = self.collision_detector.is_disturbed(
+            utils.get_current_time_seconds()
+        )
+        if disturbed == self._odometry_disturbed or self.profile is None:
+            return
+        self._odometry_disturbed = disturbed
+
+        x, y, theta = self.profile.odometry_std_devs
+        if disturbed:
+            scale = DriveConstants.COLLISION_ODOMETRY_STD_DEV_SCALE
+            self.set_state_std_devs((x * scale, y * scale, theta))
+        else:
+            self.set_state_std_devs((x, y, theta))
+
+    def _report_odometry_rate(self):
+        """Publish the measured odometry rate and warn once if it falls short"""
+        odometry_period = self.get_state().odometry_period
+        if odometry_period <= 0:
+            return
+
+        measured = 1.0 / odometry_period
+        self._measured_odometry_frequency_pub.set(measured)
+
+        if self.profile is None or self.profile.odometry_frequency == 0:
+            return
+        configured = self.profile.odometry_frequency
+        if (
+            not self._odometry_rate_warned
+            and measured < configured * DriveConstants.ODOMETRY_RATE_WARNING_FRACTION
+        ):
+            self._odometry_rate_warned = True
+            reportWarning(
+                f"Odometry running at {measured:.0f} Hz, "
+                f"profile {self.profile.name} configured {configured:.0f} Hz"
+            )
+
+    def step_sim(self, period: units.second, supply_voltage: units.volt):
+        """
+        Advances the swerve simulation in lock-step with the caller.
+
+        The period is split into fixed sub-steps of _SIM_LOOP_PERIOD, so the
+        result depends only on the simulated time passed in and not on host
+        scheduling. This is driven from PhysicsEngine.update_sim instead of a
+        separate Notifier thread, which also lets a headless simulation run
+        faster than real time.
+
+        :param period:         Simulated time to advance, usually the robot loop period
+        :type period:          units.second
+        :param supply_voltage: Battery voltage to apply to the simulated devices
+        :type supply_voltage:  units.volt
+        """
+        steps = max(1, round(period / self._SIM_LOOP_PERIOD))
+        sub_period = period / steps
+        for _ in range(steps):
+            self.update_sim_state(sub_period, supply_voltage)
 
     def add_vision_measurement(
         self,
         vision_robot_pose: Pose2d,
         timestamp: units.second,
         vision_measurement_std_devs: tuple[float, float, float] | None = None,
+        source: str = "",
     ):
         """
         Adds a vision measurement to the Kalman Filter. This will correct the
         odometry pose estimate while still accounting for measurement noise.
+        The size of the correction is recorded in pose_quality.
 
         Note that the vision measurement standard deviations passed into this method
         will continue to apply to future measurements until a subsequent call to
@@ -314,14 +504,40 @@ class Drivetrain(Subsystem, TunerSwerveDrivetrain):
                                             in the form [x, y, theta]ᵀ, with units in meters
                                             and radians.
         :type vision_measurement_std_devs:  tuple[float, float, float] | None
+        :param source:                      Name of the camera the measurement came from
+        :type source:                       str
         """
+        current_timestamp = utils.fpga_to_current_time(timestamp)
+
+        estimated_pose = TunerSwerveDrivetrain.sample_pose_at(self, current_timestamp)
+        if estimated_pose is not None:
+            self.pose_quality.record(
+                estimated_pose.translation().distance(vision_robot_pose.translation()),
+                current_timestamp,
+                source,
+            )
+
         TunerSwerveDrivetrain.add_vision_measurement(
             self,
             vision_robot_pose,
-            utils.fpga_to_current_time(timestamp),
+            current_timestamp,
             vision_measurement_std_devs,
         )
 
+    def is_localized(self) -> bool:
+        """
+        Returns whether vision has recently confirmed the pose estimate closely
+        enough for precise maneuvers such as auto-align.
+
+        :returns: True if the pose estimate is trustworthy
+        :rtype: bool
+        """
+        return self.pose_quality.is_localized(
+            utils.get_current_time_seconds(),
+            DriveConstants.LOCALIZED_MAX_MEASUREMENT_AGE,
+            DriveConstants.LOCALIZED_MAX_CORRECTION,
+        )
+
     def get_pose_at_timestamp(self) -> Pose2d | None:
         """
         Return the pose at a given timestamp, if the buffer is not empty.
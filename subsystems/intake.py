@@ -1,12 +1,24 @@
 import ntcore
-from phoenix6 import controls
+from phoenix6 import configs, controls
 from phoenix6.hardware import TalonFX
 import commands2
 
-from utils import TalonConfig
+from utils import (
+    AxisLimits,
+    CoordinatedMotionPlanner,
+    ProfileSegment,
+    StructuredLogger,
+    TalonConfig,
+    TunableRegistry,
+    motor_sys_id_routine,
+    send_config,
+    sys_id_tests,
+)
 from commands2 import cmd
 import math
 from enum import Enum
+from typing import List
+from wpilib import DataLogManager, Timer, reportWarning
 from utils import MotorIDs
 
 
@@ -17,17 +29,75 @@ class IntakePositions(Enum):
 
 
 class Intake(commands2.Subsystem):
-    ARM_HOME_ROTATIONS = 0
-    HEAD_HOME_ROTATIONS = 0
+    ARM_HOME_ROTATIONS = 0.0
+    HEAD_HOME_ROTATIONS = 0.0
 
-    ARM_DEPLOYED_ROTATIONS = 10  # TODO: Gear-ratio * target-angle ...
-    HEAD_DEPLOYED_ROTATIONS = 20
+    ARM_DEPLOYED_ROTATIONS = 10.0  # TODO: Gear-ratio * target-angle ...
+    HEAD_DEPLOYED_ROTATIONS = 20.0
 
-    ARM_STOWED_ROTATIONS = 5
-    HEAD_STOWED_ROTATIONS = 7
+    ARM_STOWED_ROTATIONS = 5.0
+    HEAD_STOWED_ROTATIONS = 7.0
+
+    # Range of travel from home, estimated with some margin past the deployed
+    # positions until the hard stops are measured; tuned positions must stay
+    # inside it
+    ARM_MAX_ROTATIONS = 12.0
+    HEAD_MAX_ROTATIONS = 24.0
+
+    # Collision-free region: the head may only extend past
+    # HEAD_MAX_WHEN_ARM_RETRACTED once the arm is out past ARM_CLEARANCE_ROTATIONS.
+    # Both are estimates short of the stowed position, not yet measured on the
+    # mechanism; the planner pads the corner by SEGMENT_TOLERANCE_ROTATIONS
+    ARM_CLEARANCE_ROTATIONS = 3.0  # estimate, unmeasured
+    HEAD_MAX_WHEN_ARM_RETRACTED = 4.0  # estimate, unmeasured
+
+    # A plan moves on to its next segment once both axes are this close
+    SEGMENT_TOLERANCE_ROTATIONS = 0.25
+    SEGMENT_TIMEOUT_SECONDS = 0.5  # past the planned duration, before warning
+    # A segment's Motion Magic limits are sent without blocking and the
+    # segment starts on a later loop, once both Talons are known to be on the
+    # bus. Otherwise the limits are sent again this often, and after this many
+    # attempts the intake holds position
+    MOTION_MAGIC_APPLY_RETRY_SECONDS = 0.1
+    MOTION_MAGIC_APPLY_ATTEMPTS = 5
+
+    # SysId: arm and head tests are short so they stay inside the range of travel
+    SYSID_ARM_RAMP_RATE = 1.5  # volts per second
+    SYSID_ARM_STEP_VOLTAGE = 3.0
+    SYSID_ARM_QUASISTATIC_TIMEOUT = 2.0  # seconds
+    SYSID_ARM_DYNAMIC_TIMEOUT = 0.4  # seconds
+    SYSID_ROLLER_RAMP_RATE = 1.0  # volts per second
+    SYSID_ROLLER_STEP_VOLTAGE = 7.0
+    SYSID_ROLLER_QUASISTATIC_TIMEOUT = 6.0  # seconds
+    SYSID_ROLLER_DYNAMIC_TIMEOUT = 2.0  # seconds
+    SYSID_SETTLE_SECONDS = 1.0
 
     def __init__(self):
         super().__init__()
+        # Positions can be tuned from the dashboard; every change is replanned
+        tunables = TunableRegistry.get_default()
+        arm_range = (self.ARM_HOME_ROTATIONS, self.ARM_MAX_ROTATIONS)
+        head_range = (self.HEAD_HOME_ROTATIONS, self.HEAD_MAX_ROTATIONS)
+        self._position_tunables = [
+            tunables.bind(
+                f"Intake/{attribute}",
+                self,
+                attribute,
+                minimum=minimum,
+                maximum=maximum,
+                on_change=lambda _: self._replan(),
+            )
+            for attribute, (minimum, maximum) in (
+                ("ARM_DEPLOYED_ROTATIONS", arm_range),
+                ("HEAD_DEPLOYED_ROTATIONS", head_range),
+                ("ARM_STOWED_ROTATIONS", arm_range),
+                ("HEAD_STOWED_ROTATIONS", head_range),
+            )
+        ]
+        self.roller_velocity = tunables.add(
+            "Intake/RollerVelocity", 1.0, minimum=0.0, maximum=25.0
+        )
+
         INTAKE_CONFIG_ARM = TalonConfig(
             kP=0.11, kI=0, kD=0, kF=0, kA=0, brake_mode=True
         )
@@ -41,6 +111,13 @@ class Intake(commands2.Subsystem):
         INTAKE_CONFIG_ROLLER_BOTTOM = TalonConfig(
             kP=0.11, kI=0, kD=0, kF=0, kA=0, brake_mode=True
         )
+        # Stator limits the power manager restores the motors to
+        self.arm_current_limit = INTAKE_CONFIG_ARM.current_limit
+        self.head_current_limit = INTAKE_CONFIG_HEAD.current_limit
+        self.roller_current_limit = min(
+            INTAKE_CONFIG_ROLLER_TOP.current_limit,
+            INTAKE_CONFIG_ROLLER_BOTTOM.current_limit,
+        )
 
         self.motor_head: TalonFX = TalonFX(
             MotorIDs.motor_id_head,
@@ -71,52 +148,285 @@ class Intake(commands2.Subsystem):
             0, enable_foc=MotorIDs.foc_active
         )
 
+        self.planner = CoordinatedMotionPlanner(
+            AxisLimits(
+                INTAKE_CONFIG_ARM.motion_magic_cruise_velocity,
+                INTAKE_CONFIG_ARM.motion_magic_acceleration,
+                INTAKE_CONFIG_ARM.motion_magic_jerk,
+            ),
+            AxisLimits(
+                INTAKE_CONFIG_HEAD.motion_magic_cruise_velocity,
+                INTAKE_CONFIG_HEAD.motion_magic_acceleration,
+                INTAKE_CONFIG_HEAD.motion_magic_jerk,
+            ),
+            self.is_collision_free,
+            # Pad the corner by the tolerance, since the next segment starts
+            # anywhere within it
+            [
+                (
+                    self.ARM_CLEARANCE_ROTATIONS + self.SEGMENT_TOLERANCE_ROTATIONS,
+                    self.HEAD_MAX_WHEN_ARM_RETRACTED - self.SEGMENT_TOLERANCE_ROTATIONS,
+                )
+            ],
+        )
+        # Every move between named positions is planned once, here
+        try:
+            self._replan()
+        except ValueError as error:
+            reportWarning(f"Saved intake positions rejected, using defaults: {error}")
+            for tunable in self._position_tunables:
+                tunable.reset()
+            self._replan()
+        self._segments: List[ProfileSegment] = []
+        self._segment_started = 0.0
+        self._segment_timed_out = False
+        self._segment_pending = False
+        self._limits_sent = False
+        self._apply_attempts = 0
+        self._next_apply_time = 0.0
+        # False after a move is abandoned, so the next move plans from the
+        # measured positions
+        self._position_known = True
+        self._position = IntakePositions.HOME
+
         self.target_velocity = -1
-        self.set_velocity_command = cmd.runOnce(self.set_velocity)
+        self._log = StructuredLogger.get_default()
+        self.set_velocity_command = cmd.runOnce(
+            lambda: self.set_velocity(self.roller_velocity.value)
+        )
         self.stop_command = cmd.runOnce(self.stop)
 
         self.goto_position_cmmand = {
-            pos: cmd.runOnce(lambda: self.go_to_position(pos))
+            pos: cmd.runOnce(lambda pos=pos: self.go_to_position(pos))
             for pos in IntakePositions
         }
 
+        self._sys_id_routine_arm = motor_sys_id_routine(
+            self,
+            "intake-arm",
+            {"arm": self.motor_arm},
+            self.SYSID_ARM_RAMP_RATE,
+            self.SYSID_ARM_STEP_VOLTAGE,
+            self.SYSID_ARM_QUASISTATIC_TIMEOUT,
+        )
+        self._sys_id_routine_head = motor_sys_id_routine(
+            self,
+            "intake-head",
+            {"head": self.motor_head},
+            self.SYSID_ARM_RAMP_RATE,
+            self.SYSID_ARM_STEP_VOLTAGE,
+            self.SYSID_ARM_QUASISTATIC_TIMEOUT,
+        )
+        self._sys_id_routine_rollers = motor_sys_id_routine(
+            self,
+            "intake-rollers",
+            {
+                "roller-top": self.motor_roller_top,
+                "roller-bottom": self.motor_roller_bottom,
+            },
+            self.SYSID_ROLLER_RAMP_RATE,
+            self.SYSID_ROLLER_STEP_VOLTAGE,
+            self.SYSID_ROLLER_QUASISTATIC_TIMEOUT,
+        )
+
     def init(self):
         pass
 
-    def go_to_position(self, position: IntakePositions):
+    def sys_id_characterization(self) -> commands2.Command:
+        """
+        Runs the SysId tests of the arm, head and rollers back-to-back.
+        Fit the resulting log with ``python -m tools.mechanism_fit <log>``.
+        """
+        commands = [cmd.runOnce(DataLogManager.start)]
+        commands += sys_id_tests(
+            self._sys_id_routine_arm,
+            self.SYSID_ARM_QUASISTATIC_TIMEOUT,
+            self.SYSID_ARM_DYNAMIC_TIMEOUT,
+            lambda: cmd.waitSeconds(self.SYSID_SETTLE_SECONDS),
+        )
+        commands += sys_id_tests(
+            self._sys_id_routine_head,
+            self.SYSID_ARM_QUASISTATIC_TIMEOUT,
+            self.SYSID_ARM_DYNAMIC_TIMEOUT,
+            lambda: cmd.waitSeconds(self.SYSID_SETTLE_SECONDS),
+        )
+        commands += sys_id_tests(
+            self._sys_id_routine_rollers,
+            self.SYSID_ROLLER_QUASISTATIC_TIMEOUT,
+            self.SYSID_ROLLER_DYNAMIC_TIMEOUT,
+            lambda: cmd.waitSeconds(self.SYSID_SETTLE_SECONDS),
+        )
+        return cmd.sequence(*commands).withName("IntakeCharacterization")
+
+    def _replan(self):
+        """
+        Plans every move between named positions.
+
+        :raises ValueError: If a move has no collision-free path
+        """
+        self._plans = self.planner.precompute(
+            {
+                position: self.position_rotations(position)
+                for position in IntakePositions
+            }
+        )
+
+    def position_rotations(self, position: IntakePositions) -> tuple[float, float]:
+        """Arm and head rotations of a named position"""
         if position == IntakePositions.DEPLOYED:
-            self.motor_arm.set_control(
-                self._motion_magic_position_voltage.with_position(
-                    self.ARM_DEPLOYED_ROTATIONS
-                )
-            )
-            self.motor_head.set_control(
-                self._motion_magic_position_voltage.with_position(
-                    self.HEAD_DEPLOYED_ROTATIONS
-                )
-            )
+            return (self.ARM_DEPLOYED_ROTATIONS, self.HEAD_DEPLOYED_ROTATIONS)
         elif position == IntakePositions.STOWED:
-            self.motor_arm.set_control(
-                self._motion_magic_position_voltage.with_position(
-                    self.ARM_STOWED_ROTATIONS
-                )
+            return (self.ARM_STOWED_ROTATIONS, self.HEAD_STOWED_ROTATIONS)
+        return (self.ARM_HOME_ROTATIONS, self.HEAD_HOME_ROTATIONS)
+
+    def is_collision_free(self, arm: float, head: float) -> bool:
+        """Whether the arm and head can be at these rotations without touching"""
+        return (
+            arm >= self.ARM_CLEARANCE_ROTATIONS
+            or head <= self.HEAD_MAX_WHEN_ARM_RETRACTED
+        )
+
+    def go_to_position(self, position: IntakePositions):
+        """
+        Moves the arm and head to a position along the precomputed coordinated
+        plan, so both arrive together and never collide. If the previous move
+        has not finished, a new plan is made from where the mechanism is now.
+        """
+        if self._segments or not self._position_known:
+            start = (
+                self.motor_arm.get_position().value,
+                self.motor_head.get_position().value,
             )
-            self.motor_head.set_control(
-                self._motion_magic_position_voltage.with_position(
-                    self.HEAD_STOWED_ROTATIONS
+            try:
+                segments = self.planner.plan(start, self.position_rotations(position))
+            except ValueError as error:
+                self._plan_after_current_segment(position, error)
+                return
+        elif position == self._position:
+            return
+        else:
+            segments = self._plans[(self._position, position)]
+
+        self._position = position
+        self._position_known = True
+        self._segments = list(segments)
+        self._start_segment()
+
+    def _plan_after_current_segment(self, position: IntakePositions, error: ValueError):
+        """
+        Continues a move whose path from the measured positions is blocked,
+        e.g. because they are just outside the collision-free region: the
+        current segment, whose path is clear, is finished and the move goes on
+        from its target. Without a current segment the intake holds position.
+        """
+        if self._segments:
+            current = self._segments[0]
+            try:
+                rest = self.planner.plan(
+                    current.target, self.position_rotations(position)
                 )
+            except ValueError as retry_error:
+                error = retry_error
+            else:
+                self._position = position
+                self._segments = [current] + rest
+                return
+        reportWarning(
+            f"Intake cannot move to {position.name}, holding position: {error}"
+        )
+
+    def _start_segment(self):
+        """
+        Sends the Motion Magic limits of the first segment of the plan. A later
+        periodic starts both axes on it once both Talons are on the bus, so no
+        segment runs with the previous segment's limits.
+        """
+        self._segment_pending = True
+        self._apply_attempts = 0
+        self._send_segment_limits()
+
+    def _send_segment_limits(self):
+        segment = self._segments[0]
+        self._limits_sent = True
+        for motor, limits in (
+            (self.motor_arm, segment.first_limits),
+            (self.motor_head, segment.second_limits),
+        ):
+            # The Talons are on the roboRIO bus, where Dynamic Motion Magic is
+            # not available, so the limits are changed without blocking instead
+            sent = send_config(
+                motor,
+                configs.MotionMagicConfigs()
+                .with_motion_magic_cruise_velocity(limits.velocity)
+                .with_motion_magic_acceleration(limits.acceleration)
+                .with_motion_magic_jerk(limits.jerk),
             )
-        elif position == IntakePositions.HOME:
+            self._limits_sent = self._limits_sent and sent
+        self._apply_attempts += 1
+        self._next_apply_time = (
+            Timer.getFPGATimestamp() + self.MOTION_MAGIC_APPLY_RETRY_SECONDS
+        )
+
+    def _confirm_segment(self):
+        """
+        Starts the pending segment once its limits reached both Talons, sends
+        them again at a limited rate if not, and holds position once the
+        attempts run out.
+        """
+        if (
+            self._limits_sent
+            and self.motor_arm.is_connected
+            and self.motor_head.is_connected
+        ):
+            segment = self._segments[0]
             self.motor_arm.set_control(
-                self._motion_magic_position_voltage.with_position(
-                    self.ARM_HOME_ROTATIONS
-                )
+                self._motion_magic_position_voltage.with_position(segment.target[0])
             )
             self.motor_head.set_control(
-                self._motion_magic_position_voltage.with_position(
-                    self.HEAD_HOME_ROTATIONS
-                )
+                self._motion_magic_position_voltage.with_position(segment.target[1])
+            )
+            self._segment_pending = False
+            self._segment_started = Timer.getFPGATimestamp()
+            self._segment_timed_out = False
+        elif self._apply_attempts >= self.MOTION_MAGIC_APPLY_ATTEMPTS:
+            # Both axes keep the target of the last segment they started
+            reportWarning(
+                f"Intake could not apply Motion Magic limits after "
+                f"{self._apply_attempts} attempts, holding position"
             )
+            self._segments = []
+            self._segment_pending = False
+            self._position_known = False
+        elif Timer.getFPGATimestamp() >= self._next_apply_time:
+            self._send_segment_limits()
+
+    def _update_segments(self):
+        """Starts the next segment of the plan once both axes reach the current one"""
+        if not self._segments:
+            return
+        if self._segment_pending:
+            self._confirm_segment()
+            return
+
+        segment = self._segments[0]
+        elapsed = Timer.getFPGATimestamp() - self._segment_started
+        arrived = (
+            abs(self.motor_arm.get_position().value - segment.target[0])
+            <= self.SEGMENT_TOLERANCE_ROTATIONS
+            and abs(self.motor_head.get_position().value - segment.target[1])
+            <= self.SEGMENT_TOLERANCE_ROTATIONS
+        )
+        if arrived and elapsed >= segment.duration:
+            self._segments.pop(0)
+            if self._segments:
+                self._start_segment()
+        elif (
+            not self._segment_timed_out
+            and elapsed > segment.duration + self.SEGMENT_TIMEOUT_SECONDS
+        ):
+            # Keep waiting rather than start a segment that could collide
+            reportWarning(f"Intake has not reached {segment.target} in {elapsed:.2f} s")
+            self._segment_timed_out = True
 
     def set_velocity(self, velocity: float = 1):  # ft/sec
         # speed: rotations per seconds
@@ -156,15 +466,22 @@ class Intake(commands2.Subsystem):
         )
 
     def update_table(self):
+        bottom_velocity = float(self.motor_roller_bottom.get_velocity().value)
+        top_velocity = float(self.motor_roller_top.get_velocity().value)
         table = ntcore.NetworkTableInstance.getDefault().getTable("Intake")
-        table.getEntry("Velocity_Motor_Bottom").setDouble(
-            float(self.motor_roller_bottom.get_velocity().value)
-        )
-        table.getEntry("Velocity_Motor_Top").setDouble(
-            float(self.motor_roller_top.get_velocity().value)
-        )
+        table.getEntry("Velocity_Motor_Bottom").setDouble(bottom_velocity)
+        table.getEntry("Velocity_Motor_Top").setDouble(top_velocity)
         table.getEntry("Target_Velocity").setDouble(float(self.target_velocity))
+
+        self._log.log("Intake/RollerBottomVelocity", bottom_velocity, "rps")
+        self._log.log("Intake/RollerTopVelocity", top_velocity, "rps")
+        self._log.log("Intake/TargetVelocity", self.target_velocity, "rps")
+        self._log.log("Intake/ArmPosition", self.motor_arm.get_position().value, "rot")
+        self._log.log(
+            "Intake/HeadPosition", self.motor_head.get_position().value, "rot"
+        )
         # v            # 4pi inches / sec
 
     def periodic(self):
+        self._update_segments()
         self.update_table()
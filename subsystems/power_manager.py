@@ -0,0 +1,204 @@
+from typing import List, Optional
+
+import commands2
+import ntcore
+from phoenix6 import BaseStatusSignal, configs
+from phoenix6.hardware import TalonFX
+from wpilib import RobotController, Timer
+
+from utils import PowerConstants, StructuredLogger, send_config
+
+
+class PowerConsumer:
+    """A group of motors that share one stator current limit in the power budget"""
+
+    def __init__(
+        self,
+        name: str,
+        motors: List[TalonFX],
+        nominal_limit: Optional[float],
+        min_limit: Optional[float],
+    ):
+        self.name = name
+        self.motors = motors
+        self.nominal_limit = nominal_limit
+        self.min_limit = min_limit if min_limit is not None else nominal_limit
+        self.limit = nominal_limit
+        self.applied_limit = nominal_limit
+        self.current = 0.0
+        self.current_signal = f"Power/{name}/Current"
+        self.limit_signal = f"Power/{name}/Limit"
+
+        self.supply_current_signals = [motor.get_supply_current() for motor in motors]
+
+    @property
+    def sheddable(self) -> bool:
+        return self.nominal_limit is not None and self.min_limit < self.nominal_limit
+
+
+class PowerManager(commands2.Subsystem):
+    """
+    Arbitrates stator current limits across subsystems to stay out of brownout.
+
+    Consumers are registered in priority order. Each update the total supply
+    current is measured, extrapolated a short time ahead, and compared with the
+    current the battery can supply before its voltage sags to the threshold.
+    When the prediction exceeds that budget the lowest-priority consumers have
+    their stator limits lowered first; once there is headroom again the limits
+    are restored. Limits are only sent to the motors when they move by more
+    than a hysteresis step, and all changes from one update go out together as
+    non-blocking config applies.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.consumers: List[PowerConsumer] = []
+
+        self.total_current = 0.0
+        self.predicted_current = 0.0
+        self.current_budget = float("inf")
+        self._current_rate = 0.0
+        self._last_update_time = -1.0
+
+        self._table = ntcore.NetworkTableInstance.getDefault().getTable("Power")
+        self._total_current_pub = self._table.getDoubleTopic("TotalCurrent").publish()
+        self._predicted_current_pub = self._table.getDoubleTopic(
+            "PredictedCurrent"
+        ).publish()
+        self._budget_pub = self._table.getDoubleTopic("CurrentBudget").publish()
+        self._limit_pubs = []
+        self._supply_current_signals: List[BaseStatusSignal] = []
+        self._log = StructuredLogger.get_default()
+
+    def register(
+        self,
+        name: str,
+        motors: List[TalonFX],
+        nominal_limit: Optional[float] = None,
+        min_limit: Optional[float] = None,
+    ) -> PowerConsumer:
+        """
+        Register a consumer. Consumers registered first have the highest priority.
+
+        Args:
+            name: Name used for logging
+            motors: Motors whose current counts toward this consumer
+            nominal_limit: Stator current limit when power is plentiful; None
+                means the limit is never managed and only the current is counted
+            min_limit: Lowest stator limit this consumer may be shed to
+
+        Returns:
+            The registered consumer
+        """
+        consumer = PowerConsumer(name, motors, nominal_limit, min_limit)
+        self.consumers.append(consumer)
+        self._supply_current_signals.extend(consumer.supply_current_signals)
+        self._limit_pubs.append(self._table.getDoubleTopic(f"{name}/Limit").publish())
+        return consumer
+
+    def periodic(self):
+        now = Timer.getFPGATimestamp()
+        if (
+            self._last_update_time >= 0
+            and now - self._last_update_time < PowerConstants.UPDATE_PERIOD_SECONDS
+        ):
+            return
+
+        elapsed = now - self._last_update_time if self._last_update_time >= 0 else 0
+        self._last_update_time = now
+
+        self.update(RobotController.getBatteryVoltage(), elapsed)
+        self.apply_limits()
+        self.publish()
+
+    def update(self, battery_voltage: float, elapsed: float):
+        """
+        Measure current draw and recompute every consumer's limit.
+
+        Args:
+            battery_voltage: Measured battery voltage
+            elapsed: Time since the previous update in seconds, 0 if none
+        """
+        # One refresh for the signals of every consumer
+        if self._supply_current_signals:
+            BaseStatusSignal.refresh_all(self._supply_current_signals)
+
+        total_current = 0.0
+        for consumer in self.consumers:
+            consumer.current = sum(
+                abs(signal.value) for signal in consumer.supply_current_signals
+            )
+            total_current += consumer.current
+
+        if elapsed > 0:
+            self._current_rate = (total_current - self.total_current) / elapsed
+        self.total_current = total_current
+        self.predicted_current = total_current + max(
+            0.0, self._current_rate * PowerConstants.CURRENT_LOOKAHEAD_SECONDS
+        )
+
+        # Open-circuit voltage from the measured sag, then the total current
+        # that would pull the battery down to the threshold
+        resistance = PowerConstants.BATTERY_RESISTANCE_OHMS
+        open_circuit_voltage = battery_voltage + total_current * resistance
+        self.current_budget = (
+            open_circuit_voltage - PowerConstants.BROWNOUT_THRESHOLD_VOLTS
+        ) / resistance
+
+        excess = self.predicted_current - self.current_budget
+        step = PowerConstants.LIMIT_RECOVERY_AMPS
+
+        # Shed from the lowest priority up, or restore from the highest priority down
+        ordered = reversed(self.consumers) if excess > 0 else self.consumers
+        for consumer in ordered:
+            if not consumer.sheddable:
+                continue
+
+            motor_count = len(consumer.motors)
+            if excess > 0:
+                reducible = (consumer.limit - consumer.min_limit) * motor_count
+                cut = min(reducible, excess)
+                consumer.limit -= cut / motor_count
+                excess -= cut
+            else:
+                consumer.limit = min(consumer.nominal_limit, consumer.limit + step)
+
+    def apply_limits(self):
+        """
+        Send changed limits to the motors without blocking the loop. A limit
+        only counts as applied once it was sent to every motor and all of them
+        are on the bus, so a failed send is retried on the next update.
+        """
+        for consumer in self.consumers:
+            if not consumer.sheddable:
+                continue
+
+            change = abs(consumer.limit - consumer.applied_limit)
+            at_bound = consumer.limit in (consumer.nominal_limit, consumer.min_limit)
+            if change < PowerConstants.LIMIT_HYSTERESIS_AMPS and not (
+                at_bound and change > 0
+            ):
+                continue
+
+            limits = (
+                configs.CurrentLimitsConfigs()
+                .with_stator_current_limit(consumer.limit)
+                .with_stator_current_limit_enable(True)
+            )
+            sent = [send_config(motor, limits) for motor in consumer.motors]
+            if all(sent) and all(motor.is_connected for motor in consumer.motors):
+                consumer.applied_limit = consumer.limit
+
+    def publish(self):
+        self._total_current_pub.set(self.total_current)
+        self._predicted_current_pub.set(self.predicted_current)
+        self._budget_pub.set(self.current_budget)
+        for consumer, publisher in zip(self.consumers, self._limit_pubs):
+            publisher.set(consumer.applied_limit or 0.0)
+
+        self._log.log("Power/TotalCurrent", self.total_current, "A")
+        self._log.log("Power/PredictedCurrent", self.predicted_current, "A")
+        self._log.log("Power/CurrentBudget", self.current_budget, "A")
+        for consumer in self.consumers:
+            self._log.log(consumer.current_signal, consumer.current, "A")
+            self._log.log(consumer.limit_signal, consumer.applied_limit or 0.0, "A")
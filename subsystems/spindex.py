@@ -2,12 +2,27 @@ from phoenix6.hardware import TalonFX
 from phoenix6 import controls
 from commands2 import cmd
 import commands2
-from utils import TalonConfig
+from utils import (
+    StructuredLogger,
+    TalonConfig,
+    TunableRegistry,
+    motor_sys_id_routine,
+    sys_id_tests,
+)
 from utils import MotorIDs
+from wpilib import DataLogManager
 
 class Spindex(commands2.Subsystem):
+    SYSID_RAMP_RATE = 1.0  # volts per second
+    SYSID_STEP_VOLTAGE = 7.0
+    SYSID_QUASISTATIC_TIMEOUT = 6.0  # seconds
+    SYSID_DYNAMIC_TIMEOUT = 2.0  # seconds
+    SYSID_SETTLE_SECONDS = 1.0
+
     def __init__(self):
         SPINDEX_CONFIG = TalonConfig(kP=0.11, kI=0, kD=0, kF=0, kA=0, brake_mode=True)
+        # Stator limit the power manager restores the motor to
+        self.current_limit = SPINDEX_CONFIG.current_limit
 
         self._motion_magic_velocity_voltage = controls.MotionMagicVelocityVoltage(
             0, enable_foc=MotorIDs.foc_active
@@ -19,8 +34,38 @@ class Spindex(commands2.Subsystem):
 
         SPINDEX_CONFIG._apply_settings(self.motor_spindex, inverted=False)
 
-        self.set_velocity_command = cmd.runOnce(self.move_spindex)
+        self.velocity = TunableRegistry.get_default().add(
+            "Spindex/Velocity", 1.0, minimum=0.0, maximum=100.0
+        )
+        self.set_velocity_command = cmd.runOnce(
+            lambda: self.move_spindex(self.velocity.value)
+        )
         self.stop_velocity_command = cmd.runOnce(self.stop)
+        self._log = StructuredLogger.get_default()
+
+        self._sys_id_routine = motor_sys_id_routine(
+            self,
+            "spindex",
+            {"spindex": self.motor_spindex},
+            self.SYSID_RAMP_RATE,
+            self.SYSID_STEP_VOLTAGE,
+            self.SYSID_QUASISTATIC_TIMEOUT,
+        )
+
+    def sys_id_characterization(self) -> commands2.Command:
+        """
+        Runs the spindex SysId tests back-to-back.
+        Fit the resulting log with ``python -m tools.mechanism_fit <log>``.
+        """
+        return cmd.sequence(
+            cmd.runOnce(DataLogManager.start),
+            *sys_id_tests(
+                self._sys_id_routine,
+                self.SYSID_QUASISTATIC_TIMEOUT,
+                self.SYSID_DYNAMIC_TIMEOUT,
+                lambda: cmd.waitSeconds(self.SYSID_SETTLE_SECONDS),
+            ),
+        ).withName("SpindexCharacterization")
 
     def move_spindex(self, velocity: float = 1):
         """
@@ -37,3 +82,8 @@ class Spindex(commands2.Subsystem):
         self.motor_spindex.set_control(
             self._motion_magic_velocity_voltage.with_velocity(0).with_acceleration(0.1)
         )
+
+    def periodic(self):
+        self._log.log(
+            "Spindex/MeasuredVelocity", self.motor_spindex.get_velocity().value, "rps"
+        )
@@ -1,14 +1,25 @@
-from typing import Optional, List
+import time
+from typing import Optional, List, Tuple
 import ntcore
 from photonlibpy.photonCamera import PhotonCamera
 from photonlibpy.estimatedRobotPose import EstimatedRobotPose
 from photonlibpy.photonPoseEstimator import PhotonPoseEstimator
 from photonlibpy.targeting.photonPipelineResult import PhotonPipelineResult
 from photonlibpy.targeting.photonTrackedTarget import PhotonTrackedTarget
-from robotpy_apriltag import AprilTagFieldLayout, AprilTagField
+from robotpy_apriltag import AprilTagFieldLayout
 from wpimath.geometry import Transform3d, Pose2d, Translation2d
-from wpilib import DriverStation
-from utils import VisionConstants
+from wpimath.interpolation import TimeInterpolatableRotation2dBuffer
+from wpilib import DriverStation, RobotBase, Timer
+from utils import (
+    VisionConstants,
+    CameraHealth,
+    CameraScheduler,
+    ConstrainedPoseSolver,
+    PoseStrategy,
+    StructuredLogger,
+    TunableRegistry,
+    load_field_layout,
+)
 from subsystems import Drivetrain
 import commands2
 
@@ -24,6 +35,24 @@ class Vision(commands2.Subsystem):
     ):
         self.drive_sub = drive_sub
 
+        # Acceptance thresholds are read from VisionConstants, so tuning them
+        # from the dashboard updates the constants in place
+        tunables = TunableRegistry.get_default()
+        tunables.bind(
+            "Vision/MAX_SINGLE_TAG_AMBIGUITY",
+            VisionConstants,
+            "MAX_SINGLE_TAG_AMBIGUITY",
+            minimum=0.0,
+            maximum=1.0,
+        )
+        tunables.bind(
+            "Vision/CONSTRAINED_MAX_DISTANCE",
+            VisionConstants,
+            "CONSTRAINED_MAX_DISTANCE",
+            minimum=0.0,
+            maximum=10.0,
+        )
+
         # BW PhotonVision cameras
         self.back_left_swerve_cam = PhotonCamera(VisionConstants.BACK_LEFT_SWERVE_NAME)
         self.back_right_swerve_cam = PhotonCamera(
@@ -36,9 +65,7 @@ class Vision(commands2.Subsystem):
             VisionConstants.FRONT_RIGHT_SWERVE_NAME
         )
 
-        self.april_tag_field_layout = AprilTagFieldLayout.loadField(
-            AprilTagField.k2026RebuiltAndyMark
-        )
+        self.april_tag_field_layout = load_field_layout()
 
         self.front_right_photon_estimator = PhotonPoseEstimator(
             self.april_tag_field_layout, VisionConstants.FRONT_RIGHT_SWERVE_TO_ROBOT
@@ -55,6 +82,7 @@ class Vision(commands2.Subsystem):
         )
 
         self.disabled_vision = False
+        self._log = StructuredLogger.get_default()
         self.all_detected_targets: List[PhotonTrackedTarget] = []
         self.april_tag_detected = False
         self.robot_to_camera: Optional[Transform3d] = None
@@ -63,6 +91,46 @@ class Vision(commands2.Subsystem):
         # NetworkTables for logging
         self.nt = ntcore.NetworkTableInstance.getDefault().getTable("Vision")
 
+        self.cameras: List[Tuple[PhotonCamera, PhotonPoseEstimator]] = [
+            (self.front_left_swerve_cam, self.front_left_photon_estimator),
+            (self.front_right_swerve_cam, self.front_right_photon_estimator),
+            (self.back_left_swerve_cam, self.back_left_photon_estimator),
+            (self.back_right_swerve_cam, self.back_right_photon_estimator),
+        ]
+
+        # Per-camera health and the scheduler that keeps vision within its loop budget
+        health_table = self.nt.getSubTable("Health")
+        self.camera_healths: List[CameraHealth] = [
+            CameraHealth(
+                camera.getName(), VisionConstants.CAMERA_HEALTH_EMA_ALPHA, health_table
+            )
+            for camera, _ in self.cameras
+        ]
+        self.camera_scheduler = CameraScheduler(
+            VisionConstants.VISION_LOOP_BUDGET_SECONDS,
+            VisionConstants.LOW_VALUE_CAMERA_USEFULNESS,
+            VisionConstants.LOW_VALUE_CAMERA_PERIOD_LOOPS,
+        )
+        self._over_budget_pub = health_table.getBooleanTopic("OverBudget").publish()
+        self._vision_time_pub = health_table.getDoubleTopic("LoopTimeMs").publish()
+        self._health_publish_counter = 0
+
+        # Gyro heading history and a translation-only solver per camera
+        self.heading_buffer = TimeInterpolatableRotation2dBuffer(
+            VisionConstants.HEADING_BUFFER_SECONDS
+        )
+        self.constrained_solvers: List[ConstrainedPoseSolver] = [
+            ConstrainedPoseSolver(self.april_tag_field_layout, estimator.robotToCamera)
+            for _, estimator in self.cameras
+        ]
+
+        # Simulated cameras publish into the same NetworkTables topics as the real ones
+        self.vision_sim = None
+        if RobotBase.isSimulation():
+            from subsystems.vision_sim import VisionSim
+
+            self.vision_sim = VisionSim(self)
+
     def periodic(self):
         """Called periodically by the scheduler"""
         if not self.disabled_vision:
@@ -84,13 +152,20 @@ class Vision(commands2.Subsystem):
         drive_pose: Pose2d,
         swerve_cam: PhotonCamera,
         photon_estimator: PhotonPoseEstimator,
+        health: Optional[CameraHealth] = None,
+        solver: Optional[ConstrainedPoseSolver] = None,
     ):
         vision_poses = self.get_unprocessed_poses(
-            drive_pose, swerve_cam, photon_estimator
+            drive_pose, swerve_cam, photon_estimator, health, solver
         )
         if vision_poses is not None:
-            for vision_pose in vision_poses:
-                self.add_vision_measure(vision_pose, swerve_cam.getName())
+            for vision_pose, strategy, distance in vision_poses:
+                std_devs = self.add_vision_measure(
+                    vision_pose, swerve_cam.getName(), strategy, distance
+                )
+                if health is not None:
+                    health.record_measurement(std_devs is not None)
+                self._log.log("Vision/Accepted", std_devs is not None)
                 self.nt.putNumberArray(
                     "ElevatorCameraPoseEstimate",
                     [
@@ -101,39 +176,119 @@ class Vision(commands2.Subsystem):
                 )
 
     def update_vision_localization(self, drive_pose: Pose2d):
-        """Update pose estimation using vision measurements"""
-        self.update_vision_localization_camera(
-            drive_pose, self.front_left_swerve_cam, self.front_left_photon_estimator
-        )
-        self.update_vision_localization_camera(
-            drive_pose, self.front_right_swerve_cam, self.front_right_photon_estimator
-        )
-        self.update_vision_localization_camera(
-            drive_pose, self.back_left_swerve_cam, self.back_left_photon_estimator
-        )
-        self.update_vision_localization_camera(
-            drive_pose, self.back_right_swerve_cam, self.back_right_photon_estimator
-        )
+        """
+        Update pose estimation using vision measurements
+
+        Cameras are processed in priority order until the vision loop budget
+        is spent; anything left over waits for the next loop.
+        """
+        self.camera_scheduler.begin_loop()
+
+        # Heading history lets the constrained solve sample the gyro at a frame's
+        # capture time; the drivetrain pose heading comes from the Pigeon 2
+        self.heading_buffer.addSample(Timer.getFPGATimestamp(), drive_pose.rotation())
+
+        for index in self.camera_scheduler.prioritize(self.camera_healths):
+            camera, estimator = self.cameras[index]
+            health = self.camera_healths[index]
+
+            if not self.camera_scheduler.should_process(health):
+                health.record_skip()
+                continue
+
+            start = time.perf_counter()
+            self.update_vision_localization_camera(
+                drive_pose, camera, estimator, health, self.constrained_solvers[index]
+            )
+            health.record_processing_time(time.perf_counter() - start)
+
+    @staticmethod
+    def select_strategy(
+        result: PhotonPipelineResult, has_heading: bool = False
+    ) -> PoseStrategy:
+        """
+        Pick the cheapest estimation strategy that is valid for a pipeline result
+
+        The result is inspected once: a coprocessor multi-tag solution is used
+        as-is, otherwise single tags use the gyro-constrained solve when heading
+        data is available, falling back to plain PnP on an unambiguous tag.
+        """
+        if result.getTimestampSeconds() < 0 or not result.targets:
+            return PoseStrategy.NONE
+
+        if result.multitagResult is not None:
+            return PoseStrategy.COPROC_MULTI_TAG
+
+        if has_heading:
+            return PoseStrategy.GYRO_CONSTRAINED
+
+        lowest_ambiguity = None
+        for target in result.targets:
+            ambiguity = target.poseAmbiguity
+            if ambiguity != -1 and (
+                lowest_ambiguity is None or ambiguity < lowest_ambiguity
+            ):
+                lowest_ambiguity = ambiguity
+
+        if lowest_ambiguity is None:
+            # No fiducial targets
+            return PoseStrategy.NONE
+
+        if lowest_ambiguity <= VisionConstants.MAX_SINGLE_TAG_AMBIGUITY:
+            return PoseStrategy.LOWEST_AMBIGUITY
+
+        return PoseStrategy.NONE
 
     def get_camera_vision_est(
-        self, result: PhotonPipelineResult, estimator: PhotonPoseEstimator
-    ) -> EstimatedRobotPose | None:
+        self,
+        result: PhotonPipelineResult,
+        estimator: PhotonPoseEstimator,
+        health: Optional[CameraHealth] = None,
+        solver: Optional[ConstrainedPoseSolver] = None,
+    ) -> Tuple[EstimatedRobotPose | None, PoseStrategy]:
         """
-        Returns an EstimatedRobotPose, which includes pose, timestamp, tags, and strategy
+        Returns an EstimatedRobotPose, which includes pose, timestamp and tags,
+        along with the strategy used to compute it
+
+        Args:
+            result: Pipeline result to estimate from
+            estimator: The camera's pose estimator
+            health: Health monitor to record the strategy and its cost in, if any
+            solver: The camera's gyro-constrained solver, if any
         """
-        # result = camera.getLatestResult()
-        camEstPose = estimator.estimateCoprocMultiTagPose(result)
-        if camEstPose is None:
+        start = time.perf_counter()
+        heading = None
+        if solver is not None:
+            heading = self.heading_buffer.sample(result.getTimestampSeconds())
+        strategy = self.select_strategy(result, heading is not None)
+
+        if strategy == PoseStrategy.COPROC_MULTI_TAG:
+            camEstPose = estimator.estimateCoprocMultiTagPose(result)
+        elif strategy == PoseStrategy.LOWEST_AMBIGUITY:
             camEstPose = estimator.estimateLowestAmbiguityPose(result)
+        elif strategy == PoseStrategy.GYRO_CONSTRAINED:
+            pose = solver.solve(result, heading)
+            camEstPose = (
+                EstimatedRobotPose(pose, result.getTimestampSeconds(), result.targets)
+                if pose is not None
+                else None
+            )
+        else:
+            camEstPose = None
+
+        if health is not None:
+            health.record_strategy(strategy, time.perf_counter() - start)
 
-        return camEstPose
+        return camEstPose, strategy
 
     def get_unprocessed_poses(
         self,
         robot_pose: Pose2d,
         camera: PhotonCamera,
         pose_estimator: PhotonPoseEstimator,
-    ) -> List[EstimatedRobotPose]:
+        health: Optional[CameraHealth] = None,
+        solver: Optional[ConstrainedPoseSolver] = None,
+    ) -> List[Tuple[EstimatedRobotPose, PoseStrategy, Optional[float]]]:
         """
         Get estimated global pose from camera
 
@@ -141,19 +296,49 @@ class Vision(commands2.Subsystem):
             robot_pose: Current robot pose estimate
             camera: PhotonCamera instance
             pose_estimator: PhotonPoseEstimator instance
+            health: Health monitor to record the camera's results in, if any
+            solver: Gyro-constrained solver for the camera, if any
 
         Returns:
-            EstimatedRobotPose if available, None otherwise
+            Each EstimatedRobotPose with the strategy that produced it and, for
+            gyro-constrained estimates, the solver's weighted tag distance
         """
-        if not camera.isConnected():
+        connected = camera.isConnected()
+        if health is not None:
+            health.connected = connected
+        if not connected:
             return []
 
+        results = camera.getAllUnreadResults()
+        if health is not None:
+            now = Timer.getFPGATimestamp()
+            for result in results:
+                health.record_result(result, now)
+
+        # Only the newest results are worth the CPU time; older ones are stale
+        max_results = VisionConstants.MAX_RESULTS_PER_CAMERA_PER_LOOP
+        if len(results) > max_results:
+            if health is not None:
+                health.record_discarded(len(results) - max_results)
+            results = results[-max_results:]
+
         # BW: Process all unread results
         vision_est = None
-        vision_poses: List[EstimatedRobotPose] = []
-        for result in camera.getAllUnreadResults():  # BW: What do we want to do with old camera information if there is multiple frames? If robot is moving not rlly relv.
-            vision_est = self.get_camera_vision_est(result, camera, pose_estimator)
-            vision_poses.append(vision_est)
+        vision_poses: List[
+            Tuple[EstimatedRobotPose, PoseStrategy, Optional[float]]
+        ] = []
+        for result in results:  # BW: What do we want to do with old camera information if there is multiple frames? If robot is moving not rlly relv.
+            vision_est, strategy = self.get_camera_vision_est(
+                result, pose_estimator, health, solver
+            )
+            if vision_est is not None:
+                # Read now, before the solver moves on to the next result
+                distance = (
+                    solver.last_distance
+                    if strategy == PoseStrategy.GYRO_CONSTRAINED
+                    else None
+                )
+                vision_poses.append((vision_est, strategy, distance))
             # OR UPDATE STD DEVS
             # self.update_estimation_std_devs(vision_est, result.getTargets(), pose_estimator)
 
@@ -223,7 +408,11 @@ class Vision(commands2.Subsystem):
         return self.cur_std_devs
 
     def add_vision_measure(
-        self, estimated_pose: EstimatedRobotPose, camera_name: str
+        self,
+        estimated_pose: EstimatedRobotPose,
+        camera_name: str,
+        strategy: PoseStrategy = PoseStrategy.NONE,
+        distance: Optional[float] = None,
     ) -> Optional[List[float]]:
         """
         Add vision measurement to pose estimator with dynamic standard deviations
@@ -231,6 +420,9 @@ class Vision(commands2.Subsystem):
         Args:
             estimated_pose: The estimated robot pose from vision
             camera_name: Name of the camera for logging
+            strategy: Strategy that produced the estimate
+            distance: Weighted camera-to-tag distance of a gyro-constrained
+                estimate, from ConstrainedPoseSolver.last_distance
 
         Returns:
             Standard deviations used, or None if measurement was rejected
@@ -263,6 +455,30 @@ class Vision(commands2.Subsystem):
                     if 17 <= tag_id <= 22:
                         return None
 
+        if strategy == PoseStrategy.GYRO_CONSTRAINED:
+            # Heading came from the gyro, so only translation is corrected and the
+            # estimate stays usable well past the single-tag PnP cutoff. The
+            # distance only covers the targets the solver used
+            distance_to_target = distance
+            if distance_to_target > VisionConstants.CONSTRAINED_MAX_DISTANCE:
+                return None
+
+            xy_std_dev = VisionConstants.CONSTRAINED_XY_STD_DEV * (
+                1 + distance_to_target * distance_to_target / 30
+            )
+            std_devs = [
+                xy_std_dev,
+                xy_std_dev,
+                VisionConstants.CONSTRAINED_THETA_STD_DEV,
+            ]
+            self.nt.putNumber(f"stdDev/{camera_name}", xy_std_dev)
+            self.nt.putNumber(f"tagCount/{camera_name}", tag_count)
+            self.nt.putNumber(f"DistanceToTarget/{camera_name}", distance_to_target)
+            self.drive_sub.add_vision_measurement(
+                pose, vision_time, std_devs, camera_name
+            )
+            return std_devs
+
         # Check if primary tag is a reef tag
         if self.is_reef_tag(primary_id):
             distance_to_target = (
@@ -286,10 +502,11 @@ class Vision(commands2.Subsystem):
                     if distance_to_target <= 0.75:
                         std_dev = 0.1
 
+                    std_devs = [std_dev, std_dev, std_dev]
                     self.drive_sub.add_vision_measurement(
-                        pose, vision_time, [std_dev, std_dev, std_dev]
+                        pose, vision_time, std_devs, camera_name
                     )
-                    return None
+                    return std_devs
 
             elif tag_count >= 2:
                 # Multi-tag measurement commented out in original
@@ -385,6 +602,18 @@ class Vision(commands2.Subsystem):
         if self.robot_to_camera is not None:
             pass
 
-    def simulation_periodic(self):
-        """Called periodically in simulation"""
-        pass
+        self._health_publish_counter += 1
+        if (
+            self._health_publish_counter
+            >= VisionConstants.CAMERA_HEALTH_PUBLISH_PERIOD_LOOPS
+        ):
+            self._health_publish_counter = 0
+            for health in self.camera_healths:
+                health.publish()
+            self._over_budget_pub.set(self.camera_scheduler.over_budget)
+            self._vision_time_pub.set(self.camera_scheduler.elapsed() * 1000.0)
+
+    def simulationPeriodic(self):
+        """Called periodically in simulation; publishes simulated camera frames"""
+        if self.vision_sim is not None:
+            self.vision_sim.update(self.drive_sub.get_pose())
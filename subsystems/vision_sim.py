@@ -0,0 +1,125 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+from photonlibpy.simulation import PhotonCameraSim, SimCameraProperties, VisionSystemSim
+from wpilib.simulation import (
+    isTimingPaused,
+    pauseTiming,
+    resumeTiming,
+    stepTiming,
+)
+from wpimath.geometry import Pose2d
+
+from utils import VisionConstants
+from subsystems.vision import Vision
+
+
+class VisionSim:
+    """
+    PhotonVision simulation backend for the four swerve cameras.
+
+    Each camera of the given Vision subsystem gets a PhotonCameraSim mounted
+    with the same robot-to-camera transform its pose estimator uses, and the
+    AprilTags of the Vision field layout are added as targets. Calling
+    update() with the simulated robot pose publishes noisy, latent results
+    over NetworkTables exactly as the real coprocessors would, so the whole
+    vision/fusion path runs unchanged in simulation.
+
+    This lives outside the subsystems package exports because importing
+    photonlibpy's simulation module pulls in OpenCV and cscore.
+    """
+
+    def __init__(self, vision: Vision, seed: Optional[int] = None):
+        """
+        Args:
+            vision: Vision subsystem whose cameras should be simulated
+            seed: Seed for the pixel and latency noise, for reproducible runs
+        """
+        self.vision = vision
+
+        if seed is not None:
+            np.random.seed(seed)
+
+        self.vision_system_sim = VisionSystemSim("main")
+        self.vision_system_sim.addAprilTags(vision.get_layout())
+
+        self.camera_sims: List[PhotonCameraSim] = []
+        for camera, estimator in vision.cameras:
+            camera_sim = PhotonCameraSim(
+                camera,
+                self.make_camera_properties(),
+                vision.get_layout(),
+            )
+            self.vision_system_sim.addCamera(camera_sim, estimator.robotToCamera)
+            self.camera_sims.append(camera_sim)
+
+    @staticmethod
+    def make_camera_properties() -> SimCameraProperties:
+        """Camera calibration, noise and latency used for every simulated camera"""
+        props = SimCameraProperties.OV9281_1280_720()
+        props.setFPS(VisionConstants.SIM_CAMERA_FPS)
+        props.setCalibError(
+            VisionConstants.SIM_CALIB_ERROR_AVG_PX,
+            VisionConstants.SIM_CALIB_ERROR_STD_DEV_PX,
+        )
+        # photonlibpy treats these as seconds despite the parameter names
+        props.setAvgLatency(VisionConstants.SIM_AVG_LATENCY_SECONDS)
+        props.setLatencyStdDev(VisionConstants.SIM_LATENCY_STD_DEV_SECONDS)
+        return props
+
+    def reset_pose(self, pose: Pose2d):
+        """Clear the pose history, e.g. after the drivetrain pose is reset"""
+        self.vision_system_sim.resetRobotPose(pose)
+
+    def update(self, robot_pose: Pose2d):
+        """
+        Render tag detections from the simulated robot pose.
+
+        Cameras only publish a new frame when their simulated frame period has
+        elapsed, so this is safe to call every loop.
+
+        Args:
+            robot_pose: Ground-truth robot pose in the simulation
+        """
+        self.vision_system_sim.update(robot_pose)
+
+    def run_batch(
+        self,
+        poses: Sequence[Pose2d],
+        period: float = 0.02,
+        process: bool = True,
+    ) -> int:
+        """
+        Run the vision simulation over a trajectory faster than real time.
+
+        Simulated time is paused and stepped manually by period for every pose,
+        so camera frame rates and latencies stay consistent no matter how fast
+        the host runs.
+
+        Args:
+            poses: Ground-truth robot poses, one per loop
+            period: Simulated time between poses in seconds
+            process: Also run the Vision localization pipeline each loop
+
+        Returns:
+            Number of vision measurements accepted by the pose estimator
+        """
+        was_paused = isTimingPaused()
+        pauseTiming()
+        accepted_before = sum(
+            health.measurements_accepted for health in self.vision.camera_healths
+        )
+        try:
+            for pose in poses:
+                stepTiming(period)
+                self.update(pose)
+                if process:
+                    self.vision.update_vision_localization(pose)
+        finally:
+            if not was_paused:
+                resumeTiming()
+
+        return (
+            sum(health.measurements_accepted for health in self.vision.camera_healths)
+            - accepted_before
+        )
@@ -0,0 +1,62 @@
+"""
+Tests for ConstrainedPoseSolver, which needs no hardware or simulation.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from robotpy_apriltag import AprilTag, AprilTagFieldLayout
+from wpimath.geometry import (
+    Pose3d,
+    Rotation2d,
+    Rotation3d,
+    Transform3d,
+    Translation3d,
+)
+
+from utils.constrained_pose_solver import ConstrainedPoseSolver
+
+
+def _layout() -> AprilTagFieldLayout:
+    tag = AprilTag()
+    tag.ID = 5
+    tag.pose = Pose3d(5, 0, 0, Rotation3d())
+    return AprilTagFieldLayout([tag], 16.5, 8.0)
+
+
+def _target(fiducial_id: int, distance: float) -> SimpleNamespace:
+    return SimpleNamespace(
+        fiducialId=fiducial_id,
+        yaw=0.0,
+        pitch=0.0,
+        bestCameraToTarget=Transform3d(Translation3d(distance, 0, 0), Rotation3d()),
+    )
+
+
+def _solve(*targets: SimpleNamespace):
+    solver = ConstrainedPoseSolver(_layout(), Transform3d())
+    return solver.solve(SimpleNamespace(targets=list(targets)), Rotation2d(0))
+
+
+def test_single_known_tag():
+    pose = _solve(_target(5, 5.0))
+    assert pose.X() == pytest.approx(0.0)
+    assert pose.Y() == pytest.approx(0.0)
+
+
+def test_mixed_valid_and_invalid_targets():
+    # Negative, out of range, missing from the layout and unranged targets
+    # are skipped without disturbing the one usable target
+    pose = _solve(
+        _target(-1, 3.0),
+        _target(5, 5.0),
+        _target(99, 3.0),
+        _target(3, 3.0),
+        _target(5, 0.0),
+    )
+    assert pose.X() == pytest.approx(0.0)
+    assert pose.Y() == pytest.approx(0.0)
+
+
+def test_no_usable_target():
+    assert _solve(_target(-1, 3.0), _target(3, 3.0)) is None
@@ -0,0 +1,43 @@
+"""
+Tests for tools.log_index on logs written by WPILib's DataLogManager.
+"""
+
+import time
+
+import ntcore
+import pytest
+from wpilib import DataLogManager
+from wpimath.geometry import Pose2d
+
+from tools.log_index import LogIndex
+
+
+@pytest.fixture(scope="module")
+def datalog_path(tmp_path_factory) -> str:
+    """A DataLogManager log of a Pose2d struct published to NetworkTables"""
+    directory = tmp_path_factory.mktemp("datalog")
+    DataLogManager.start(str(directory), "poses.wpilog")
+    instance = ntcore.NetworkTableInstance.getDefault()
+    publisher = instance.getStructTopic("DriveState/Pose", Pose2d).publish()
+    for i in range(10):
+        publisher.set(Pose2d(i * 0.5, 2.0, 0.25))
+        instance.flush()
+        time.sleep(0.02)
+    # NetworkTables values reach the log from a listener thread
+    time.sleep(0.5)
+    DataLogManager.stop()
+    publisher.close()
+    return str(directory / "poses.wpilog")
+
+
+def test_networktables_struct_is_decoded(datalog_path):
+    with LogIndex(datalog_path) as index:
+        assert index.find("DriveState/Pose").type == "struct:Pose2d"
+        _, poses = index.query("DriveState/Pose")
+
+    assert poses.dtype.names == ("translation", "rotation")
+    assert poses["translation"]["x"].tolist() == pytest.approx(
+        [i * 0.5 for i in range(10)]
+    )
+    assert poses["translation"]["y"] == pytest.approx(2.0)
+    assert poses["rotation"]["value"] == pytest.approx(0.25)
@@ -0,0 +1 @@
+"""Off-robot analysis tools; run with ``python -m tools.<name>`` from the project root."""
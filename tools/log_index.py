@@ -0,0 +1,655 @@
+"""
+Index robot logs for fast time range queries.
+
+Reads the .rlog files written by StructuredLogger and WPILib .wpilog files,
+e.g. from DataLogManager. Hoot files must first be converted to wpilog with
+CTRE's owlet (``owlet -f wpilog match.hoot match.wpilog``).
+
+The first time a log is read, one pass over it builds a sidecar index next
+to it (``<log>.idx.npz``) holding, for every signal, the time and byte
+offset of each sample, sorted by time. Later queries memory-map the log,
+binary search the times and gather just the requested samples, so a query
+costs the same whether the log is a few seconds or a whole day. An index is
+rebuilt when its log changes size or modification time. Missing indexes in a
+collection are built in parallel.
+
+Queries return NumPy arrays. Numbers become 1-D arrays, numeric arrays of a
+constant length become 2-D arrays and structs such as Pose2d become
+structured arrays with one field per struct member, decoded from the
+schemas stored in the log.
+
+Usage::
+
+    python -m tools.log_index logs/ --list
+    python -m tools.log_index logs/ -s DriveState/Pose --start 15 --end 20
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.structured_log import (
+    BLOCK_HEADER,
+    BLOCK_METADATA,
+    BLOCK_RECORDS,
+    BLOCK_SIGNALS,
+    FILE_EXTENSION,
+    FILE_HEADER,
+    FILE_MAGIC,
+    RECORD,
+)
+
+INDEX_SUFFIX = ".idx.npz"
+INDEX_VERSION = 3
+WPILOG_EXTENSION = ".wpilog"
+LOG_EXTENSIONS = (FILE_EXTENSION, WPILOG_EXTENSION)
+
+RLOG_RECORD_DTYPE = np.dtype([("time", "<f8"), ("signal", "<u4"), ("value", "<f8")])
+"""Layout of utils.structured_log.RECORD"""
+
+_SCALAR_DTYPES = {
+    "double": np.dtype("<f8"),
+    "float": np.dtype("<f4"),
+    "int64": np.dtype("<i8"),
+    "boolean": np.dtype("?"),
+}
+_ARRAY_DTYPES = {f"{name}[]": dtype for name, dtype in _SCALAR_DTYPES.items()}
+_STRUCT_PRIMITIVES = {
+    "bool": "?",
+    "char": "S1",
+    "int8": "i1",
+    "int16": "<i2",
+    "int32": "<i4",
+    "int64": "<i8",
+    "uint8": "u1",
+    "uint16": "<u2",
+    "uint32": "<u4",
+    "uint64": "<u8",
+    "float": "<f4",
+    "float32": "<f4",
+    "double": "<f8",
+    "float64": "<f8",
+}
+_SCHEMA_PREFIX = "/.schema/"
+_NT_PREFIX = "NT:"
+
+
+def _wpilog_header_structs() -> List[Optional[struct.Struct]]:
+    """
+    Parser for the entry id, payload size and timestamp after every possible
+    wpilog record header byte, or None where a field has an odd width.
+    """
+    formats = {1: "B", 2: "H", 4: "I", 8: "Q"}
+    structs: List[Optional[struct.Struct]] = []
+    for header in range(256):
+        widths = (
+            (header & 0x3) + 1,
+            ((header >> 2) & 0x3) + 1,
+            ((header >> 4) & 0x7) + 1,
+        )
+        if all(width in formats for width in widths):
+            structs.append(
+                struct.Struct("<" + "".join(formats[width] for width in widths))
+            )
+        else:
+            structs.append(None)
+    return structs
+
+
+_WPILOG_HEADERS = _wpilog_header_structs()
+
+
+class SignalInfo:
+    """One signal in a log"""
+
+    def __init__(self, key: int, name: str, type: str, unit: str = ""):
+        """
+        Args:
+            key: Index of the signal's arrays in the sidecar index
+            name: Signal name as logged
+            type: WPILib data log type, e.g. "double" or "struct:Pose2d"
+            unit: Unit or entry metadata
+        """
+        self.key = key
+        self.name = name
+        self.type = type
+        self.unit = unit
+
+
+class _Scan:
+    """Every sample of a log in file order, as found by one pass over it"""
+
+    def __init__(self):
+        self.signals: List[SignalInfo] = []
+        self.schemas: Dict[str, str] = {}
+        self.metadata: Dict[str, object] = {}
+        self.keys = array("q")
+        self.times = array("d")
+        self.offsets = array("q")
+        self.sizes = array("q")
+
+
+def _scan_rlog(data: mmap.mmap) -> _Scan:
+    """Find every record of a StructuredLogger file"""
+    magic, _, record_size = FILE_HEADER.unpack_from(data, 0)
+    if magic != FILE_MAGIC or record_size != RECORD.size:
+        raise ValueError("not a StructuredLogger log")
+
+    scan = _Scan()
+    keys, times, offsets = [], [], []
+    value_offset = RLOG_RECORD_DTYPE.fields["value"][1]
+    offset = FILE_HEADER.size
+    while offset + BLOCK_HEADER.size <= len(data):
+        kind, size = BLOCK_HEADER.unpack_from(data, offset)
+        offset += BLOCK_HEADER.size
+        # A log that is still being written may end in a partial block
+        if offset + size > len(data):
+            break
+        if kind == BLOCK_METADATA:
+            scan.metadata = json.loads(data[offset : offset + size])
+        elif kind == BLOCK_SIGNALS:
+            for signal, name, unit in json.loads(data[offset : offset + size]):
+                scan.signals.append(SignalInfo(signal, name, "double", unit))
+        elif kind == BLOCK_RECORDS:
+            records = np.frombuffer(
+                data, RLOG_RECORD_DTYPE, size // RECORD.size, offset
+            )
+            keys.append(records["signal"].astype(np.int64))
+            times.append(records["time"].copy())
+            offsets.append(
+                offset + value_offset + np.arange(len(records)) * RECORD.size
+            )
+        offset += size
+
+    if keys:
+        scan.keys = np.concatenate(keys)
+        scan.times = np.concatenate(times)
+        scan.offsets = np.concatenate(offsets)
+    scan.sizes = np.full(len(scan.keys), 8)
+    return scan
+
+
+def _scan_wpilog(data: mmap.mmap) -> _Scan:
+    """Find every data record of a WPILib data log"""
+    if data[:6] != b"WPILOG":
+        raise ValueError("not a WPILib data log")
+    _, extra_header_size = struct.unpack_from("<HI", data, 6)
+
+    scan = _Scan()
+    extra_header = data[12 : 12 + extra_header_size].decode(errors="replace")
+    if extra_header:
+        scan.metadata["extra_header"] = extra_header
+    signal_keys: Dict[str, int] = {}
+    # Entry ids are reused after a finish record, so map them to signals
+    entries: Dict[int, int] = {}
+    schema_entries: Dict[int, str] = {}
+
+    keys, times, offsets, sizes = scan.keys, scan.times, scan.offsets, scan.sizes
+    end = len(data)
+    offset = 12 + extra_header_size
+    while offset < end:
+        header = data[offset]
+        parser = _WPILOG_HEADERS[header]
+        if parser is not None:
+            if offset + 1 + parser.size > end:
+                break
+            entry, size, timestamp = parser.unpack_from(data, offset + 1)
+            offset += 1 + parser.size
+        else:
+            fields = []
+            offset += 1
+            for width in (
+                (header & 0x3) + 1,
+                ((header >> 2) & 0x3) + 1,
+                ((header >> 4) & 0x7) + 1,
+            ):
+                fields.append(int.from_bytes(data[offset : offset + width], "little"))
+                offset += width
+            entry, size, timestamp = fields
+        # A log that is still being written may end in a partial record
+        if offset + size > end:
+            break
+
+        if entry == 0:
+            if data[offset] == 0:
+                _start_entry(data, offset, scan, signal_keys, entries, schema_entries)
+        elif entry in entries:
+            if entry in schema_entries:
+                scan.schemas[schema_entries[entry]] = data[
+                    offset : offset + size
+                ].decode()
+            keys.append(entries[entry])
+            times.append(timestamp * 1e-6)
+            offsets.append(offset)
+            sizes.append(size)
+        offset += size
+    return scan
+
+
+def _start_entry(
+    data: mmap.mmap,
+    offset: int,
+    scan: _Scan,
+    signal_keys: Dict[str, int],
+    entries: Dict[int, int],
+    schema_entries: Dict[int, str],
+):
+    """Apply a wpilog start control record at offset"""
+    entry, name_size = struct.unpack_from("<II", data, offset + 1)
+    offset += 9
+    name = data[offset : offset + name_size].decode()
+    offset += name_size
+    (type_size,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    type_name = data[offset : offset + type_size].decode()
+    offset += type_size
+    (metadata_size,) = struct.unpack_from("<I", data, offset)
+    metadata = data[offset + 4 : offset + 4 + metadata_size].decode()
+
+    key = signal_keys.get(name)
+    if key is None:
+        key = signal_keys[name] = len(scan.signals)
+        scan.signals.append(SignalInfo(key, name, type_name, metadata))
+    entries[entry] = key
+    # DataLogManager logs NetworkTables schemas as "NT:/.schema/struct:..."
+    schema_name = name.removeprefix(_NT_PREFIX)
+    if schema_name.startswith(_SCHEMA_PREFIX):
+        schema_entries[entry] = schema_name[len(_SCHEMA_PREFIX) :]
+    else:
+        schema_entries.pop(entry, None)
+
+
+def _struct_dtype(type_name: str, schemas: Dict[str, str]) -> Optional[np.dtype]:
+    """
+    NumPy dtype of a WPILib struct, or None if its schema is missing or uses
+    bit-fields.
+    """
+    schema = schemas.get(type_name)
+    if schema is None:
+        return None
+    fields = []
+    for declaration in schema.split(";"):
+        declaration = declaration.strip()
+        if not declaration:
+            continue
+        if declaration.startswith("enum"):
+            declaration = declaration[declaration.index("}") + 1 :].strip()
+        match = re.fullmatch(r"(\w+)\s+(\w+)\s*(?:\[\s*(\d+)\s*\])?", declaration)
+        if match is None:
+            return None
+        kind, name, count = match.groups()
+        dtype = _STRUCT_PRIMITIVES.get(kind)
+        if dtype is None:
+            dtype = _struct_dtype(f"struct:{kind}", schemas)
+            if dtype is None:
+                return None
+        fields.append((name, dtype, (int(count),)) if count else (name, dtype))
+    return np.dtype(fields)
+
+
+def index_path(path: str) -> str:
+    """Sidecar index file of a log"""
+    return path + INDEX_SUFFIX
+
+
+def _source_stamp(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def index_is_current(path: str) -> bool:
+    """Whether a log has an index built from its current contents"""
+    try:
+        with np.load(index_path(path)) as index:
+            meta = json.loads(str(index["meta"]))
+    except (OSError, KeyError, ValueError):
+        return False
+    return meta.get("version") == INDEX_VERSION and meta.get("source") == _source_stamp(
+        path
+    )
+
+
+def build_index(path: str) -> str:
+    """
+    Scan a log and write its sidecar index.
+
+    Args:
+        path: Path to a .rlog or .wpilog file
+
+    Returns:
+        Path of the index
+
+    Raises:
+        ValueError: If the file is not a log this tool reads
+    """
+    stamp = _source_stamp(path)
+    with (
+        open(path, "rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+    ):
+        scan = _scan_rlog(data) if path.endswith(FILE_EXTENSION) else _scan_wpilog(data)
+
+    keys = np.asarray(scan.keys, np.int64)
+    times = np.asarray(scan.times, np.float64)
+    offsets = np.asarray(scan.offsets, np.int64)
+    sizes = np.asarray(scan.sizes, np.int64)
+
+    # Group by signal, in time order within each signal
+    order = np.lexsort((times, keys))
+    keys, times, offsets, sizes = (
+        keys[order],
+        times[order],
+        offsets[order],
+        sizes[order],
+    )
+    bounds = np.searchsorted(keys, np.arange(len(scan.signals) + 1))
+
+    arrays = {}
+    for signal in scan.signals:
+        start, stop = bounds[signal.key], bounds[signal.key + 1]
+        arrays[f"t{signal.key}"] = times[start:stop]
+        arrays[f"o{signal.key}"] = offsets[start:stop]
+        if signal.type not in _SCALAR_DTYPES:
+            arrays[f"s{signal.key}"] = sizes[start:stop].astype(np.int32)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "source": stamp,
+        "signals": [
+            [signal.key, signal.name, signal.type, signal.unit]
+            for signal in scan.signals
+        ],
+        "schemas": scan.schemas,
+        "metadata": scan.metadata,
+    }
+    destination = index_path(path)
+    # Written under a temporary name so a reader never sees half an index
+    temporary = destination + ".tmp.npz"
+    np.savez(temporary, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(temporary, destination)
+    return destination
+
+
+def find_logs(paths: Sequence[str]) -> List[str]:
+    """Every log in a list of files and directories, searched recursively"""
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                logs.extend(
+                    os.path.join(directory, name)
+                    for name in files
+                    if name.endswith(LOG_EXTENSIONS)
+                )
+        else:
+            logs.append(path)
+    return sorted(logs)
+
+
+def build_indexes(
+    logs: Sequence[str], jobs: Optional[int] = None, rebuild: bool = False
+) -> Dict[str, str]:
+    """
+    Build the missing or stale indexes of many logs, in parallel processes.
+
+    Args:
+        logs: Log paths
+        jobs: Worker processes; defaults to one per CPU
+        rebuild: Rebuild indexes that are current too
+
+    Returns:
+        Why each log that could not be indexed failed
+    """
+    stale = [log for log in logs if rebuild or not index_is_current(log)]
+    failures: Dict[str, str] = {}
+    if len(stale) > 1 and jobs != 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            futures = [(log, pool.submit(build_index, log)) for log in stale]
+            for log, future in futures:
+                try:
+                    future.result()
+                except (OSError, ValueError, struct.error) as error:
+                    failures[log] = str(error)
+    else:
+        for log in stale:
+            try:
+                build_index(log)
+            except (OSError, ValueError, struct.error) as error:
+                failures[log] = str(error)
+    return failures
+
+
+class LogIndex:
+    """
+    Range queries over one indexed log.
+
+    The log is memory-mapped and the index's arrays are loaded one signal at
+    a time, the first time that signal is queried.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a log, building its index first if it is missing or stale.
+
+        Args:
+            path: Path to a .rlog or .wpilog file
+        """
+        if not index_is_current(path):
+            build_index(path)
+        self.path = path
+        self._index = np.load(index_path(path))
+        meta = json.loads(str(self._index["meta"]))
+        self.signals: Dict[str, SignalInfo] = {
+            name: SignalInfo(key, name, type_name, unit)
+            for key, name, type_name, unit in meta["signals"]
+        }
+        self._schemas: Dict[str, str] = meta["schemas"]
+        # What the log says about itself, e.g. the match of a StructuredLogger file
+        self.metadata: Dict[str, object] = meta["metadata"]
+
+        # Held open for the memory map until close()
+        self._file = open(path, "rb")  # noqa: SIM115
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._bytes = np.frombuffer(self._data, np.uint8)
+
+    def __enter__(self) -> "LogIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the memory map and the index"""
+        # The map can only be closed once no array refers to it
+        del self._bytes
+        self._data.close()
+        self._file.close()
+        self._index.close()
+
+    def find(self, name: str) -> Optional[SignalInfo]:
+        """
+        Look up a signal, also under the names DataLogManager gives
+        NetworkTables topics, so "DriveState/Pose" finds "NT:/DriveState/Pose".
+        """
+        for candidate in (name, f"NT:/{name.lstrip('/')}", f"NT:{name}"):
+            signal = self.signals.get(candidate)
+            if signal is not None:
+                return signal
+        return None
+
+    def count(self, name: str) -> int:
+        """Number of samples of a signal"""
+        signal = self.find(name)
+        return 0 if signal is None else len(self._index[f"t{signal.key}"])
+
+    def time_range(self, name: str) -> Tuple[float, float]:
+        """First and last sample time of a signal, or NaNs if it has none"""
+        signal = self.find(name)
+        times = self._index[f"t{signal.key}"] if signal else np.empty(0)
+        if len(times) == 0:
+            return float("nan"), float("nan")
+        return float(times[0]), float(times[-1])
+
+    def query(
+        self,
+        name: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Samples of a signal between two times, inclusive.
+
+        Args:
+            name: Signal name
+            start: First time in seconds; defaults to the start of the log
+            end: Last time in seconds; defaults to the end of the log
+
+        Returns:
+            Sample times in seconds and their values
+
+        Raises:
+            KeyError: If the log has no such signal
+        """
+        signal = self.find(name)
+        if signal is None:
+            raise KeyError(f"{self.path} has no signal {name!r}")
+
+        times = self._index[f"t{signal.key}"]
+        first = 0 if start is None else np.searchsorted(times, start, "left")
+        last = len(times) if end is None else np.searchsorted(times, end, "right")
+        offsets = self._index[f"o{signal.key}"][first:last]
+        sizes = (
+            self._index[f"s{signal.key}"][first:last]
+            if signal.type not in _SCALAR_DTYPES
+            else None
+        )
+        return times[first:last], self._decode(signal.type, offsets, sizes)
+
+    def _gather(self, offsets: np.ndarray, width: int) -> np.ndarray:
+        """Bytes of fixed-width samples as an (n, width) array"""
+        return self._bytes[offsets[:, None] + np.arange(width)]
+
+    def _decode(
+        self, type_name: str, offsets: np.ndarray, sizes: Optional[np.ndarray]
+    ) -> np.ndarray:
+        dtype = _SCALAR_DTYPES.get(type_name)
+        if dtype is not None:
+            return self._gather(offsets, dtype.itemsize).view(dtype).reshape(-1)
+
+        if type_name in _ARRAY_DTYPES:
+            dtype = _ARRAY_DTYPES[type_name]
+        elif type_name.startswith("struct:"):
+            dtype = _struct_dtype(type_name.removesuffix("[]"), self._schemas)
+        if dtype is not None:
+            is_array = type_name.endswith("[]")
+            if len(offsets) == 0:
+                return np.empty((0, 0) if is_array else 0, dtype)
+            width = int(sizes[0])
+            if np.all(sizes == width) and width % dtype.itemsize == 0:
+                values = self._gather(offsets, width).view(dtype)
+                return values if is_array else values.reshape(-1)
+            return self._objects(
+                [self._data[o : o + s] for o, s in zip(offsets, sizes)],
+                lambda raw: np.frombuffer(raw, dtype),
+            )
+
+        raw = [self._data[o : o + s] for o, s in zip(offsets, sizes)]
+        if type_name in ("string", "json"):
+            return self._objects(raw, lambda value: value.decode())
+        return self._objects(raw, lambda value: value)
+
+    @staticmethod
+    def _objects(raw: List[bytes], convert) -> np.ndarray:
+        values = np.empty(len(raw), dtype=object)
+        for i, value in enumerate(raw):
+            values[i] = convert(value)
+        return values
+
+
+def _describe(times: np.ndarray, values: np.ndarray) -> str:
+    """Sample count and time span, plus the value range of numeric samples"""
+    if len(times) == 0:
+        return "0 samples"
+    text = f"{len(times)} samples {times[0]:.3f}-{times[-1]:.3f} s"
+    if values.ndim == 1 and values.dtype.kind in "biuf":
+        numbers = values.astype(np.float64)
+        text += (
+            f"  min {numbers.min():.4g} mean {numbers.mean():.4g}"
+            f" max {numbers.max():.4g}"
+        )
+    return text
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Index robot logs and query signals over a time range"
+    )
+    parser.add_argument("paths", nargs="+", help="log files or directories")
+    parser.add_argument(
+        "-s",
+        "--signal",
+        action="append",
+        default=[],
+        help="signal to query; may be given more than once",
+    )
+    parser.add_argument("--start", type=float, help="first time in seconds")
+    parser.add_argument("--end", type=float, help="last time in seconds")
+    parser.add_argument(
+        "--list", action="store_true", help="list the signals of every log"
+    )
+    parser.add_argument(
+        "--dump", action="store_true", help="print every sample, not a summary"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="processes building indexes (default one per CPU)",
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="rebuild indexes that are current"
+    )
+    args = parser.parse_args(argv)
+
+    logs = find_logs(args.paths)
+    if not logs:
+        print("# no logs found", file=sys.stderr)
+        return 1
+    failures = build_indexes(logs, args.jobs, args.rebuild)
+    for log, reason in failures.items():
+        print(f"# could not index {log}: {reason}", file=sys.stderr)
+
+    for log in logs:
+        if log in failures:
+            continue
+        with LogIndex(log) as index:
+            print(log)
+            if args.list:
+                for signal in sorted(index.signals.values(), key=lambda s: s.name):
+                    first, last = index.time_range(signal.name)
+                    print(
+                        f"  {signal.name:<48} {signal.type:<24} "
+                        f"{index.count(signal.name):8d} {first:9.3f} {last:9.3f}"
+                    )
+            for name in args.signal:
+                if index.find(name) is None:
+                    print(f"  {name}: not logged")
+                    continue
+                times, values = index.query(name, args.start, args.end)
+                print(f"  {name}: {_describe(times, values)}")
+                if args.dump:
+                    for time, value in zip(times, values):
+                        print(f"    {time:.6f} {value}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+Summarize robot performance across many recorded matches.
+
+Every log in the given files and directories is analyzed in its own worker
+process, using tools.log_index (indexes are built on the way if missing).
+From the signals StructuredLogger records, each log gets one row of
+metrics:
+
+- enabled time, top drive speed, distance driven and peak turn rate
+- intake cycles, counted from each start of the rollers, and the median
+  time between them
+- the fraction of vision measurements accepted into the pose estimate
+- loop overruns and the 99th percentile loop period while enabled
+- peak total current
+
+Metrics whose signals a log lacks are left empty. WPILib logs are read
+too; their drive metrics come from the DriveState struct topics and the
+turn rate also from Rotational_Rate.
+
+The rows are printed and can be written to CSV. With --by-event, the
+median of every metric per event is printed in event order, and changes
+for the worse of more than --tolerance against the previous event are
+flagged, so regressions from one event to the next stand out.
+
+Usage::
+
+    python -m tools.match_analytics logs/ --output summary.csv
+    python -m tools.match_analytics season/ --by-event
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tools.log_index import LogIndex, find_logs
+
+LOOP_OVERRUN_SECONDS = 0.025
+"""Loop periods longer than this count as overruns; nominal is 0.02"""
+
+MAX_POSE_STEP_METERS = 1.0
+"""Pose jumps larger than this between samples are resets, not driving"""
+
+DEFAULT_TOLERANCE = 0.1
+"""Relative change for the worse of an event median that is flagged"""
+
+
+class Metric:
+    """One column of the summary"""
+
+    def __init__(self, key: str, header: str, fmt: str, higher_is_better: bool):
+        """
+        Args:
+            key: Key in the metrics of a log
+            header: Column header
+            fmt: Format spec of a value
+            higher_is_better: Whether a larger value is an improvement
+        """
+        self.key = key
+        self.header = header
+        self.fmt = fmt
+        self.higher_is_better = higher_is_better
+
+
+METRICS = [
+    Metric("enabled_s", "enabled s", ".0f", True),
+    Metric("top_speed", "top m/s", ".2f", True),
+    Metric("distance", "dist m", ".0f", True),
+    Metric("max_turn_rate", "turn rad/s", ".2f", True),
+    Metric("cycles", "cycles", ".0f", True),
+    Metric("median_cycle_s", "cycle s", ".2f", False),
+    Metric("vision_accept", "vision %", ".0%", True),
+    Metric("overruns", "overruns", ".0f", False),
+    Metric("p99_loop_ms", "p99 loop ms", ".1f", False),
+    Metric("peak_current", "peak A", ".0f", False),
+]
+
+
+def _first(index: LogIndex, names: Sequence[str]) -> Optional[str]:
+    """The first of several possible names of a signal that the log has"""
+    for name in names:
+        if index.find(name) is not None and index.count(name) > 0:
+            return name
+    return None
+
+
+def _while_enabled(
+    times: np.ndarray,
+    enabled_times: Optional[np.ndarray],
+    enabled: Optional[np.ndarray],
+) -> np.ndarray:
+    """Mask of the samples taken while the robot was enabled"""
+    if enabled_times is None or len(enabled_times) == 0:
+        return np.ones(len(times), dtype=bool)
+    state = np.searchsorted(enabled_times, times, side="right") - 1
+    return (state >= 0) & (enabled[np.maximum(state, 0)] > 0.5)
+
+
+def _query_struct(
+    index: LogIndex, name: str, fields: Sequence[str]
+) -> Optional[np.ndarray]:
+    """
+    Values of a struct signal, or None if the log lacks it or the struct
+    could not be decoded, e.g. because its schema is missing from the log
+    """
+    if not _first(index, [name]):
+        return None
+    _, values = index.query(name)
+    names = values.dtype.names
+    if names is None or any(field not in names for field in fields):
+        return None
+    return values
+
+
+def _drive_metrics(index: LogIndex, metrics: Dict[str, float]):
+    vx = vy = omega = np.empty(0)
+    if _first(index, ["DriveState/SpeedX"]):
+        _, vx = index.query("DriveState/SpeedX")
+        _, vy = index.query("DriveState/SpeedY")
+        _, omega = index.query("DriveState/AngularSpeed")
+    else:
+        speeds = _query_struct(index, "DriveState/Speeds", ["vx", "vy", "omega"])
+        if speeds is not None:
+            vx, vy, omega = speeds["vx"], speeds["vy"], speeds["omega"]
+    if len(vx):
+        count = min(len(vx), len(vy))
+        metrics["top_speed"] = float(np.hypot(vx[:count], vy[:count]).max())
+    if len(omega):
+        metrics["max_turn_rate"] = float(np.abs(omega).max())
+    elif _first(index, ["Rotational_Rate"]):
+        _, rate = index.query("Rotational_Rate")
+        metrics["max_turn_rate"] = float(np.abs(rate).max())
+
+    if _first(index, ["DriveState/PoseX"]):
+        _, x = index.query("DriveState/PoseX")
+        _, y = index.query("DriveState/PoseY")
+    else:
+        pose = _query_struct(index, "DriveState/Pose", ["translation"])
+        if pose is None:
+            return
+        x, y = pose["translation"]["x"], pose["translation"]["y"]
+    count = min(len(x), len(y))
+    steps = np.hypot(np.diff(x[:count]), np.diff(y[:count]))
+    metrics["distance"] = float(steps[steps < MAX_POSE_STEP_METERS].sum())
+
+
+def analyze_log(path: str) -> Dict[str, Any]:
+    """
+    Compute the metrics of one log.
+
+    Args:
+        path: Path to a .rlog or .wpilog file
+
+    Returns:
+        Value of every metric the log has the signals for, and the event,
+        match and start time of the log
+    """
+    metrics: Dict[str, Any] = {}
+    with LogIndex(path) as index:
+        enabled_times = enabled = None
+        if _first(index, ["Robot/Enabled"]):
+            enabled_times, enabled = index.query("Robot/Enabled")
+
+        if _first(index, ["Robot/LoopPeriod"]):
+            times, periods = index.query("Robot/LoopPeriod")
+            periods = periods[_while_enabled(times, enabled_times, enabled)]
+            metrics["enabled_s"] = float(periods.sum())
+            if len(periods):
+                metrics["overruns"] = float(np.sum(periods > LOOP_OVERRUN_SECONDS))
+                metrics["p99_loop_ms"] = float(np.percentile(periods, 99) * 1000)
+
+        _drive_metrics(index, metrics)
+
+        if _first(index, ["Intake/TargetVelocity"]):
+            times, target = index.query("Intake/TargetVelocity")
+            running = target > 0
+            starts = times[1:][running[1:] & ~running[:-1]]
+            metrics["cycles"] = float(len(starts))
+            if len(starts) > 1:
+                metrics["median_cycle_s"] = float(np.median(np.diff(starts)))
+
+        if _first(index, ["Vision/Accepted"]):
+            _, accepted = index.query("Vision/Accepted")
+            metrics["vision_accept"] = float(accepted.mean())
+
+        if _first(index, ["Power/TotalCurrent"]):
+            _, current = index.query("Power/TotalCurrent")
+            metrics["peak_current"] = float(current.max())
+
+        metrics["event"] = str(index.metadata.get("event") or "")
+        metrics["match"] = str(index.metadata.get("label") or "")
+        metrics["started"] = float(
+            index.metadata.get("started") or os.path.getmtime(path)
+        )
+    return metrics
+
+
+def _analyze(path: str) -> Tuple[str, Optional[Dict[str, Any]], str]:
+    """
+    analyze_log for a worker process, returning failures instead of raising,
+    so one unreadable log does not abort the whole batch
+    """
+    try:
+        return path, analyze_log(path), ""
+    except Exception as error:
+        return path, None, f"{type(error).__name__}: {error}"
+
+
+def analyze_logs(
+    logs: Sequence[str], jobs: Optional[int] = None
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Analyze many logs in parallel processes.
+
+    Args:
+        logs: Log paths
+        jobs: Worker processes; defaults to one per CPU
+
+    Returns:
+        Metrics of every log that could be read, and why the others failed
+    """
+    if jobs == 1 or len(logs) < 2:
+        results = [_analyze(log) for log in logs]
+    else:
+        with ProcessPoolExecutor(jobs) as pool:
+            results = list(pool.map(_analyze, logs))
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    failures: Dict[str, str] = {}
+    for path, metrics, error in results:
+        if metrics is None:
+            failures[path] = error
+        else:
+            rows[path] = metrics
+    return rows, failures
+
+
+def _format(value: Optional[float], fmt: str) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "-"
+    return format(value, fmt)
+
+
+def format_table(rows: Dict[str, Dict[str, Any]], label_header: str) -> str:
+    """Aligned table of every row and metric"""
+    width = max([len(label_header)] + [len(label) for label in rows])
+    lines = [
+        f"{label_header:<{width}} "
+        + " ".join(f"{metric.header:>11}" for metric in METRICS)
+    ]
+    for label, metrics in rows.items():
+        lines.append(
+            f"{label:<{width}} "
+            + " ".join(
+                f"{_format(metrics.get(metric.key), metric.fmt):>11}"
+                for metric in METRICS
+            )
+        )
+    return "\n".join(lines)
+
+
+def event_medians(
+    rows: Dict[str, Dict[str, Any]],
+) -> Dict[str, Dict[str, float]]:
+    """
+    Median of every metric per event, in the order the events happened.
+    Logs without an event, like practice runs, are grouped by directory.
+    """
+    events: Dict[str, List[Dict[str, Any]]] = {}
+    for path, metrics in sorted(rows.items(), key=lambda row: row[1]["started"]):
+        event = metrics["event"] or os.path.basename(os.path.dirname(path)) or "."
+        events.setdefault(event, []).append(metrics)
+
+    medians = {}
+    for event, matches in events.items():
+        medians[event] = {}
+        for metric in METRICS:
+            values = [m[metric.key] for m in matches if metric.key in m]
+            if values:
+                medians[event][metric.key] = float(np.median(values))
+        medians[event]["matches"] = float(len(matches))
+    return medians
+
+
+def find_regressions(
+    medians: Dict[str, Dict[str, float]], tolerance: float = DEFAULT_TOLERANCE
+) -> List[str]:
+    """
+    Compare each event's medians with the previous event's.
+
+    Args:
+        medians: Per-event medians in event order
+        tolerance: Relative change for the worse that is reported
+
+    Returns:
+        Description of every metric that got worse
+    """
+    regressions = []
+    events = list(medians)
+    for previous, current in zip(events, events[1:]):
+        for metric in METRICS:
+            before = medians[previous].get(metric.key)
+            after = medians[current].get(metric.key)
+            if before is None or after is None or before == 0:
+                continue
+            change = (after - before) / abs(before)
+            worse = -change if metric.higher_is_better else change
+            if worse > tolerance:
+                regressions.append(
+                    f"{current}: {metric.header} {_format(after, metric.fmt)}, "
+                    f"was {_format(before, metric.fmt)} at {previous} "
+                    f"({change:+.0%})"
+                )
+    return regressions
+
+
+def write_csv(path: str, rows: Dict[str, Dict[str, Any]]):
+    """Write one line per log with its event, match and every metric"""
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["log", "event", "match"] + [m.key for m in METRICS])
+        for log, metrics in rows.items():
+            writer.writerow(
+                [log, metrics["event"], metrics["match"]]
+                + [metrics.get(metric.key, "") for metric in METRICS]
+            )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Summarize robot performance across recorded matches"
+    )
+    parser.add_argument("paths", nargs="+", help="log files or directories")
+    parser.add_argument("--output", help="CSV file to write the summary to")
+    parser.add_argument(
+        "--by-event",
+        action="store_true",
+        help="print per-event medians and flag regressions between events",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="relative change for the worse that is flagged (default %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="worker processes (default one per CPU)",
+    )
+    args = parser.parse_args(argv)
+
+    logs = find_logs(args.paths)
+    if not logs:
+        print("# no logs found", file=sys.stderr)
+        return 1
+    rows, failures = analyze_logs(logs, args.jobs)
+    for log, reason in failures.items():
+        print(f"# could not analyze {log}: {reason}", file=sys.stderr)
+
+    print(
+        format_table(
+            dict(sorted(rows.items(), key=lambda row: row[1]["started"])), "log"
+        )
+    )
+    if args.output:
+        write_csv(args.output, rows)
+        print(f"# wrote {args.output}")
+
+    if args.by_event:
+        medians = event_medians(rows)
+        print()
+        print(format_table(medians, "event"))
+        for regression in find_regressions(medians, args.tolerance):
+            print(f"# regression: {regression}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
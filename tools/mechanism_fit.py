@@ -0,0 +1,242 @@
+"""
+Batch feedforward fitting and Motion Magic tuning for the intake and spindex.
+
+Reads one or more logs written by Intake.sys_id_characterization and
+Spindex.sys_id_characterization, fits kS, kV, kA and kG for every mechanism,
+and recommends Motion Magic cruise velocity, acceleration and jerk from the
+fitted dynamics. The recommendations are printed as TalonConfig constructors
+for intake.py and spindex.py.
+
+Usage::
+
+    python -m tools.mechanism_fit logs/*.wpilog
+"""
+
+import argparse
+import math
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from tools.sysid_fit import (
+    FeedforwardGains,
+    GravityType,
+    SysIdData,
+    fit_feedforward,
+    load_sysid_log,
+)
+
+AVAILABLE_VOLTAGE = 10.0
+"""Voltage a profile may demand, leaving headroom below 12 V for battery sag"""
+
+JERK_RAMP_SECONDS = 0.05
+"""Time to ramp to full acceleration; smooths the profile at little cost in time"""
+
+
+class MechanismSpec:
+    """What to fit for one SysId routine and how its profile is used"""
+
+    def __init__(
+        self,
+        routine: str,
+        config_name: str,
+        gravity: GravityType,
+        travel: Optional[float] = None,
+        target_velocity: Optional[float] = None,
+    ):
+        """
+        Args:
+            routine: SysId routine name in the log
+            config_name: TalonConfig variable the gains belong to
+            gravity: Gravity term to fit; ELEVATOR matches the Talon's default
+                static kG
+            travel: Longest position move in rotations, for position mechanisms
+            target_velocity: Usual velocity setpoint in rotations per second,
+                for velocity mechanisms
+        """
+        self.routine = routine
+        self.config_name = config_name
+        self.gravity = gravity
+        self.travel = travel
+        self.target_velocity = target_velocity
+
+
+class MotionMagicLimits:
+    """Recommended Motion Magic limits and the move time they give"""
+
+    def __init__(
+        self, cruise_velocity: float, acceleration: float, jerk: float, move_time: float
+    ):
+        self.cruise_velocity = cruise_velocity
+        self.acceleration = acceleration
+        self.jerk = jerk
+        self.move_time = move_time
+
+
+def _mechanism_specs() -> List[MechanismSpec]:
+    from subsystems.intake import Intake
+
+    arm_positions = (
+        Intake.ARM_HOME_ROTATIONS,
+        Intake.ARM_STOWED_ROTATIONS,
+        Intake.ARM_DEPLOYED_ROTATIONS,
+    )
+    head_positions = (
+        Intake.HEAD_HOME_ROTATIONS,
+        Intake.HEAD_STOWED_ROTATIONS,
+        Intake.HEAD_DEPLOYED_ROTATIONS,
+    )
+    # Intake.set_velocity's default of 1 ft/s at the rollers
+    roller_velocity = 12 * 4 / (1.374 * math.pi)
+
+    return [
+        MechanismSpec(
+            "intake-arm",
+            "INTAKE_CONFIG_ARM",
+            GravityType.ELEVATOR,
+            travel=max(arm_positions) - min(arm_positions),
+        ),
+        MechanismSpec(
+            "intake-head",
+            "INTAKE_CONFIG_HEAD",
+            GravityType.ELEVATOR,
+            travel=max(head_positions) - min(head_positions),
+        ),
+        MechanismSpec(
+            "intake-rollers",
+            "INTAKE_CONFIG_ROLLER_TOP",
+            GravityType.NONE,
+            target_velocity=roller_velocity,
+        ),
+        MechanismSpec(
+            "spindex", "SPINDEX_CONFIG", GravityType.NONE, target_velocity=1.0
+        ),
+    ]
+
+
+def _move_time(distance: float, velocity: np.ndarray, acceleration: np.ndarray):
+    """Trapezoidal move time over distance for each velocity/acceleration pair"""
+    triangular = velocity * velocity / acceleration > distance
+    return np.where(
+        triangular,
+        2 * np.sqrt(distance / acceleration),
+        distance / velocity + velocity / acceleration,
+    )
+
+
+def recommend_motion_magic(
+    gains: FeedforwardGains,
+    spec: MechanismSpec,
+    voltage: float = AVAILABLE_VOLTAGE,
+) -> MotionMagicLimits:
+    """
+    Pick Motion Magic limits that the motor can actually follow.
+
+    While accelerating at cruise velocity v the motor needs
+    kS + kG + kV v + kA a volts, so the acceleration it can sustain drops as
+    the cruise velocity rises. For position mechanisms the cruise velocity
+    that minimizes the time of the longest move is chosen by searching over
+    that trade-off. Velocity mechanisms get the acceleration that is still
+    available at their usual target velocity.
+
+    Args:
+        gains: Fitted feedforward gains
+        spec: Mechanism being tuned
+        voltage: Voltage the profile may demand
+
+    Returns:
+        The recommended limits
+    """
+    headroom = voltage - abs(gains.kS) - abs(gains.kG)
+    if headroom <= 0 or gains.kV <= 0 or gains.kA <= 0:
+        raise ValueError(f"{spec.routine}: fitted gains leave no voltage to move")
+    max_velocity = headroom / gains.kV
+
+    if spec.travel is not None:
+        velocity = np.linspace(0.01, 0.99, 99) * max_velocity
+        acceleration = (headroom - gains.kV * velocity) / gains.kA
+        times = _move_time(spec.travel, velocity, acceleration)
+        best = int(np.argmin(times))
+        cruise_velocity = float(velocity[best])
+        max_acceleration = float(acceleration[best])
+        move_time = float(times[best])
+    else:
+        cruise_velocity = min(spec.target_velocity, 0.99 * max_velocity)
+        max_acceleration = (headroom - gains.kV * cruise_velocity) / gains.kA
+        move_time = cruise_velocity / max_acceleration
+
+    jerk = max_acceleration / JERK_RAMP_SECONDS
+    return MotionMagicLimits(
+        cruise_velocity, max_acceleration, jerk, move_time + JERK_RAMP_SECONDS
+    )
+
+
+def _round(value: float) -> float:
+    return float(f"{value:.3g}")
+
+
+def format_talon_config(
+    spec: MechanismSpec, gains: FeedforwardGains, limits: MotionMagicLimits
+) -> str:
+    """Format the results as a TalonConfig constructor; PID gains are left as is"""
+    return (
+        f"{spec.config_name} = TalonConfig(\n"
+        f"    kP=0.11,\n"
+        f"    kI=0,\n"
+        f"    kD=0,\n"
+        f"    kF={_round(gains.kS):g},\n"
+        f"    kA={_round(gains.kA):g},\n"
+        f"    kV={_round(gains.kV):g},\n"
+        f"    kG={_round(gains.kG):g},\n"
+        f"    brake_mode=True,\n"
+        f"    motion_magic_cruise_velocity={_round(limits.cruise_velocity):g},\n"
+        f"    motion_magic_acceleration={_round(limits.acceleration):g},\n"
+        f"    motion_magic_jerk={_round(limits.jerk):g},\n"
+        f")"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Fit intake and spindex gains and Motion Magic limits from SysId logs"
+    )
+    parser.add_argument("logs", nargs="+", help="WPILib .wpilog files")
+    parser.add_argument(
+        "--voltage",
+        type=float,
+        default=AVAILABLE_VOLTAGE,
+        help="voltage a profile may demand (default %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    # Data from the same routine across several logs is fitted together
+    data: Dict[str, List[SysIdData]] = {}
+    for path in args.logs:
+        for routine, motors in load_sysid_log(path).items():
+            data.setdefault(routine, []).extend(motors.values())
+
+    status = 0
+    for spec in _mechanism_specs():
+        if spec.routine not in data:
+            print(f"# {spec.routine}: no data in logs", file=sys.stderr)
+            continue
+
+        try:
+            gains = fit_feedforward(data[spec.routine], spec.gravity)
+            limits = recommend_motion_magic(gains, spec, args.voltage)
+        except ValueError as error:
+            print(f"# {spec.routine}: {error}", file=sys.stderr)
+            status = 1
+            continue
+
+        print(f"# {spec.routine}: {gains}")
+        print(f"# estimated move time {limits.move_time:.3f} s")
+        print(format_talon_config(spec, gains, limits))
+        print()
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Startup time benchmark for the robot code in simulation.
+
+Every run starts a fresh interpreter, so imports are measured cold, then
+times:
+
+- the import of each heavy dependency and robot package, each measured on
+  top of the ones before it in IMPORT_ORDER
+- Robot.robotInit, RobotContainer.__init__, TunerConstants.create_drivetrain,
+  Vision.__init__ and the total of every TalonConfig._apply_settings call;
+  phases nest, e.g. create_drivetrain is part of RobotContainer.__init__
+
+The distribution of every phase over all runs is printed. With a baseline,
+the median of each phase is compared to the stored median and the exit
+status is 1 if any phase got slower by more than the tolerance. Baselines
+are machine specific, so record one on the machine that checks against it.
+
+Usage::
+
+    python -m tools.startup_benchmark --runs 10
+    python -m tools.startup_benchmark --save-baseline
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "tools", "startup_baseline.json")
+
+IMPORT_ORDER = [
+    "wpilib",
+    "commands2",
+    "phoenix6",
+    "robotpy_apriltag",
+    "photonlibpy",
+    "utils",
+    "subsystems.drivetrain",
+    "subsystems.intake",
+    "subsystems.spindex",
+    "subsystems.vision",
+    "core",
+    "robot",
+]
+"""Modules timed one after another; later ones reuse what earlier ones loaded"""
+
+RESULT_PREFIX = "STARTUP_BENCHMARK "
+"""Marks the result line among everything the robot code prints"""
+
+DEFAULT_TOLERANCE = 0.25
+"""Allowed relative slowdown of a phase median before it counts as a regression"""
+
+MIN_REGRESSION_SECONDS = 0.005
+"""Slowdowns smaller than this are noise, whatever the relative change"""
+
+
+def _time_calls(owner: type, name: str, results: Dict[str, float], key: str):
+    """
+    Replace a method with one that adds its run time to results[key].
+
+    Args:
+        owner: Class the method is defined on
+        name: Method name
+        results: Accumulated seconds per phase
+        key: Phase name
+    """
+    static = inspect.getattr_static(owner, name)
+    is_classmethod = isinstance(static, classmethod)
+    original = getattr(owner, name) if is_classmethod else static
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            results[key] = results.get(key, 0.0) + time.perf_counter() - start
+
+    setattr(owner, name, staticmethod(timed) if is_classmethod else timed)
+
+
+def measure_startup() -> Dict[str, float]:
+    """
+    Time one cold start of the robot in this process. Must run in a fresh
+    interpreter, since imports are only slow the first time.
+
+    Returns:
+        Seconds per phase
+    """
+    results: Dict[str, float] = {}
+    for module in IMPORT_ORDER:
+        start = time.perf_counter()
+        __import__(module)
+        results[f"import {module}"] = time.perf_counter() - start
+
+    import hal
+    from core import RobotContainer
+    from robot import Robot
+    from subsystems import Vision
+    from utils import TalonConfig, TunerConstants
+
+    if not hal.initialize(500, 0):
+        raise RuntimeError("HAL initialization failed")
+
+    _time_calls(Robot, "robotInit", results, "Robot.robotInit")
+    _time_calls(RobotContainer, "__init__", results, "RobotContainer.__init__")
+    _time_calls(
+        TunerConstants,
+        "create_drivetrain",
+        results,
+        "TunerConstants.create_drivetrain",
+    )
+    _time_calls(Vision, "__init__", results, "Vision.__init__")
+    _time_calls(TalonConfig, "_apply_settings", results, "TalonConfig._apply_settings")
+
+    robot = Robot()
+    robot.robotInit()
+    # Vision and the other deferred parts are built in the first loops
+    start = time.perf_counter()
+    robot.deferredInit.run_all()
+    results["deferred init"] = time.perf_counter() - start
+    return results
+
+
+def run_benchmark(runs: int) -> Dict[str, List[float]]:
+    """
+    Measure startup in a fresh simulated robot process several times.
+
+    Args:
+        runs: Number of cold starts
+
+    Returns:
+        Seconds per phase for every run
+
+    Raises:
+        RuntimeError: If a run fails
+    """
+    samples: Dict[str, List[float]] = {}
+    for run in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-m", "tools.startup_benchmark", "--child"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        lines = [
+            line[len(RESULT_PREFIX) :]
+            for line in process.stdout.splitlines()
+            if line.startswith(RESULT_PREFIX)
+        ]
+        if process.returncode != 0 or not lines:
+            raise RuntimeError(
+                f"Run {run + 1} failed with status {process.returncode}:\n"
+                + process.stderr[-2000:]
+            )
+        for phase, seconds in json.loads(lines[-1]).items():
+            samples.setdefault(phase, []).append(seconds)
+    return samples
+
+
+def format_distribution(samples: Dict[str, List[float]]) -> str:
+    """Table of the distribution of every phase in milliseconds"""
+    lines = [
+        f"{'phase':<36} {'min':>8} {'median':>8} {'p90':>8} {'max':>8} {'stdev':>8}"
+    ]
+    for phase, seconds in samples.items():
+        ms = np.array(seconds) * 1000
+        stdev = statistics.stdev(ms) if len(ms) > 1 else 0.0
+        lines.append(
+            f"{phase:<36} {ms.min():8.1f} {np.median(ms):8.1f} "
+            f"{np.percentile(ms, 90):8.1f} {ms.max():8.1f} {stdev:8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def find_regressions(
+    samples: Dict[str, List[float]],
+    baseline: Dict[str, float],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> List[str]:
+    """
+    Compare the median of every phase against a baseline.
+
+    Args:
+        samples: Seconds per phase for every run
+        baseline: Baseline median seconds per phase
+        tolerance: Allowed relative slowdown
+
+    Returns:
+        Description of every phase that regressed
+    """
+    regressions = []
+    for phase, seconds in samples.items():
+        if phase not in baseline:
+            continue
+        median = float(np.median(seconds))
+        allowed = max(
+            baseline[phase] * (1 + tolerance),
+            baseline[phase] + MIN_REGRESSION_SECONDS,
+        )
+        if median > allowed:
+            regressions.append(
+                f"{phase}: {median * 1000:.1f} ms, baseline "
+                f"{baseline[phase] * 1000:.1f} ms (+{median / baseline[phase] - 1:.0%})"
+            )
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    """Baseline median seconds per phase, warning if it came from another machine"""
+    with open(path) as file:
+        baseline = json.load(file)
+    if baseline.get("machine") != platform.node():
+        print(
+            f"# baseline was recorded on {baseline.get('machine')!r}, "
+            "timings from other machines are not comparable",
+            file=sys.stderr,
+        )
+    return baseline["medians"]
+
+
+def save_baseline(path: str, samples: Dict[str, List[float]]):
+    """Store the median of every phase along with where it was measured"""
+    baseline = {
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "runs": min(len(seconds) for seconds in samples.values()),
+        "medians": {
+            phase: float(np.median(seconds)) for phase, seconds in samples.items()
+        },
+    }
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2)
+        file.write("\n")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark robot startup in simulation against a stored baseline"
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=10,
+        help="number of cold starts (default %(default)s)",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=DEFAULT_BASELINE,
+        help="baseline JSON file (default %(default)s)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store this run as the baseline instead of comparing against it",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed relative slowdown of a phase median (default %(default)s)",
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(RESULT_PREFIX + json.dumps(measure_startup()), flush=True)
+        return 0
+
+    try:
+        samples = run_benchmark(args.runs)
+    except RuntimeError as error:
+        print(f"# {error}", file=sys.stderr)
+        return 1
+    print(format_distribution(samples))
+
+    if args.save_baseline:
+        save_baseline(args.baseline, samples)
+        print(f"# saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"# no baseline at {args.baseline}, nothing to compare", file=sys.stderr)
+        return 0
+
+    regressions = find_regressions(
+        samples, load_baseline(args.baseline), args.tolerance
+    )
+    for regression in regressions:
+        print(f"# regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+Fit feedforward gains from SysId data recorded by the robot.
+
+Drivetrain.sys_id_characterization writes the drive and steer routines to the
+WPILib DataLog in the SysId format. This reads that log, fits kS, kV, kA (and
+kG for mechanisms that fight gravity) by linear least squares, and prints
+replacement ``_drive_gains`` / ``_steer_gains`` blocks for tuner_constants.py.
+Works the same on logs from the real robot and from simulation.
+
+Usage::
+
+    python -m tools.sysid_fit logs/FRC_20260301_123456.wpilog
+"""
+
+import argparse
+import math
+import sys
+from enum import Enum
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from wpiutil.log import DataLogReader
+
+STATE_ENTRY_PREFIX = "sysid-test-state-"
+QUASISTATIC_STATES = ("quasistatic-forward", "quasistatic-reverse")
+TEST_STATES = QUASISTATIC_STATES + ("dynamic-forward", "dynamic-reverse")
+
+
+class GravityType(Enum):
+    """Which gravity term to fit alongside kS, kV and kA"""
+
+    NONE = 0
+    ELEVATOR = 1  # constant
+    ARM = 2  # proportional to the cosine of the position
+
+
+class SysIdData:
+    """Time-aligned samples of one motor from one SysId routine"""
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        voltage: np.ndarray,
+        position: np.ndarray,
+        velocity: np.ndarray,
+        states: np.ndarray,
+    ):
+        """
+        Args:
+            timestamps: Sample times in seconds
+            voltage: Applied voltage
+            position: Mechanism position, in the units the routine logged
+            velocity: Mechanism velocity, in the units the routine logged
+            states: SysId test state string of each sample
+        """
+        self.timestamps = timestamps
+        self.voltage = voltage
+        self.position = position
+        self.velocity = velocity
+        self.states = states
+
+
+class FeedforwardGains:
+    """Fitted feedforward gains and how well they explain the data"""
+
+    def __init__(
+        self,
+        kS: float,
+        kV: float,
+        kA: float,
+        kG: float,
+        r_squared: float,
+        samples: int,
+        method: str,
+    ):
+        self.kS = kS
+        self.kV = kV
+        self.kA = kA
+        self.kG = kG
+        self.r_squared = r_squared
+        self.samples = samples
+        self.method = method
+        """Model that produced the fit: discrete or continuous"""
+
+    def __repr__(self) -> str:
+        return (
+            f"FeedforwardGains(kS={self.kS:.4g}, kV={self.kV:.4g}, kA={self.kA:.4g}, "
+            f"kG={self.kG:.4g}, r_squared={self.r_squared:.4f}, samples={self.samples}, "
+            f"method={self.method})"
+        )
+
+
+def load_sysid_log(path: str) -> Dict[str, Dict[str, SysIdData]]:
+    """
+    Read every SysId routine in a WPILib DataLog.
+
+    Args:
+        path: Path to the .wpilog file
+
+    Returns:
+        Samples keyed by routine (mechanism) name, then by motor name
+    """
+    reader = DataLogReader(path)
+    if not reader.isValid():
+        raise ValueError(f"{path} is not a valid WPILib data log")
+
+    names: Dict[int, str] = {}
+    values: Dict[str, List[tuple]] = {}
+    for record in reader:
+        if record.isStart():
+            start = record.getStartData()
+            names[start.entry] = start.name
+            continue
+        if record.isControl():
+            continue
+
+        name = names.get(record.getEntry())
+        if name is None:
+            continue
+        if name.startswith(STATE_ENTRY_PREFIX):
+            value = record.getString()
+        elif name.split("-", 1)[0] in ("voltage", "position", "velocity"):
+            value = record.getDouble()
+        else:
+            continue
+        values.setdefault(name, []).append((record.getTimestamp() * 1e-6, value))
+
+    mechanisms = [
+        name[len(STATE_ENTRY_PREFIX) :]
+        for name in values
+        if name.startswith(STATE_ENTRY_PREFIX)
+    ]
+
+    routines: Dict[str, Dict[str, SysIdData]] = {}
+    for mechanism in mechanisms:
+        state_samples = values[STATE_ENTRY_PREFIX + mechanism]
+        state_times = np.array([t for t, _ in state_samples])
+        state_values = np.array([v for _, v in state_samples])
+
+        # Motor and mechanism names may both contain dashes, so match on the suffix
+        suffix = f"-{mechanism}"
+        motors = sorted(
+            name[len("voltage-") : -len(suffix)]
+            for name in values
+            if name.startswith("voltage-") and name.endswith(suffix)
+        )
+
+        routines[mechanism] = {}
+        for motor in motors:
+            voltage = values.get(f"voltage-{motor}{suffix}", [])
+            position = values.get(f"position-{motor}{suffix}", [])
+            velocity = values.get(f"velocity-{motor}{suffix}", [])
+            # The three values are logged together every loop
+            count = min(len(voltage), len(position), len(velocity))
+            if count == 0:
+                continue
+
+            timestamps = np.array([t for t, _ in voltage[:count]])
+            state_index = np.searchsorted(state_times, timestamps, side="right") - 1
+            states = np.where(
+                state_index >= 0, state_values[np.maximum(state_index, 0)], "none"
+            )
+            routines[mechanism][motor] = SysIdData(
+                timestamps,
+                np.array([v for _, v in voltage[:count]]),
+                np.array([v for _, v in position[:count]]),
+                np.array([v for _, v in velocity[:count]]),
+                states,
+            )
+
+    return routines
+
+
+def fit_feedforward(
+    data: Sequence[SysIdData],
+    gravity: GravityType = GravityType.NONE,
+    arm_offset: float = 0.0,
+    min_velocity: float = 0.05,
+) -> FeedforwardGains:
+    """
+    Fit kS, kV, kA and optionally kG to one or more motors of the same kind.
+
+    Uses the discrete-time formulation of the WPILib SysId tool, which does
+    not need a noisy differentiated acceleration: consecutive velocity samples
+    within one test satisfy
+
+        v[k+1] = alpha v[k] + beta V[k] + gamma sgn(v[k]) + delta g(x[k])
+
+    where alpha = exp(-kV dt / kA) and beta = (1 - alpha) / kV. Samples from
+    all motors are stacked into one least-squares problem. If that fit is not
+    physical, the continuous model with a differentiated acceleration is used
+    instead, which is robust but underestimates kA slightly.
+
+    Args:
+        data: Samples of each motor
+        gravity: Gravity term to fit
+        arm_offset: For arms, position at which the arm is horizontal, in
+            rotations
+        min_velocity: Quasistatic samples slower than this are dropped, since
+            static friction dominates there
+
+    Returns:
+        The fitted gains
+    """
+    pairs = []
+    for motor in data:
+        # Drop samples logged before the status signals updated again, which
+        # happens when the log callback runs more often than the signal rate
+        fresh = np.ones(len(motor.timestamps), dtype=bool)
+        fresh[1:] = (np.diff(motor.velocity) != 0) | (np.diff(motor.position) != 0)
+        states = motor.states[fresh]
+        voltage = motor.voltage[fresh]
+        position = motor.position[fresh]
+        velocity = motor.velocity[fresh]
+
+        dt = np.diff(motor.timestamps[fresh])
+        same_test = (states[:-1] == states[1:]) & np.isin(states[:-1], TEST_STATES)
+        if not same_test.any():
+            continue
+        nominal_dt = float(np.median(dt[same_test]))
+        # Skip pairs that straddle a loop overrun
+        usable = same_test & (dt < 1.5 * nominal_dt) & (dt > 0.5 * nominal_dt)
+        usable &= ~(
+            np.isin(states[:-1], QUASISTATIC_STATES)
+            & (np.abs(velocity[:-1]) < min_velocity)
+        )
+
+        if gravity is GravityType.ELEVATOR:
+            gravity_term = np.ones(usable.sum())
+        elif gravity is GravityType.ARM:
+            gravity_term = np.cos(2 * math.pi * (position[:-1][usable] - arm_offset))
+        else:
+            gravity_term = None
+
+        pairs.append(
+            (
+                velocity[:-1][usable],
+                velocity[1:][usable],
+                voltage[:-1][usable],
+                dt[usable],
+                gravity_term,
+            )
+        )
+
+    if not pairs:
+        raise ValueError("No SysId test samples to fit")
+
+    velocity, next_velocity, voltage, dt, gravity_term = (
+        np.concatenate(column) if column[0] is not None else None
+        for column in zip(*pairs)
+    )
+    sign = np.sign(velocity)
+    if len(velocity) < 40:
+        raise ValueError(f"Only {len(velocity)} usable samples, not enough to fit")
+
+    def solve(columns, target):
+        X = np.column_stack([column for column in columns if column is not None])
+        coefficients, *_ = np.linalg.lstsq(X, target, rcond=None)
+        residual = target - X @ coefficients
+        total = target - target.mean()
+        r_squared = 1 - float(residual @ residual) / float(total @ total)
+        return coefficients, r_squared
+
+    coefficients, r_squared = solve(
+        (velocity, voltage, sign, gravity_term), next_velocity
+    )
+    alpha, beta, gamma = coefficients[:3]
+    if 0 < alpha < 1 and beta > 0:
+        kV = (1 - alpha) / beta
+        kA = -kV * float(np.mean(dt)) / math.log(alpha)
+        kS = -gamma / beta
+        kG = -coefficients[3] / beta if gravity_term is not None else 0.0
+        return FeedforwardGains(kS, kV, kA, kG, r_squared, len(velocity), "discrete")
+
+    # Very fast mechanisms settle within a couple of samples, which leaves the
+    # discrete model ill-conditioned; fall back to V = kS sgn(v) + kV v + kA a + kG
+    acceleration = (next_velocity - velocity) / dt
+    coefficients, r_squared = solve(
+        (sign, velocity, acceleration, gravity_term), voltage
+    )
+    kS, kV, kA = coefficients[:3]
+    kG = coefficients[3] if gravity_term is not None else 0.0
+    if kV <= 0 or kA < 0:
+        raise ValueError(
+            f"Fit is not physical (kV={kV:.4g}, kA={kA:.4g}); check the test data"
+        )
+    return FeedforwardGains(kS, kV, kA, kG, r_squared, len(velocity), "continuous")
+
+
+def _round(value: float) -> float:
+    """Round to four significant figures for readable constants"""
+    return float(f"{value:.4g}")
+
+
+def format_slot0(name: str, gains: FeedforwardGains, base) -> str:
+    """
+    Format fitted gains as a Slot0Configs builder in the tuner_constants.py style.
+
+    Args:
+        name: Attribute name, e.g. ``_drive_gains``
+        gains: Fitted feedforward gains
+        base: Current Slot0Configs, whose PID gains and other settings are kept
+
+    Returns:
+        Python source for the attribute
+    """
+    lines = [
+        f"    {name} = (",
+        "        configs.Slot0Configs()",
+        f"        .with_k_p({_round(base.k_p):g})",
+        f"        .with_k_i({_round(base.k_i):g})",
+        f"        .with_k_d({_round(base.k_d):g})",
+        f"        .with_k_s({_round(gains.kS):g})",
+        f"        .with_k_v({_round(gains.kV):g})",
+        f"        .with_k_a({_round(gains.kA):g})",
+    ]
+    if gains.kG != 0:
+        lines.append(f"        .with_k_g({_round(gains.kG):g})")
+    if base.static_feedforward_sign.name != "USE_VELOCITY_SIGN":
+        lines += [
+            "        .with_static_feedforward_sign(",
+            f"            signals.StaticFeedforwardSignValue.{base.static_feedforward_sign.name}",
+            "        )",
+        ]
+    lines.append("    )")
+    return "\n".join(lines)
+
+
+DRIVETRAIN_ROUTINES = {
+    "swerve-translation": "_drive_gains",
+    "swerve-steer": "_steer_gains",
+}
+"""Drivetrain routines and the tuner_constants.py gains they produce"""
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Fit drivetrain feedforward gains from a SysId data log"
+    )
+    parser.add_argument("log", help="WPILib .wpilog written during characterization")
+    args = parser.parse_args(argv)
+
+    from utils import TunerConstants
+
+    routines = load_sysid_log(args.log)
+    status = 0
+    for mechanism, attribute in DRIVETRAIN_ROUTINES.items():
+        motors = routines.get(mechanism)
+        if not motors:
+            print(f"# {mechanism}: no data in log", file=sys.stderr)
+            status = 1
+            continue
+
+        try:
+            gains = fit_feedforward(list(motors.values()))
+        except ValueError as error:
+            print(f"# {mechanism}: {error}", file=sys.stderr)
+            status = 1
+            continue
+
+        print(f"# {mechanism}: {gains}", file=sys.stderr)
+        print(format_slot0(attribute, gains, getattr(TunerConstants, attribute)))
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""
+Throughput benchmark for the Vision pose processing pipeline.
+
+Builds the simulated drivetrain and Vision subsystem, renders PhotonVision
+results for all four cameras from random robot poses with VisionSim, and
+sorts them by how many tags each one sees. Each case then replays frames of
+one tag count at one frame rate per camera through the same path the robot
+uses every loop:
+
+- Vision.get_unprocessed_poses, which reads the frames back from
+  NetworkTables and estimates a pose from each
+- Vision.add_vision_measure and Vision.update_estimation_std_devs for every
+  estimate
+- Vision.find_pose_of_tag_closest_to_robot once per loop
+
+The loop cost with no frames is measured first, so the cost of a frame is
+what it adds on top of that. From it, the number of frames per loop that fit
+in the vision budget (VisionConstants.VISION_LOOP_BUDGET_SECONDS) and in the
+whole 20 ms loop is reported, along with the frame rate over all cameras
+that it allows.
+
+Simulated time is paused and stepped by one loop per iteration, so the
+results do not depend on how fast the host runs. Run it on a roboRIO for
+numbers that matter on the field.
+
+Usage::
+
+    python -m tools.vision_benchmark
+    python -m tools.vision_benchmark --fps 30 60 100 --loops 500
+"""
+
+import argparse
+import math
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import hal
+import numpy as np
+from photonlibpy.targeting.photonPipelineResult import (
+    PhotonPipelineMetadata,
+    PhotonPipelineResult,
+)
+from wpilib import DriverStation, Timer
+from wpilib.simulation import DriverStationSim, pauseTiming, stepTiming
+from wpimath.geometry import Pose2d, Pose3d, Rotation2d
+
+from subsystems import Vision
+from utils import TunerConstants, VisionConstants
+
+Frames = List[Dict[int, List[Tuple[Pose2d, PhotonPipelineResult]]]]
+"""For every camera, (robot pose, pipeline result) pairs by tag count"""
+
+LOOP_PERIOD = 0.02
+"""Robot loop period in seconds"""
+
+MAX_TAG_BUCKET = 4
+"""Frames seeing this many tags or more are grouped together"""
+
+FIELD_MARGIN = 1.0
+"""Distance in meters from the field walls that random poses keep"""
+
+
+class CaseResult:
+    """Timings of one tag count at one frame rate"""
+
+    def __init__(self, tags: int, fps: float, loops: int):
+        """
+        Args:
+            tags: Tags seen in every frame; MAX_TAG_BUCKET means at least that
+            fps: Frames per second per camera
+            loops: Number of loops run
+        """
+        self.tags = tags
+        self.fps = fps
+        self.loop_times = np.zeros(loops)
+        self.frames = 0
+        self.estimates = 0
+        self.accepted = 0
+        self.function_times: Dict[str, float] = {
+            "get_unprocessed_poses": 0.0,
+            "add_vision_measure": 0.0,
+            "update_estimation_std_devs": 0.0,
+            "find_pose_of_tag_closest_to_robot": 0.0,
+        }
+
+    def frames_per_loop(self) -> float:
+        """Average frames submitted over all cameras per loop"""
+        return self.frames / len(self.loop_times)
+
+
+def _bucket(tag_count: int) -> int:
+    return min(tag_count, MAX_TAG_BUCKET)
+
+
+def _tags_label(tags: int) -> str:
+    return f"{tags}+" if tags == MAX_TAG_BUCKET else str(tags)
+
+
+def generate_frames(
+    vision: Vision, per_bucket: int, max_renders: int, seed: int
+) -> Frames:
+    """
+    Render frames from random robot poses until every tag count has enough.
+
+    Args:
+        vision: Vision subsystem with its simulation
+        per_bucket: Frames wanted per camera and tag count
+        max_renders: Give up after rendering this many frames per camera
+        seed: Seed for the poses and the simulated pixel noise
+
+    Returns:
+        Rendered frames of every camera
+    """
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)
+    layout = vision.get_layout()
+    length, width = layout.getFieldLength(), layout.getFieldWidth()
+    targets = vision.vision_sim.vision_system_sim.getVisionTargets()
+
+    frames: Frames = [
+        {tags: [] for tags in range(MAX_TAG_BUCKET + 1)} for _ in vision.cameras
+    ]
+    for _ in range(max_renders):
+        if all(
+            len(bucket) >= per_bucket
+            for camera_frames in frames
+            for bucket in camera_frames.values()
+        ):
+            break
+        robot_pose = Pose2d(
+            rng.uniform(FIELD_MARGIN, length - FIELD_MARGIN),
+            rng.uniform(FIELD_MARGIN, width - FIELD_MARGIN),
+            Rotation2d(rng.uniform(-math.pi, math.pi)),
+        )
+        for index, (camera_sim, (_, estimator)) in enumerate(
+            zip(vision.vision_sim.camera_sims, vision.cameras)
+        ):
+            camera_pose = Pose3d(robot_pose).transformBy(estimator.robotToCamera)
+            result = camera_sim.process(
+                camera_sim.prop.estLatency(), camera_pose, targets
+            )
+            bucket = frames[index][_bucket(len(result.targets))]
+            if len(bucket) < per_bucket:
+                bucket.append((robot_pose, result))
+    return frames
+
+
+def _restamp(result: PhotonPipelineResult, sequence_id: int) -> PhotonPipelineResult:
+    """A copy of a result that looks like it was just received"""
+    now = int(Timer.getFPGATimestamp() * 1e6)
+    latency = result.metadata.publishTimestampMicros - (
+        result.metadata.captureTimestampMicros
+    )
+    return PhotonPipelineResult(
+        ntReceiveTimestampMicros=now + 10,
+        targets=result.targets,
+        metadata=PhotonPipelineMetadata(
+            captureTimestampMicros=now - latency,
+            publishTimestampMicros=now,
+            sequenceID=sequence_id,
+            timeSinceLastPong=1000,
+        ),
+        multitagResult=result.multitagResult,
+    )
+
+
+def run_case(
+    vision: Vision,
+    frames: Frames,
+    tags: int,
+    fps: float,
+    loops: int,
+) -> CaseResult:
+    """
+    Replay frames of one tag count through the Vision pipeline.
+
+    Args:
+        vision: Vision subsystem with its simulation
+        frames: Rendered frames from generate_frames
+        tags: Tag count bucket to replay
+        fps: Frames per second per camera; 0 measures the empty loop
+        loops: Number of loops to run
+
+    Returns:
+        Timings of the case
+    """
+    case = CaseResult(tags, fps, loops)
+    times = case.function_times
+    due = [0.0] * len(vision.cameras)
+    next_frame = [0] * len(vision.cameras)
+    sequence_id = [0] * len(vision.cameras)
+    drive_pose = Pose2d()
+
+    for loop in range(loops):
+        stepTiming(LOOP_PERIOD)
+
+        # Frames arrive over NetworkTables between loops, as from a coprocessor
+        for index, camera_sim in enumerate(vision.vision_sim.camera_sims):
+            bucket = frames[index][tags]
+            if not bucket:
+                continue
+            due[index] += fps * LOOP_PERIOD
+            while due[index] >= 1:
+                due[index] -= 1
+                drive_pose, result = bucket[next_frame[index] % len(bucket)]
+                next_frame[index] += 1
+                sequence_id[index] += 1
+                camera_sim.submitProcessedFrame(_restamp(result, sequence_id[index]))
+                case.frames += 1
+
+        loop_start = time.perf_counter()
+        vision.heading_buffer.addSample(Timer.getFPGATimestamp(), drive_pose.rotation())
+        for (camera, estimator), health, solver in zip(
+            vision.cameras, vision.camera_healths, vision.constrained_solvers
+        ):
+            start = time.perf_counter()
+            estimates = vision.get_unprocessed_poses(
+                drive_pose, camera, estimator, health, solver
+            )
+            times["get_unprocessed_poses"] += time.perf_counter() - start
+
+            for estimate, strategy, distance in estimates:
+                case.estimates += 1
+                start = time.perf_counter()
+                std_devs = vision.add_vision_measure(
+                    estimate, camera.getName(), strategy, distance
+                )
+                times["add_vision_measure"] += time.perf_counter() - start
+                case.accepted += std_devs is not None
+
+                start = time.perf_counter()
+                vision.update_estimation_std_devs(
+                    estimate, estimate.targetsUsed, estimator
+                )
+                times["update_estimation_std_devs"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        vision.find_pose_of_tag_closest_to_robot(drive_pose)
+        times["find_pose_of_tag_closest_to_robot"] += time.perf_counter() - start
+        case.loop_times[loop] = time.perf_counter() - loop_start
+    return case
+
+
+def format_cases(cases: List[CaseResult], empty_loop: float) -> str:
+    """Table of the loop and frame cost of every case in milliseconds"""
+    lines = [
+        f"{'tags':>4} {'fps/cam':>7} {'frames/loop':>11} {'loop ms':>8} "
+        f"{'p99 ms':>7} {'max ms':>7} {'frame ms':>8} {'accepted':>8}"
+    ]
+    for case in cases:
+        frames_per_loop = case.frames_per_loop()
+        loop_ms = case.loop_times.mean() * 1000
+        frame_ms = (
+            (loop_ms - empty_loop * 1000) / frames_per_loop
+            if frames_per_loop
+            else math.nan
+        )
+        accepted = f"{case.accepted / case.estimates:.0%}" if case.estimates else "-"
+        lines.append(
+            f"{_tags_label(case.tags):>4} {case.fps:7.0f} {frames_per_loop:11.2f} "
+            f"{loop_ms:8.3f} {np.percentile(case.loop_times, 99) * 1000:7.3f} "
+            f"{case.loop_times.max() * 1000:7.3f} {frame_ms:8.3f} {accepted:>8}"
+        )
+    return "\n".join(lines)
+
+
+def format_functions(cases: List[CaseResult]) -> str:
+    """Table of the time per frame or loop spent in each Vision function"""
+    names = list(cases[0].function_times)
+    lines = [f"{'tags':>4} {'fps/cam':>7} " + " ".join(f"{n:>34}" for n in names)]
+    for case in cases:
+        loops = len(case.loop_times)
+        per_call = [
+            case.function_times["get_unprocessed_poses"] / max(case.frames, 1),
+            case.function_times["add_vision_measure"] / max(case.estimates, 1),
+            case.function_times["update_estimation_std_devs"] / max(case.estimates, 1),
+            case.function_times["find_pose_of_tag_closest_to_robot"] / loops,
+        ]
+        lines.append(
+            f"{_tags_label(case.tags):>4} {case.fps:7.0f} "
+            + " ".join(f"{seconds * 1e6:31.1f} us" for seconds in per_call)
+        )
+    lines.append(
+        "(get_unprocessed_poses per frame, the next two per estimate, "
+        "find_pose_of_tag_closest_to_robot per loop)"
+    )
+    return "\n".join(lines)
+
+
+def format_capacity(cases: List[CaseResult], empty_loop: float) -> str:
+    """How many frames fit in the vision budget and the loop, by tag count"""
+    budget = VisionConstants.VISION_LOOP_BUDGET_SECONDS
+    lines = [
+        f"empty loop {empty_loop * 1000:.3f} ms, vision budget {budget * 1000:.1f} ms",
+        f"{'tags':>4} {'frame ms':>8} {'budget frames/loop':>18} "
+        f"{'budget fps':>10} {'20 ms frames/loop':>17} {'20 ms fps':>9}",
+    ]
+    for tags in sorted({case.tags for case in cases}):
+        tag_cases = [case for case in cases if case.tags == tags and case.frames]
+        if not tag_cases:
+            continue
+        # Frame cost from the case with the most frames, where noise matters least
+        case = max(tag_cases, key=lambda c: c.frames)
+        frame_cost = max(
+            (case.loop_times.mean() - empty_loop) / case.frames_per_loop(), 1e-9
+        )
+        in_budget = max(budget - empty_loop, 0.0) / frame_cost
+        in_loop = max(LOOP_PERIOD - empty_loop, 0.0) / frame_cost
+        lines.append(
+            f"{_tags_label(tags):>4} {frame_cost * 1000:8.3f} {in_budget:18.1f} "
+            f"{in_budget / LOOP_PERIOD:10.0f} {in_loop:17.1f} "
+            f"{in_loop / LOOP_PERIOD:9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure Vision pose processing cost and frame capacity"
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        nargs="+",
+        default=[30.0, 60.0, 100.0],
+        help="frame rates per camera to test (default %(default)s)",
+    )
+    parser.add_argument(
+        "--loops",
+        type=int,
+        default=250,
+        help="loops per case (default %(default)s)",
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=25,
+        help="distinct frames per camera and tag count (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-renders",
+        type=int,
+        default=2000,
+        help="poses to try when rendering frames (default %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+
+    if not hal.initialize(500, 0):
+        print("# HAL initialization failed", file=sys.stderr)
+        return 1
+    pauseTiming()
+    # Alliance-dependent tag filtering only runs with an alliance
+    DriverStationSim.setAllianceStationId(hal.AllianceStationID.kBlue1)
+    DriverStationSim.notifyNewData()
+    DriverStation.refreshData()
+
+    vision = Vision(drive_sub=TunerConstants.create_drivetrain())
+    if vision.vision_sim is None:
+        print("# the benchmark needs the vision simulation", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    frames = generate_frames(vision, args.frames, args.max_renders, args.seed)
+    print(f"# rendered frames in {time.perf_counter() - start:.1f} s")
+    for tags in range(MAX_TAG_BUCKET + 1):
+        counts = [len(camera_frames[tags]) for camera_frames in frames]
+        print(f"# {_tags_label(tags)} tags: {counts} frames per camera")
+
+    empty = run_case(vision, frames, 0, 0.0, args.loops)
+    empty_loop = float(empty.loop_times.mean())
+
+    cases = [
+        run_case(vision, frames, tags, fps, args.loops)
+        for tags in range(MAX_TAG_BUCKET + 1)
+        if any(camera_frames[tags] for camera_frames in frames)
+        for fps in args.fps
+    ]
+    print()
+    print(format_cases(cases, empty_loop))
+    print()
+    print(format_functions(cases))
+    print()
+    print(format_capacity(cases, empty_loop))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
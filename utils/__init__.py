@@ -1,8 +1,40 @@
 from .robot_constants import VisionConstants as VisionConstants
 from .robot_constants import DriveConstants as DriveConstants
 from .robot_constants import MotorIDs as MotorIDs
+from .robot_constants import PowerConstants as PowerConstants
+from .robot_constants import (
+    MechanismVisualizationConstants as MechanismVisualizationConstants,
+)
+from .drivetrain_profile import DrivetrainProfile as DrivetrainProfile
+from .drivetrain_profile import select_drivetrain_profile as select_drivetrain_profile
 from .tuner_constants import TunerSwerveDrivetrain as TunerSwerveDrivetrain
 from .tuner_constants import TunerConstants as TunerConstants
 
 from .talon_config import TalonConfig as TalonConfig
+from .talon_config import send_config as send_config
 from .telemetry import Telemetry as Telemetry
+from .camera_health import CameraHealth as CameraHealth
+from .camera_health import CameraScheduler as CameraScheduler
+from .camera_health import PoseStrategy as PoseStrategy
+from .constrained_pose_solver import ConstrainedPoseSolver as ConstrainedPoseSolver
+from .pose_quality import PoseQualityMonitor as PoseQualityMonitor
+from .sys_id import motor_sys_id_routine as motor_sys_id_routine
+from .sys_id import sys_id_tests as sys_id_tests
+from .motion_planner import AxisLimits as AxisLimits
+from .motion_planner import CoordinatedMotionPlanner as CoordinatedMotionPlanner
+from .motion_planner import ProfileSegment as ProfileSegment
+from .mechanism_visualizer import MechanismVisualizer as MechanismVisualizer
+from .module_health import ModuleHealthMonitor as ModuleHealthMonitor
+from .traction_control import TractionControl as TractionControl
+from .collision_detector import CollisionDetector as CollisionDetector
+from .field_layout import load_field_layout as load_field_layout
+from .startup import StartupProfiler as StartupProfiler
+from .startup import DeferredInitializer as DeferredInitializer
+from .startup import deferred_command as deferred_command
+from .robot_constants import AllocationConstants as AllocationConstants
+from .allocation_tracker import AllocationTracker as AllocationTracker
+from .allocation_tracker import ManualGarbageCollector as ManualGarbageCollector
+from .tunable import Tunable as Tunable
+from .tunable import TunableRegistry as TunableRegistry
+from .robot_constants import LogConstants as LogConstants
+from .structured_log import StructuredLogger as StructuredLogger
@@ -0,0 +1,280 @@
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import commands2
+from ntcore import NetworkTableInstance
+
+from .robot_constants import AllocationConstants
+
+
+class _SectionStats:
+    """Allocation totals of one section of the loop"""
+
+    def __init__(self):
+        self.peak_bytes = 0
+        self.net_blocks = 0
+        self.gc_seconds = 0.0
+        self.collections = 0
+        self.max_loop_peak_bytes = 0
+        self.max_gc_seconds = 0.0
+
+    def add(self, other: "_SectionStats"):
+        """Fold one loop of a section into the totals of a publish period"""
+        self.peak_bytes += other.peak_bytes
+        self.net_blocks += other.net_blocks
+        self.gc_seconds += other.gc_seconds
+        self.collections += other.collections
+        self.max_loop_peak_bytes = max(self.max_loop_peak_bytes, other.peak_bytes)
+        self.max_gc_seconds = max(self.max_gc_seconds, other.gc_seconds)
+
+
+class AllocationTracker:
+    """
+    Attributes Python allocations and garbage collection pauses to the parts
+    of the main loop that caused them.
+
+    The loop is split into sections at checkpoints: after every subsystem
+    periodic(), after every command execute() and once per loop at
+    end_loop(), which charges everything else (the mode and robot periodic
+    functions, dashboard updates) to "Robot". For each section it records:
+
+    - peak bytes: how far traced memory rose above its starting point, i.e.
+      the short-lived allocations that feed the garbage collector
+    - net blocks: memory blocks still allocated at the end of the section
+    - GC time: collections that ran during the section
+
+    A command's section starts at the previous checkpoint, so the first
+    command also carries button polling. Allocations on other threads, like
+    the odometry thread, land in whichever section is running.
+
+    tracemalloc slows every allocation, so this is a diagnostic mode, enabled
+    with AllocationConstants.TRACK_ALLOCATIONS.
+    """
+
+    def __init__(
+        self,
+        scheduler: commands2.CommandScheduler,
+        table_name: str = "Allocations",
+    ):
+        """
+        Construct an allocation tracker. Nothing is traced until start().
+
+        :param scheduler:  Scheduler whose subsystems and commands are tracked
+        :type scheduler:   commands2.CommandScheduler
+        :param table_name: NetworkTables table to publish under
+        :type table_name:  str
+        """
+        self._scheduler = scheduler
+        self._table = NetworkTableInstance.getDefault().getTable(table_name)
+
+        self._loop: Dict[str, _SectionStats] = {}
+        self._period: Dict[str, _SectionStats] = {}
+        self._loops_since_publish = 0
+        # Last published period, kept for report()
+        self._published: Dict[str, _SectionStats] = {}
+        self._published_loops = 1
+        self._last_current = 0
+        self._last_blocks = 0
+
+        self._gc_start = 0.0
+        self._pending_gc_seconds = 0.0
+        self._pending_collections = 0
+
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self):
+        """
+        Start tracing and wrap the periodic() of every registered subsystem.
+        Call once every subsystem has been constructed.
+        """
+        tracemalloc.start(AllocationConstants.TRACEMALLOC_FRAMES)
+        gc.callbacks.append(self._on_gc)
+        # The scheduler has no public list of its subsystems
+        for subsystem in list(self._scheduler._subsystems):
+            self._wrap_periodic(subsystem)
+        self._scheduler.onCommandExecute(
+            lambda command: self._checkpoint(command.getName())
+        )
+        self._snapshot = tracemalloc.take_snapshot()
+        self._last_current = tracemalloc.get_traced_memory()[0]
+        self._last_blocks = sys.getallocatedblocks()
+
+    def _wrap_periodic(self, subsystem: commands2.Subsystem):
+        periodic = subsystem.periodic
+        name = subsystem.getName()
+
+        def tracked_periodic():
+            self._checkpoint("Scheduler")
+            periodic()
+            self._checkpoint(name)
+
+        subsystem.periodic = tracked_periodic
+
+    def _on_gc(self, phase: str, info: Dict[str, int]):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        else:
+            self._pending_gc_seconds += time.perf_counter() - self._gc_start
+            self._pending_collections += 1
+
+    def _checkpoint(self, label: str):
+        """Charge everything since the previous checkpoint to a section"""
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+
+        stats = self._loop.get(label)
+        if stats is None:
+            stats = self._loop[label] = _SectionStats()
+        stats.peak_bytes += peak - self._last_current
+        stats.net_blocks += blocks - self._last_blocks
+        stats.gc_seconds += self._pending_gc_seconds
+        stats.collections += self._pending_collections
+
+        self._pending_gc_seconds = 0.0
+        self._pending_collections = 0
+        tracemalloc.reset_peak()
+        self._last_current = current
+        self._last_blocks = blocks
+
+    def end_loop(self):
+        """Close the current loop; call once per loop from robotPeriodic"""
+        if not tracemalloc.is_tracing():
+            return
+        self._checkpoint("Robot")
+        for label, stats in self._loop.items():
+            total = self._period.get(label)
+            if total is None:
+                total = self._period[label] = _SectionStats()
+            total.add(stats)
+        self._loop = {}
+
+        self._loops_since_publish += 1
+        if self._loops_since_publish >= AllocationConstants.PUBLISH_PERIOD_LOOPS:
+            self.publish()
+
+    def publish(self):
+        """Publish the per-loop averages and worst loop of every section"""
+        loops = max(self._loops_since_publish, 1)
+        total_bytes = 0.0
+        max_gc = 0.0
+        for label, stats in self._period.items():
+            section = self._table.getSubTable(label)
+            section.putNumber("PeakBytesPerLoop", stats.peak_bytes / loops)
+            section.putNumber("MaxPeakBytes", stats.max_loop_peak_bytes)
+            section.putNumber("NetBlocksPerLoop", stats.net_blocks / loops)
+            section.putNumber("GcMsPerLoop", stats.gc_seconds / loops * 1000)
+            section.putNumber("MaxGcPauseMs", stats.max_gc_seconds * 1000)
+            section.putNumber("Collections", stats.collections)
+            total_bytes += stats.peak_bytes / loops
+            max_gc = max(max_gc, stats.max_gc_seconds)
+        self._table.putNumber("PeakBytesPerLoop", total_bytes)
+        self._table.putNumber("MaxGcPauseMs", max_gc * 1000)
+
+        self._published = self._period
+        self._published_loops = loops
+        self._period = {}
+        self._loops_since_publish = 0
+
+    def report(self) -> List[str]:
+        """
+        Print the sections that allocate the most per loop, and the source
+        lines whose retained memory grew the most since the last report.
+        Meant for disabledInit.
+
+        :returns: Report lines
+        :rtype:   List[str]
+        """
+        if not tracemalloc.is_tracing():
+            return []
+
+        loops = self._published_loops
+        lines = ["Allocations per loop, most first:"]
+        for label, stats in sorted(
+            self._published.items(), key=lambda item: item[1].peak_bytes, reverse=True
+        ):
+            lines.append(
+                f"  {label:<32} {stats.peak_bytes / loops:9.0f} B peak "
+                f"{stats.net_blocks / loops:7.1f} blocks net  "
+                f"{stats.max_gc_seconds * 1000:6.2f} ms worst GC"
+            )
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        if self._snapshot is not None:
+            lines.append("Retained memory growth since the last report:")
+            for stat in snapshot.compare_to(self._snapshot, "lineno")[
+                : AllocationConstants.REPORT_TOP_SITES
+            ]:
+                lines.append(f"  {stat}")
+        self._snapshot = snapshot
+
+        print("\n".join(lines))
+        return lines
+
+
+class ManualGarbageCollector:
+    """
+    Moves garbage collection out of the enabled robot loop.
+
+    Automatic collection can start in the middle of any allocation, and a
+    full collection of a large heap takes long enough to overrun the loop.
+    With this enabled, automatic collection is turned off; collect_idle()
+    runs collections from disabledPeriodic, and limit_pending() only collects
+    the young generation while enabled if it has grown past
+    AllocationConstants.MAX_PENDING_OBJECTS, so reference cycles cannot build
+    up without bound during a long enabled period.
+    """
+
+    def __init__(self, enabled: bool = AllocationConstants.MANUAL_GC):
+        """
+        Construct the collector, disabling automatic collection if enabled.
+
+        :param enabled: Whether to take over garbage collection
+        :type enabled:  bool
+        """
+        self.enabled = enabled
+        if enabled:
+            gc.disable()
+
+        self._idle_loops = 0
+        self._forced_collections = 0
+        self._max_pause = 0.0
+
+        table = NetworkTableInstance.getDefault().getTable("GarbageCollection")
+        self._pending_pub = table.getIntegerTopic("PendingObjects").publish()
+        self._forced_pub = table.getIntegerTopic("ForcedCollections").publish()
+        self._max_pause_pub = table.getDoubleTopic("MaxIdlePauseMs").publish()
+
+    def _collect(self, generation: int) -> float:
+        start = time.perf_counter()
+        gc.collect(generation)
+        return time.perf_counter() - start
+
+    def collect_idle(self):
+        """Collect while disabled; call from disabledPeriodic"""
+        if not self.enabled:
+            return
+        # Young generations every loop, everything once per period
+        generation = (
+            2
+            if self._idle_loops % AllocationConstants.FULL_COLLECTION_PERIOD_LOOPS == 0
+            else 1
+        )
+        self._idle_loops += 1
+        self._max_pause = max(self._max_pause, self._collect(generation))
+
+    def limit_pending(self):
+        """Collect the young generation if it grew too large; call every loop"""
+        if not self.enabled:
+            return
+        pending = gc.get_count()[0]
+        if pending > AllocationConstants.MAX_PENDING_OBJECTS:
+            self._collect(0)
+            self._forced_collections += 1
+        self._pending_pub.set(pending)
+        self._forced_pub.set(self._forced_collections)
+        self._max_pause_pub.set(self._max_pause * 1000)
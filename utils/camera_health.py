@@ -0,0 +1,234 @@
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+import ntcore
+
+if TYPE_CHECKING:
+    from photonlibpy.targeting.photonPipelineResult import PhotonPipelineResult
+
+
+class PoseStrategy(Enum):
+    """How a pose estimate was derived from a pipeline result, cheapest first"""
+
+    NONE = 0
+    COPROC_MULTI_TAG = 1
+    LOWEST_AMBIGUITY = 2
+    GYRO_CONSTRAINED = 3
+
+
+class CameraHealth:
+    """
+    Rolling health statistics for a single PhotonVision camera.
+
+    Tracks frame rate, pipeline latency, result age, dropped frames and how
+    often the camera's measurements are accepted by the pose estimator. All
+    averages are exponential moving averages so updating is O(1) per frame.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ema_alpha: float,
+        table: Optional[ntcore.NetworkTable] = None,
+    ):
+        """
+        Args:
+            name: Camera name, used for logging
+            ema_alpha: Weight of the newest sample in the moving averages
+            table: NetworkTable to publish the statistics under, if any
+        """
+        self.name = name
+        self._alpha = ema_alpha
+
+        self.connected = False
+        self.fps = 0.0
+        self.latency_ms = 0.0
+        self.result_age_s = 0.0
+        self.processing_time_s = 0.0
+        # Start optimistic so a camera is never starved before it has been measured
+        self.usefulness = 1.0
+
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_discarded = 0
+        self.measurements_produced = 0
+        self.measurements_accepted = 0
+        self.loops_skipped = 0
+
+        self._last_frame_time = -1.0
+        self._last_sequence_id = -1
+
+        # Indexed by PoseStrategy.value so recording a frame does not allocate
+        self.last_strategy = PoseStrategy.NONE
+        self.strategy_counts = [0] * len(PoseStrategy)
+        self.strategy_time_s = [0.0] * len(PoseStrategy)
+
+        self._publishers = None
+        if table is not None:
+            sub_table = table.getSubTable(name)
+            self._publishers = [
+                sub_table.getDoubleTopic(key).publish()
+                for key in (
+                    "FPS",
+                    "LatencyMs",
+                    "ResultAgeS",
+                    "ProcessingTimeMs",
+                    "Usefulness",
+                    "FramesDropped",
+                    "FramesDiscarded",
+                    "LoopsSkipped",
+                )
+            ]
+            self._connected_pub = sub_table.getBooleanTopic("Connected").publish()
+            self._strategy_pub = sub_table.getStringTopic("LastStrategy").publish()
+            self._strategy_count_pub = sub_table.getIntegerArrayTopic(
+                "StrategyCounts"
+            ).publish()
+            self._strategy_cost_pub = sub_table.getDoubleArrayTopic(
+                "StrategyAvgCostMs"
+            ).publish()
+
+    def _ema(self, average: float, sample: float) -> float:
+        return average + self._alpha * (sample - average)
+
+    def record_result(self, result: "PhotonPipelineResult", now: float):
+        """
+        Record a pipeline result received from the camera.
+
+        Args:
+            result: The pipeline result
+            now: Current FPGA time in seconds
+        """
+        self.frames_received += 1
+
+        frame_time = result.getTimestampSeconds()
+        if self._last_frame_time >= 0 and frame_time > self._last_frame_time:
+            self.fps = self._ema(self.fps, 1.0 / (frame_time - self._last_frame_time))
+        self._last_frame_time = frame_time
+
+        sequence_id = result.metadata.sequenceID
+        if self._last_sequence_id >= 0 and sequence_id > self._last_sequence_id + 1:
+            self.frames_dropped += sequence_id - self._last_sequence_id - 1
+        self._last_sequence_id = sequence_id
+
+        self.latency_ms = self._ema(self.latency_ms, result.getLatencyMillis())
+        self.result_age_s = now - frame_time
+
+    def record_discarded(self, count: int):
+        """Record results that were read but not processed to stay within budget"""
+        self.frames_discarded += count
+
+    def record_measurement(self, accepted: bool):
+        """Record whether a pose measurement from this camera was accepted"""
+        self.measurements_produced += 1
+        if accepted:
+            self.measurements_accepted += 1
+        self.usefulness = self._ema(self.usefulness, 1.0 if accepted else 0.0)
+
+    def record_processing_time(self, seconds: float):
+        """Record the time spent processing this camera during one loop"""
+        self.processing_time_s = self._ema(self.processing_time_s, seconds)
+        self.loops_skipped = 0
+
+    def record_strategy(self, strategy: PoseStrategy, seconds: float):
+        """Record which estimation strategy a frame used and how long it took"""
+        self.last_strategy = strategy
+        self.strategy_counts[strategy.value] += 1
+        self.strategy_time_s[strategy.value] += seconds
+
+    def average_strategy_time_s(self, strategy: PoseStrategy) -> float:
+        """Mean cost of one estimate with the given strategy, in seconds"""
+        count = self.strategy_counts[strategy.value]
+        return self.strategy_time_s[strategy.value] / count if count else 0.0
+
+    def record_skip(self):
+        """Record that the scheduler skipped this camera for one loop"""
+        self.loops_skipped += 1
+
+    def priority(self) -> float:
+        """Scheduling priority; cameras that have been skipped gain priority so none starve"""
+        return max(self.usefulness, 0.05) * (1 + self.loops_skipped)
+
+    def publish(self):
+        """Publish the current statistics to NetworkTables"""
+        if self._publishers is None:
+            return
+
+        values = (
+            self.fps,
+            self.latency_ms,
+            self.result_age_s,
+            self.processing_time_s * 1000.0,
+            self.usefulness,
+            self.frames_dropped,
+            self.frames_discarded,
+            self.loops_skipped,
+        )
+        for publisher, value in zip(self._publishers, values):
+            publisher.set(value)
+        self._connected_pub.set(self.connected)
+        self._strategy_pub.set(self.last_strategy.name)
+        self._strategy_count_pub.set(self.strategy_counts)
+        self._strategy_cost_pub.set(
+            [self.average_strategy_time_s(s) * 1000.0 for s in PoseStrategy]
+        )
+
+
+class CameraScheduler:
+    """
+    Decides which cameras get processed each loop so vision stays within a
+    fixed CPU budget.
+
+    Cameras are visited in priority order. Once the loop's budget has been
+    spent the remaining cameras are skipped until the next loop, and cameras
+    whose measurements are rarely accepted are only processed every few loops.
+    """
+
+    def __init__(
+        self,
+        budget_seconds: float,
+        low_value_usefulness: float,
+        low_value_period_loops: int,
+    ):
+        """
+        Args:
+            budget_seconds: CPU time vision may spend per loop
+            low_value_usefulness: Usefulness below which a camera is throttled
+            low_value_period_loops: A throttled camera runs once every this many loops
+        """
+        self.budget_seconds = budget_seconds
+        self.low_value_usefulness = low_value_usefulness
+        self.low_value_period_loops = low_value_period_loops
+
+        self.over_budget = False
+        self._loop_start = 0.0
+
+    def begin_loop(self):
+        """Mark the start of a vision loop"""
+        self._loop_start = time.perf_counter()
+        self.over_budget = False
+
+    def elapsed(self) -> float:
+        """Seconds spent since begin_loop"""
+        return time.perf_counter() - self._loop_start
+
+    def prioritize(self, healths: Sequence[CameraHealth]) -> List[int]:
+        """Returns camera indices ordered from highest to lowest priority"""
+        return sorted(
+            range(len(healths)), key=lambda i: healths[i].priority(), reverse=True
+        )
+
+    def should_process(self, health: CameraHealth) -> bool:
+        """Whether the camera should be processed in the current loop"""
+        if self.elapsed() >= self.budget_seconds:
+            self.over_budget = True
+            return False
+
+        if (
+            health.usefulness < self.low_value_usefulness
+            and health.loops_skipped < self.low_value_period_loops - 1
+        ):
+            return False
+
+        return True
@@ -0,0 +1,160 @@
+import numpy as np
+from ntcore import NetworkTableInstance
+from phoenix6 import BaseStatusSignal, swerve, units
+from phoenix6.hardware import Pigeon2
+
+from .robot_constants import DriveConstants
+
+GRAVITY = 9.80665  # m/s^2 per g
+
+
+class CollisionDetector:
+    """
+    Detects collisions and skids by comparing the acceleration the Pigeon 2
+    measures with the acceleration the module states imply.
+
+    record() runs on the odometry thread with every drive state, so it only
+    writes the two robot-relative accelerations into fixed-size ring buffers.
+    Every COLLISION_CHECK_PERIOD states the whole window is checked against
+    both thresholds at once:
+
+    - collision: a single sample whose measured acceleration differs from
+      the kinematic one by more than COLLISION_ACCELERATION, i.e. a hit the
+      wheels did not cause
+    - skid: the mean difference over the window exceeds SKID_ACCELERATION,
+      i.e. the wheels and the chassis disagree for a sustained time
+
+    Either one marks odometry as disturbed for COLLISION_HOLD_SECONDS. The
+    drivetrain reads is_disturbed() from the main loop to loosen the odometry
+    standard deviations, so vision pulls the estimate back sooner.
+    """
+
+    def __init__(
+        self,
+        pigeon: Pigeon2,
+        window: int = DriveConstants.COLLISION_WINDOW,
+        enabled: bool = True,
+        table_name: str = "CollisionDetection",
+    ):
+        """
+        Construct a collision detector.
+
+        :param pigeon:     Drivetrain gyro
+        :type pigeon:      Pigeon2
+        :param window:     Number of drive states in the skid window
+        :type window:      int
+        :param enabled:    Whether to detect anything; the simulated Pigeon 2
+                           reports no acceleration, so this is off in simulation
+        :type enabled:     bool
+        :param table_name: NetworkTables table to publish under
+        :type table_name:  str
+        """
+        self._enabled = enabled
+        self._window = window
+
+        self._acceleration_x = pigeon.get_acceleration_x(False)
+        self._acceleration_y = pigeon.get_acceleration_y(False)
+        self._gravity_x = pigeon.get_gravity_vector_x(False)
+        self._gravity_y = pigeon.get_gravity_vector_y(False)
+        self._acceleration_signals = [self._acceleration_x, self._acceleration_y]
+        # Tilt changes slowly, so gravity is only refreshed when the window is checked
+        self._gravity_signals = [self._gravity_x, self._gravity_y]
+        if enabled:
+            # The CAN 2.0 default of 10 Hz is too slow to see a hit
+            BaseStatusSignal.set_update_frequency_for_all(
+                DriveConstants.COLLISION_IMU_FREQUENCY,
+                self._acceleration_signals + self._gravity_signals,
+            )
+
+        self._measured = np.zeros((window, 2))  # g, including gravity
+        self._kinematic = np.zeros((window, 2))  # m/s^2
+        self._index = 0
+        self._count = 0
+        self._samples_since_check = 0
+
+        self._last_timestamp = -1.0
+        self._last_vx = 0.0
+        self._last_vy = 0.0
+
+        self._disturbed_until: units.second = -1.0
+        self._collisions = 0
+        self._skids = 0
+        self._residual = 0.0
+
+        table = NetworkTableInstance.getDefault().getTable(table_name)
+        self._collisions_pub = table.getIntegerTopic("Collisions").publish()
+        self._skids_pub = table.getIntegerTopic("Skids").publish()
+        self._residual_pub = table.getDoubleTopic("Residual").publish()
+        self._disturbed_pub = table.getBooleanTopic("Disturbed").publish()
+
+    def record(self, state: swerve.SwerveDrivetrain.SwerveDriveState):
+        """
+        Compare one drive state with the latest Pigeon 2 acceleration.
+
+        :param state: Drive state from the odometry thread
+        :type state:  swerve.SwerveDrivetrain.SwerveDriveState
+        """
+        if not self._enabled:
+            return
+
+        speeds = state.speeds
+        dt = state.timestamp - self._last_timestamp
+        last_vx, last_vy = self._last_vx, self._last_vy
+        self._last_timestamp = state.timestamp
+        self._last_vx, self._last_vy = speeds.vx, speeds.vy
+        if dt <= 0 or dt > DriveConstants.COLLISION_MAX_SAMPLE_PERIOD:
+            return
+
+        BaseStatusSignal.refresh_all(self._acceleration_signals)
+        # Robot-relative acceleration of a rotating frame: dv/dt + omega x v
+        self._kinematic[self._index] = (
+            (speeds.vx - last_vx) / dt - speeds.omega * speeds.vy,
+            (speeds.vy - last_vy) / dt + speeds.omega * speeds.vx,
+        )
+        self._measured[self._index] = (
+            self._acceleration_x.value,
+            self._acceleration_y.value,
+        )
+        self._index = (self._index + 1) % self._window
+        self._count = min(self._count + 1, self._window)
+
+        self._samples_since_check += 1
+        if (
+            self._count < self._window
+            or self._samples_since_check < DriveConstants.COLLISION_CHECK_PERIOD
+        ):
+            return
+        self._samples_since_check = 0
+        self._check(state.timestamp)
+
+    def _check(self, timestamp: units.second):
+        """Test the whole window against the collision and skid thresholds"""
+        BaseStatusSignal.refresh_all(self._gravity_signals)
+        gravity = np.array((self._gravity_x.value, self._gravity_y.value))
+        difference = (self._measured - gravity) * GRAVITY - self._kinematic
+        peak = float(np.max(np.hypot(difference[:, 0], difference[:, 1])))
+        self._residual = float(np.hypot(*difference.mean(axis=0)))
+
+        collision = peak > DriveConstants.COLLISION_ACCELERATION
+        skid = self._residual > DriveConstants.SKID_ACCELERATION
+        if not (collision or skid):
+            return
+
+        # Count each event once, not once per check while it stays above threshold
+        if timestamp > self._disturbed_until:
+            if collision:
+                self._collisions += 1
+            else:
+                self._skids += 1
+        self._disturbed_until = timestamp + DriveConstants.COLLISION_HOLD_SECONDS
+
+    def is_disturbed(self, now: units.second) -> bool:
+        """Whether a collision or skid was detected within the hold time"""
+        return now <= self._disturbed_until
+
+    def publish(self, now: units.second):
+        """Publish the event counts and current state to NetworkTables"""
+        self._collisions_pub.set(self._collisions)
+        self._skids_pub.set(self._skids)
+        self._residual_pub.set(self._residual)
+        self._disturbed_pub.set(self.is_disturbed(now))
@@ -0,0 +1,110 @@
+import math
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+from robotpy_apriltag import AprilTagFieldLayout
+from wpimath.geometry import Pose2d, Pose3d, Rotation2d, Transform3d
+
+if TYPE_CHECKING:
+    from photonlibpy.targeting.photonPipelineResult import PhotonPipelineResult
+
+
+class ConstrainedPoseSolver:
+    """
+    Single-tag pose solver that takes robot heading from the gyro and only
+    solves for translation.
+
+    Unconstrained single-tag PnP is dominated by rotation error at range. With
+    the yaw known, each tag's yaw/pitch angles and PnP distance give the
+    camera-to-tag vector directly, which only needs to be rotated into the
+    field frame and subtracted from the tag's field position. All targets in a
+    frame are solved together as NumPy arrays and averaged with inverse
+    square distance weighting.
+    """
+
+    def __init__(self, layout: AprilTagFieldLayout, robot_to_camera: Transform3d):
+        """
+        Args:
+            layout: Field layout to look tag positions up in
+            robot_to_camera: Transform from the robot center to the camera
+        """
+        # Tag field positions indexed by fiducial ID, NaN where the tag does not exist
+        tags = layout.getTags()
+        max_id = max((tag.ID for tag in tags), default=0)
+        self._tag_xy = np.full((max_id + 1, 2), np.nan)
+        for tag in tags:
+            self._tag_xy[tag.ID] = (tag.pose.X(), tag.pose.Y())
+
+        self._camera_rotation = np.asarray(robot_to_camera.rotation().toMatrix())
+        self._camera_xy = np.array(
+            [robot_to_camera.translation().X(), robot_to_camera.translation().Y()]
+        )
+
+        self.last_distance = 0.0
+        """Weighted mean camera-to-tag distance of the last solve, in meters"""
+
+    def solve(
+        self, result: "PhotonPipelineResult", heading: Rotation2d
+    ) -> Optional[Pose3d]:
+        """
+        Estimate the robot pose from every fiducial target in a result.
+
+        Args:
+            result: Pipeline result from this solver's camera
+            heading: Field-relative robot heading at the frame's capture time
+
+        Returns:
+            The estimated robot pose with the given heading, or None if no
+            target could be used
+        """
+        targets = result.targets
+        count = len(targets)
+        if count == 0:
+            return None
+
+        ids = np.empty(count, dtype=np.int64)
+        angles = np.empty((count, 2))
+        distance = np.empty(count)
+        for i, target in enumerate(targets):
+            ids[i] = target.fiducialId
+            angles[i, 0] = target.yaw
+            angles[i, 1] = target.pitch
+            distance[i] = target.bestCameraToTarget.translation().norm()
+
+        # One mask over the original targets: in range, in the layout and ranged
+        valid = (ids >= 0) & (ids < len(self._tag_xy)) & (distance > 0)
+        valid[valid] &= ~np.isnan(self._tag_xy[ids[valid], 0])
+        if not valid.any():
+            return None
+
+        tag_xy = self._tag_xy[ids[valid]]
+        yaw, pitch = np.radians(angles[valid]).T
+        distance = distance[valid]
+
+        # Camera-to-tag vectors in the camera frame (x forward, y left, z up);
+        # PhotonVision yaw is positive to the right and pitch positive up
+        cos_pitch = np.cos(pitch)
+        camera_to_tag = np.stack(
+            (
+                distance * cos_pitch * np.cos(yaw),
+                -distance * cos_pitch * np.sin(yaw),
+                distance * np.sin(pitch),
+            )
+        )
+
+        # Rotate into the robot frame, then offset by the camera mount position
+        robot_to_tag = (self._camera_rotation @ camera_to_tag)[:2].T + self._camera_xy
+
+        # Rotate into the field frame and back out the robot position
+        cos_h = math.cos(heading.radians())
+        sin_h = math.sin(heading.radians())
+        field_offset_x = robot_to_tag[:, 0] * cos_h - robot_to_tag[:, 1] * sin_h
+        field_offset_y = robot_to_tag[:, 0] * sin_h + robot_to_tag[:, 1] * cos_h
+
+        weights = 1.0 / np.square(distance)
+        weights /= weights.sum()
+        x = float(np.dot(weights, tag_xy[:, 0] - field_offset_x))
+        y = float(np.dot(weights, tag_xy[:, 1] - field_offset_y))
+        self.last_distance = float(np.dot(weights, distance))
+
+        return Pose3d(Pose2d(x, y, heading))
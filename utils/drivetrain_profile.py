@@ -0,0 +1,148 @@
+import math
+
+from phoenix6 import units
+from wpilib import RobotBase, RobotController, reportWarning
+
+from .robot_constants import DriveConstants
+
+
+class DrivetrainProfile:
+    """
+    Pose estimation settings for one robot or deployment.
+
+    Passed to TunerConstants.create_drivetrain so the odometry thread rate and
+    the Kalman filter standard deviations are chosen per robot instead of
+    using the Phoenix defaults.
+    """
+
+    name: str
+    odometry_frequency: units.hertz
+    odometry_std_devs: tuple[float, float, float]
+    vision_std_devs: tuple[float, float, float]
+
+    def __init__(
+        self,
+        name: str,
+        odometry_frequency: units.hertz,
+        odometry_std_devs: tuple[float, float, float],
+        vision_std_devs: tuple[float, float, float],
+    ):
+        """
+        Construct a drivetrain profile.
+
+        :param name:               Name used for logging
+        :type name:                str
+        :param odometry_frequency: Odometry thread rate; 0 uses the Phoenix default
+                                   of 250 Hz on CAN FD and 100 Hz on CAN 2.0
+        :type odometry_frequency:  units.hertz
+        :param odometry_std_devs:  Odometry standard deviations [x, y, theta] in
+                                   meters and radians
+        :type odometry_std_devs:   tuple[float, float, float]
+        :param vision_std_devs:    Default vision standard deviations [x, y, theta]
+                                   in meters and radians
+        :type vision_std_devs:     tuple[float, float, float]
+        """
+        self.name = name
+        self.odometry_frequency = odometry_frequency
+        self.odometry_std_devs = odometry_std_devs
+        self.vision_std_devs = vision_std_devs
+
+    def validated(self, is_can_fd: bool) -> "DrivetrainProfile":
+        """
+        Check the profile and return the version that will actually be used.
+
+        Invalid values raise, since a bad Kalman filter setup silently ruins
+        localization. An odometry rate above what CAN 2.0 can sustain is
+        clamped with a warning instead, so a CAN FD profile still works on a
+        bench robot wired to the roboRIO bus.
+
+        :param is_can_fd: Whether the drivetrain CAN bus is CAN FD
+        :type is_can_fd:  bool
+        :returns: This profile, or a copy with the odometry rate clamped
+        :rtype: DrivetrainProfile
+        :raises ValueError: If a frequency or standard deviation is invalid
+        """
+        frequency = self.odometry_frequency
+        if not math.isfinite(frequency) or frequency < 0:
+            raise ValueError(
+                f"Drivetrain profile {self.name}: invalid odometry frequency {frequency}"
+            )
+        if 0 < frequency < DriveConstants.MIN_ODOMETRY_FREQUENCY:
+            raise ValueError(
+                f"Drivetrain profile {self.name}: odometry frequency {frequency} Hz is "
+                f"below {DriveConstants.MIN_ODOMETRY_FREQUENCY} Hz"
+            )
+
+        for label, std_devs in (
+            ("odometry", self.odometry_std_devs),
+            ("vision", self.vision_std_devs),
+        ):
+            if len(std_devs) != 3 or not all(
+                math.isfinite(value) and value > 0 for value in std_devs
+            ):
+                raise ValueError(
+                    f"Drivetrain profile {self.name}: {label} std devs must be three "
+                    f"positive values, got {std_devs}"
+                )
+
+        max_frequency = (
+            DriveConstants.MAX_ODOMETRY_FREQUENCY_CAN_FD
+            if is_can_fd
+            else DriveConstants.MAX_ODOMETRY_FREQUENCY_CAN_2
+        )
+        if frequency > max_frequency:
+            reportWarning(
+                f"Drivetrain profile {self.name}: odometry frequency {frequency} Hz "
+                f"clamped to {max_frequency} Hz for this CAN bus"
+            )
+            return DrivetrainProfile(
+                self.name, max_frequency, self.odometry_std_devs, self.vision_std_devs
+            )
+
+        return self
+
+
+COMP_BOT_PROFILE = DrivetrainProfile(
+    "comp",
+    odometry_frequency=250.0,
+    odometry_std_devs=(0.1, 0.1, 0.1),
+    vision_std_devs=(0.9, 0.9, 0.9),
+)
+PRACTICE_BOT_PROFILE = DrivetrainProfile(
+    "practice",
+    odometry_frequency=250.0,
+    # Older modules with more worn tread
+    odometry_std_devs=(0.15, 0.15, 0.1),
+    vision_std_devs=(0.9, 0.9, 0.9),
+)
+SIM_PROFILE = DrivetrainProfile(
+    "sim",
+    # Matches the 4 ms sub-step of Drivetrain.step_sim
+    odometry_frequency=250.0,
+    odometry_std_devs=(0.05, 0.05, 0.05),
+    vision_std_devs=(0.9, 0.9, 0.9),
+)
+
+DRIVETRAIN_PROFILES = {
+    profile.name: profile
+    for profile in (COMP_BOT_PROFILE, PRACTICE_BOT_PROFILE, SIM_PROFILE)
+}
+
+
+def select_drivetrain_profile() -> DrivetrainProfile:
+    """
+    Pick the profile for the robot this code is running on.
+
+    Simulation always uses the sim profile. Real robots are identified by
+    roboRIO serial number; unknown robots get the competition profile.
+
+    :returns: The selected profile, not yet validated
+    :rtype: DrivetrainProfile
+    """
+    if RobotBase.isSimulation():
+        return SIM_PROFILE
+
+    name = DriveConstants.ROBORIO_SERIAL_PROFILES.get(
+        RobotController.getSerialNumber(), COMP_BOT_PROFILE.name
+    )
+    return DRIVETRAIN_PROFILES[name]
@@ -17,11 +17,11 @@ perspective of the blue alliance station
 
 from wpimath.geometry import Translation2d, Translation3d
 from wpimath.units import inchesToMeters
-from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
 
+from .field_layout import load_field_layout
 
 # Load the AprilTag layout (equivalent to AprilTagLayoutType.OFFICIAL.getLayout())
-_layout = AprilTagFieldLayout.loadField(AprilTagField.k2026RebuiltAndyMark)
+_layout = load_field_layout()
 
 # AprilTag related constants
 APRILTAG_COUNT = len(_layout.getTags())
@@ -0,0 +1,18 @@
+from functools import cache
+
+from robotpy_apriltag import AprilTagField, AprilTagFieldLayout
+
+
+@cache
+def load_field_layout() -> AprilTagFieldLayout:
+    """
+    The official AprilTag layout of this season's field.
+
+    Parsing the field JSON is the slowest part of loading the field constants,
+    so it is done once per process and shared by everything that needs it.
+    Callers must not modify the returned layout, e.g. with setOrigin.
+
+    :returns: AprilTag field layout
+    :rtype: AprilTagFieldLayout
+    """
+    return AprilTagFieldLayout.loadField(AprilTagField.k2026RebuiltAndyMark)
@@ -0,0 +1,165 @@
+import math
+
+from ntcore import NetworkTableInstance
+from phoenix6 import BaseStatusSignal
+from phoenix6.hardware import TalonFX
+from wpilib import Color, Color8Bit, Mechanism2d, MechanismLigament2d, SmartDashboard
+from wpimath.geometry import Pose3d, Rotation3d, Transform3d, Translation3d
+
+from .robot_constants import MechanismVisualizationConstants
+
+
+class MechanismVisualizer:
+    """
+    Draws the intake arm, head and spindex as Mechanism2d ligaments and as
+    Pose3d components for AdvantageScope 3D.
+
+    The ligament trees are built once. update() is meant to run on its own
+    period through TimedRobot.addPeriodic, and only writes to NetworkTables
+    when an angle has moved by more than ANGLE_THRESHOLD_DEGREES.
+    """
+
+    def __init__(self, arm_motor: TalonFX, head_motor: TalonFX, spindex_motor: TalonFX):
+        """
+        Construct the visualizer for the given mechanism motors.
+
+        :param arm_motor: Intake arm motor
+        :type arm_motor: TalonFX
+        :param head_motor: Intake head motor
+        :type head_motor: TalonFX
+        :param spindex_motor: Spindex motor
+        :type spindex_motor: TalonFX
+        """
+        self._arm_position = arm_motor.get_position(False)
+        self._head_position = head_motor.get_position(False)
+        self._spindex_position = spindex_motor.get_position(False)
+        self._signals = [
+            self._arm_position,
+            self._head_position,
+            self._spindex_position,
+        ]
+
+        # Side view of the intake, with the canvas centered on the robot
+        self._intake_mechanism = Mechanism2d(1.2, 0.8)
+        self._arm: MechanismLigament2d = self._intake_mechanism.getRoot(
+            "ArmPivot",
+            0.6 + MechanismVisualizationConstants.ARM_PIVOT.x,
+            MechanismVisualizationConstants.ARM_PIVOT.z,
+        ).appendLigament(
+            "Arm",
+            MechanismVisualizationConstants.ARM_LENGTH_METERS,
+            0,
+            6,
+            Color8Bit(Color.kOrange),
+        )
+        self._head: MechanismLigament2d = self._arm.appendLigament(
+            "Head",
+            MechanismVisualizationConstants.HEAD_LENGTH_METERS,
+            0,
+            4,
+            Color8Bit(Color.kYellow),
+        )
+
+        # Top view of the spindex plate
+        self._spindex_mechanism = Mechanism2d(0.6, 0.6)
+        self._spindex: MechanismLigament2d = self._spindex_mechanism.getRoot(
+            "SpindexCenter", 0.3, 0.3
+        ).appendLigament(
+            "Spindex",
+            MechanismVisualizationConstants.SPINDEX_RADIUS_METERS,
+            0,
+            4,
+            Color8Bit(Color.kWhite),
+        )
+
+        SmartDashboard.putData("Intake Mechanism", self._intake_mechanism)
+        SmartDashboard.putData("Spindex Mechanism", self._spindex_mechanism)
+
+        # Component poses in model order: arm, head, spindex
+        self._component_poses_pub = (
+            NetworkTableInstance.getDefault()
+            .getTable("Mechanisms")
+            .getStructArrayTopic("ComponentPoses", Pose3d)
+            .publish()
+        )
+
+        # NaN compares unequal to everything, so the first update always publishes
+        self._published_angles = [math.nan, math.nan, math.nan]
+
+    def angles(self) -> list[float]:
+        """
+        Mechanism angles from the latest motor positions.
+
+        :returns: Arm angle, head angle relative to the arm, and spindex angle,
+                  all in degrees
+        :rtype: list[float]
+        """
+        BaseStatusSignal.refresh_all(self._signals)
+        return [
+            self._arm_position.value
+            / MechanismVisualizationConstants.ARM_GEAR_RATIO
+            * 360,
+            self._head_position.value
+            / MechanismVisualizationConstants.HEAD_GEAR_RATIO
+            * 360,
+            self._spindex_position.value
+            / MechanismVisualizationConstants.SPINDEX_GEAR_RATIO
+            * 360,
+        ]
+
+    def update(self):
+        """Publish the mechanisms if any angle moved past the threshold"""
+        angles = self.angles()
+        changed = [
+            not abs(angle - published)
+            < MechanismVisualizationConstants.ANGLE_THRESHOLD_DEGREES
+            for angle, published in zip(angles, self._published_angles)
+        ]
+        if not any(changed):
+            return
+
+        arm_angle, head_angle, spindex_angle = angles
+        if changed[0]:
+            self._arm.setAngle(arm_angle)
+        if changed[1]:
+            self._head.setAngle(head_angle)
+        if changed[2]:
+            self._spindex.setAngle(spindex_angle)
+        self._published_angles = angles
+
+        self._component_poses_pub.set(
+            self.component_poses(arm_angle, head_angle, spindex_angle)
+        )
+
+    @staticmethod
+    def component_poses(
+        arm_angle: float, head_angle: float, spindex_angle: float
+    ) -> list[Pose3d]:
+        """
+        Robot-relative poses of the AdvantageScope 3D components.
+
+        :param arm_angle: Arm angle above horizontal in degrees
+        :type arm_angle: float
+        :param head_angle: Head angle relative to the arm in degrees
+        :type head_angle: float
+        :param spindex_angle: Spindex angle in degrees
+        :type spindex_angle: float
+        :returns: Arm, head and spindex poses
+        :rtype: list[Pose3d]
+        """
+        # A negative pitch raises the +X axis
+        arm = Pose3d(
+            MechanismVisualizationConstants.ARM_PIVOT,
+            Rotation3d(0, -math.radians(arm_angle), 0),
+        )
+        head = arm.transformBy(
+            Transform3d(
+                Translation3d(MechanismVisualizationConstants.ARM_LENGTH_METERS, 0, 0),
+                Rotation3d(0, -math.radians(head_angle), 0),
+            )
+        )
+        spindex = Pose3d(
+            MechanismVisualizationConstants.SPINDEX_CENTER,
+            Rotation3d(0, 0, math.radians(spindex_angle)),
+        )
+        return [arm, head, spindex]
@@ -0,0 +1,260 @@
+import threading
+from typing import List
+
+import numpy as np
+from ntcore import NetworkTableInstance
+from phoenix6 import SignalLogger, swerve
+from wpilib import reportWarning
+from wpimath.geometry import Translation2d
+
+from .robot_constants import DriveConstants
+
+
+def _wrap_degrees(angle: np.ndarray) -> np.ndarray:
+    """Wrap angles to [-180, 180) degrees"""
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class ModuleHealthMonitor:
+    """
+    Compares what each swerve module was told to do with what it did.
+
+    Every drive state snapshot adds one sample per module to fixed-size ring
+    buffers, with all four modules handled at once as NumPy arrays:
+
+    - tracking error: commanded speed along the wheel minus measured speed
+    - drive efficiency: measured over commanded speed
+    - wheel slip: how far the wheel velocity is from the rigid-body velocity
+      of the chassis at the module, which the other wheels agree on
+    - steer settling time: time from a step in the target angle until the
+      module is within tolerance of it
+
+    Modules whose metrics stay out of bounds are counted as degraded, and
+    report() lists them so they can be swapped between matches.
+
+    record() and publish() run on the telemetry thread while report() runs
+    on the main thread, so the windows and degraded counts are only touched
+    while holding a lock.
+    """
+
+    def __init__(
+        self,
+        module_locations: List[Translation2d],
+        window: int = DriveConstants.MODULE_HEALTH_WINDOW,
+        table_name: str = "ModuleHealth",
+    ):
+        """
+        Construct a module health monitor.
+
+        :param module_locations: Module locations relative to the robot center,
+                                 in drivetrain module order
+        :type module_locations:  List[Translation2d]
+        :param window:           Number of samples kept in the rolling windows
+        :type window:            int
+        :param table_name:       NetworkTables table to publish under
+        :type table_name:        str
+        """
+        self._modules = len(module_locations)
+        self._locations = np.array([[loc.x, loc.y] for loc in module_locations])
+        self._window = window
+        # Shared by the telemetry and main threads; never held while publishing
+        self._lock = threading.Lock()
+
+        # Speed metrics; samples below the minimum commanded speed are masked out
+        self._commanded = np.zeros((window, self._modules))
+        self._measured = np.zeros((window, self._modules))
+        self._slip = np.zeros((window, self._modules))
+        self._valid = np.zeros((window, self._modules), dtype=bool)
+        self._index = 0
+
+        # Settling times arrive per module, so each module has its own ring index
+        self._settling_times = np.zeros((window, self._modules))
+        self._settling_index = np.zeros(self._modules, dtype=np.int64)
+        self._settling_count = np.zeros(self._modules, dtype=np.int64)
+        self._step_start = np.full(self._modules, np.nan)
+        self._last_target_angle = np.full(self._modules, np.nan)
+
+        self._degraded_counts = np.zeros(self._modules, dtype=np.int64)
+        self._samples_since_publish = 0
+
+        table = NetworkTableInstance.getDefault().getTable(table_name)
+        self._tracking_error_pub = table.getDoubleArrayTopic("TrackingError").publish()
+        self._efficiency_pub = table.getDoubleArrayTopic("Efficiency").publish()
+        self._slip_pub = table.getDoubleArrayTopic("Slip").publish()
+        self._settling_time_pub = table.getDoubleArrayTopic(
+            "SteerSettlingTime"
+        ).publish()
+        self._degraded_pub = table.getBooleanArrayTopic("Degraded").publish()
+
+    def record(self, state: swerve.SwerveDrivetrain.SwerveDriveState):
+        """
+        Add one snapshot of the drive state to the rolling windows.
+
+        :param state: Drive state whose module states, targets and speeds are
+                      used
+        :type state:  swerve.SwerveDrivetrain.SwerveDriveState
+        """
+        if len(state.module_states) != self._modules:
+            return
+
+        speeds = np.array([module.speed for module in state.module_states])
+        angles = np.radians([module.angle.degrees() for module in state.module_states])
+        target_speeds = np.array([module.speed for module in state.module_targets])
+        target_angles = np.array(
+            [module.angle.degrees() for module in state.module_targets]
+        )
+
+        # Only the part of the command along the wheel can show up as wheel speed
+        angle_error = _wrap_degrees(target_angles - np.degrees(angles))
+        commanded = target_speeds * np.cos(np.radians(angle_error))
+
+        # Rigid-body velocity of the chassis at each module: v + omega x r
+        chassis = state.speeds
+        expected = np.column_stack(
+            (
+                chassis.vx - chassis.omega * self._locations[:, 1],
+                chassis.vy + chassis.omega * self._locations[:, 0],
+            )
+        )
+        wheel = np.column_stack((speeds * np.cos(angles), speeds * np.sin(angles)))
+
+        slip = np.hypot(*(wheel - expected).T)
+        valid = np.abs(target_speeds) >= DriveConstants.MODULE_HEALTH_MIN_SPEED
+
+        with self._lock:
+            self._commanded[self._index] = commanded
+            self._measured[self._index] = speeds
+            self._slip[self._index] = slip
+            self._valid[self._index] = valid
+            self._index = (self._index + 1) % self._window
+
+            self._record_settling(state.timestamp, target_angles, np.abs(angle_error))
+
+            self._samples_since_publish += 1
+            due = (
+                self._samples_since_publish
+                >= DriveConstants.MODULE_HEALTH_PUBLISH_PERIOD_SAMPLES
+            )
+            if due:
+                self._samples_since_publish = 0
+        if due:
+            self.publish()
+
+    def _record_settling(
+        self, timestamp: float, target_angles: np.ndarray, abs_error: np.ndarray
+    ):
+        step = np.abs(_wrap_degrees(target_angles - self._last_target_angle))
+        # NaN before the first sample compares False, so nothing starts then
+        started = step > DriveConstants.MODULE_HEALTH_STEER_STEP
+        self._step_start[started] = timestamp
+        self._last_target_angle = target_angles
+
+        settled = ~np.isnan(self._step_start) & (
+            abs_error <= DriveConstants.MODULE_HEALTH_STEER_TOLERANCE
+        )
+        if not settled.any():
+            return
+        modules = np.flatnonzero(settled)
+        self._settling_times[self._settling_index[modules], modules] = (
+            timestamp - self._step_start[modules]
+        )
+        self._settling_index[modules] = (self._settling_index[modules] + 1) % (
+            self._window
+        )
+        self._settling_count[modules] = np.minimum(
+            self._settling_count[modules] + 1, self._window
+        )
+        self._step_start[modules] = np.nan
+
+    def tracking_error(self) -> np.ndarray:
+        """Mean absolute speed tracking error of each module in m/s"""
+        error = np.where(self._valid, np.abs(self._commanded - self._measured), 0.0)
+        return error.sum(axis=0) / np.maximum(self._valid.sum(axis=0), 1)
+
+    def efficiency(self) -> np.ndarray:
+        """Measured over commanded speed of each module, 1 if it has not moved"""
+        commanded = np.where(self._valid, np.abs(self._commanded), 0.0).sum(axis=0)
+        measured = np.where(self._valid, np.abs(self._measured), 0.0).sum(axis=0)
+        return np.where(commanded > 0, measured / np.maximum(commanded, 1e-9), 1.0)
+
+    def slip(self) -> np.ndarray:
+        """Mean wheel slip speed of each module in m/s"""
+        slip = np.where(self._valid, self._slip, 0.0)
+        return slip.sum(axis=0) / np.maximum(self._valid.sum(axis=0), 1)
+
+    def settling_time(self) -> np.ndarray:
+        """Mean steer settling time of each module in seconds"""
+        filled = np.arange(self._window)[:, None] < self._settling_count
+        times = np.where(filled, self._settling_times, 0.0)
+        return times.sum(axis=0) / np.maximum(self._settling_count, 1)
+
+    def degraded(self) -> np.ndarray:
+        """Which modules are currently out of bounds on any metric"""
+        moving = self._valid.sum(axis=0) >= DriveConstants.MODULE_HEALTH_MIN_SAMPLES
+        tracking_error = self.tracking_error()
+        # A module is compared to the fleet so a slow robot is not all flagged
+        fleet_error = max(
+            float(np.median(tracking_error)),
+            DriveConstants.MODULE_HEALTH_MIN_TRACKING_ERROR,
+        )
+        speed_degraded = moving & (
+            (self.efficiency() < DriveConstants.MODULE_HEALTH_MIN_EFFICIENCY)
+            | (self.slip() > DriveConstants.MODULE_HEALTH_MAX_SLIP)
+            | (
+                tracking_error
+                > DriveConstants.MODULE_HEALTH_TRACKING_ERROR_RATIO * fleet_error
+            )
+        )
+        return speed_degraded | (
+            self.settling_time() > DriveConstants.MODULE_HEALTH_MAX_SETTLING_TIME
+        )
+
+    def publish(self):
+        """Publish the current metrics to NetworkTables and the signal log"""
+        with self._lock:
+            tracking_error = self.tracking_error().tolist()
+            efficiency = self.efficiency().tolist()
+            slip = self.slip().tolist()
+            settling_time = self.settling_time().tolist()
+            degraded = self.degraded()
+            self._degraded_counts += degraded
+
+        self._tracking_error_pub.set(tracking_error)
+        self._efficiency_pub.set(efficiency)
+        self._slip_pub.set(slip)
+        self._settling_time_pub.set(settling_time)
+        self._degraded_pub.set(degraded.tolist())
+
+        SignalLogger.write_double_array("ModuleHealth/TrackingError", tracking_error)
+        SignalLogger.write_double_array("ModuleHealth/Efficiency", efficiency)
+        SignalLogger.write_double_array("ModuleHealth/Slip", slip)
+        SignalLogger.write_double_array("ModuleHealth/SteerSettlingTime", settling_time)
+
+    def report(self) -> List[int]:
+        """
+        Warn about every module that was degraded for long enough since the
+        last report, then start counting again. Meant for disabledInit, so
+        the pit sees it between matches.
+
+        :returns: Indices of the degraded modules
+        :rtype:   List[int]
+        """
+        with self._lock:
+            counts = self._degraded_counts
+            self._degraded_counts = np.zeros(self._modules, dtype=np.int64)
+            tracking_error = self.tracking_error()
+            efficiency = self.efficiency()
+            slip = self.slip()
+            settling_time = self.settling_time()
+
+        modules = np.flatnonzero(
+            counts >= DriveConstants.MODULE_HEALTH_DEGRADED_PUBLISHES
+        ).tolist()
+        for module in modules:
+            reportWarning(
+                f"Swerve module {module} looks degraded: tracking error "
+                f"{tracking_error[module]:.2f} m/s, efficiency "
+                f"{efficiency[module]:.2f}, slip {slip[module]:.2f} m/s, "
+                f"steer settling {settling_time[module]:.3f} s"
+            )
+        return modules
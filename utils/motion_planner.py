@@ -0,0 +1,219 @@
+import math
+from typing import Callable, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+JointPosition = Tuple[float, float]
+"""Positions of the two coordinated axes, in rotations"""
+
+
+class AxisLimits:
+    """Motion Magic limits of one axis"""
+
+    velocity: float
+    acceleration: float
+    jerk: float
+
+    def __init__(self, velocity: float, acceleration: float, jerk: float):
+        """
+        Args:
+            velocity: Cruise velocity in rotations per second
+            acceleration: Acceleration in rotations per second squared
+            jerk: Jerk in rotations per second cubed
+        """
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.jerk = jerk
+
+    def scaled(self, factor: float) -> "AxisLimits":
+        """These limits multiplied by a distance, e.g. to leave normalized units"""
+        return AxisLimits(
+            self.velocity * factor, self.acceleration * factor, self.jerk * factor
+        )
+
+
+def scurve_time(distance: float, limits: AxisLimits) -> float:
+    """
+    Duration of a time-optimal jerk-limited rest-to-rest move, the profile
+    Motion Magic generates with these limits.
+
+    The acceleration and deceleration phases are symmetric. Reaching a peak
+    velocity v with peak acceleration a_p = min(a, sqrt(v j)) takes
+    v / a_p + a_p / j seconds and covers half that time times v. If the move
+    is too short to reach the cruise velocity, the peak velocity is found by
+    bisection.
+
+    Args:
+        distance: Distance to travel, in rotations
+        limits: Limits of the axis
+
+    Returns:
+        Move duration in seconds
+    """
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+
+    def accel_time(peak_velocity: float) -> float:
+        peak_acceleration = min(
+            limits.acceleration, math.sqrt(peak_velocity * limits.jerk)
+        )
+        return peak_velocity / peak_acceleration + peak_acceleration / limits.jerk
+
+    ramp_time = accel_time(limits.velocity)
+    ramp_distance = limits.velocity * ramp_time
+    if ramp_distance <= distance:
+        return 2 * ramp_time + (distance - ramp_distance) / limits.velocity
+
+    low, high = 0.0, limits.velocity
+    for _ in range(50):
+        peak_velocity = (low + high) / 2
+        if peak_velocity * accel_time(peak_velocity) > distance:
+            high = peak_velocity
+        else:
+            low = peak_velocity
+    return 2 * accel_time(low)
+
+
+class ProfileSegment:
+    """One synchronized rest-to-rest move of both axes"""
+
+    def __init__(
+        self,
+        target: JointPosition,
+        first_limits: AxisLimits,
+        second_limits: AxisLimits,
+        duration: float,
+    ):
+        """
+        Args:
+            target: Goal positions of both axes
+            first_limits: Motion Magic limits for the first axis on this move
+            second_limits: Motion Magic limits for the second axis on this move
+            duration: Time both axes take to arrive, in seconds
+        """
+        self.target = target
+        self.first_limits = first_limits
+        self.second_limits = second_limits
+        self.duration = duration
+
+
+class CoordinatedMotionPlanner:
+    """
+    Plans synchronized, jerk-limited moves of two axes that stay inside a
+    collision-free region.
+
+    Each move is planned in normalized progress s from 0 to 1. The normalized
+    limits are the tightest of each axis' limits divided by its distance, so
+    giving each axis those limits scaled back by its own distance makes both
+    follow the same s(t): they start and arrive together and the path in
+    joint space is a straight line. That line is checked against the
+    collision-free region; if it crosses it, one-waypoint paths through the
+    candidate waypoints are tried and the fastest safe plan is kept.
+    """
+
+    COLLISION_CHECK_SAMPLES = 50
+
+    def __init__(
+        self,
+        first_limits: AxisLimits,
+        second_limits: AxisLimits,
+        is_collision_free: Callable[[float, float], bool],
+        waypoints: List[JointPosition],
+    ):
+        """
+        Args:
+            first_limits: Maximum limits of the first axis
+            second_limits: Maximum limits of the second axis
+            is_collision_free: Whether a pair of axis positions is safe
+            waypoints: Extra positions a plan may pass through, typically the
+                corners of the collision-free region
+        """
+        self.first_limits = first_limits
+        self.second_limits = second_limits
+        self.is_collision_free = is_collision_free
+        self.waypoints = waypoints
+
+    def plan_segment(self, start: JointPosition, goal: JointPosition) -> ProfileSegment:
+        """Plan a single straight-line synchronized move, ignoring collisions"""
+        first_distance = abs(goal[0] - start[0])
+        second_distance = abs(goal[1] - start[1])
+        if first_distance == 0 and second_distance == 0:
+            return ProfileSegment(goal, self.first_limits, self.second_limits, 0.0)
+
+        # Normalized limits: the tightest axis sets each one
+        normalized = AxisLimits(math.inf, math.inf, math.inf)
+        for distance, limits in (
+            (first_distance, self.first_limits),
+            (second_distance, self.second_limits),
+        ):
+            if distance > 0:
+                normalized = AxisLimits(
+                    min(normalized.velocity, limits.velocity / distance),
+                    min(normalized.acceleration, limits.acceleration / distance),
+                    min(normalized.jerk, limits.jerk / distance),
+                )
+
+        # An axis that does not move keeps its normal limits
+        first_limits = (
+            normalized.scaled(first_distance) if first_distance else self.first_limits
+        )
+        second_limits = (
+            normalized.scaled(second_distance)
+            if second_distance
+            else self.second_limits
+        )
+        return ProfileSegment(
+            goal, first_limits, second_limits, scurve_time(1.0, normalized)
+        )
+
+    def is_path_clear(self, start: JointPosition, goal: JointPosition) -> bool:
+        """Whether the straight line between two positions stays collision free"""
+        progress = np.linspace(0.0, 1.0, self.COLLISION_CHECK_SAMPLES)
+        first = start[0] + (goal[0] - start[0]) * progress
+        second = start[1] + (goal[1] - start[1]) * progress
+        return all(self.is_collision_free(a, b) for a, b in zip(first, second))
+
+    def plan(self, start: JointPosition, goal: JointPosition) -> List[ProfileSegment]:
+        """
+        Plan the fastest collision-free move between two positions.
+
+        Args:
+            start: Current positions of both axes
+            goal: Goal positions of both axes
+
+        Returns:
+            Segments to run in order
+
+        Raises:
+            ValueError: If neither the direct path nor any one-waypoint path
+                is collision free
+        """
+        candidates = []
+        if self.is_path_clear(start, goal):
+            candidates.append([self.plan_segment(start, goal)])
+
+        for waypoint in self.waypoints + [(goal[0], start[1]), (start[0], goal[1])]:
+            if waypoint in (start, goal) or not (
+                self.is_path_clear(start, waypoint)
+                and self.is_path_clear(waypoint, goal)
+            ):
+                continue
+            candidates.append(
+                [self.plan_segment(start, waypoint), self.plan_segment(waypoint, goal)]
+            )
+
+        if not candidates:
+            raise ValueError(f"No collision-free path from {start} to {goal}")
+        return min(candidates, key=lambda segments: sum(s.duration for s in segments))
+
+    def precompute(
+        self, positions: Dict[Hashable, JointPosition]
+    ) -> Dict[Tuple[Hashable, Hashable], List[ProfileSegment]]:
+        """Plan every ordered pair of named positions"""
+        return {
+            (start, goal): self.plan(positions[start], positions[goal])
+            for start in positions
+            for goal in positions
+            if start != goal
+        }
@@ -0,0 +1,167 @@
+from typing import Dict, List
+
+import numpy as np
+from ntcore import NetworkTableInstance
+from phoenix6 import SignalLogger, units
+
+
+class PoseQualityMonitor:
+    """
+    Tracks how well odometry and vision agree in the drivetrain pose estimator.
+
+    Every accepted vision measurement is compared against the estimator's pose
+    at the measurement timestamp. The size of that correction, its timestamp
+    and the camera it came from are kept in fixed-size ring buffers, so
+    recording is constant time and never allocates.
+
+    The drift rate is the total correction over the window divided by the
+    time the window spans, so it does not depend on how measurements from
+    several cameras interleave or arrive out of order.
+    """
+
+    def __init__(self, window: int, table_name: str = "PoseQuality"):
+        """
+        Construct a pose quality monitor.
+
+        :param window:     Number of vision measurements kept in the rolling window
+        :type window:      int
+        :param table_name: NetworkTables table to publish under
+        :type table_name:  str
+        """
+        self._window = window
+        self._corrections = np.zeros(window)
+        self._timestamps = np.zeros(window)
+        self._sources = np.zeros(window, dtype=np.int64)
+        self._count = 0
+        self._index = 0
+
+        self._source_names: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+
+        self._last_measurement_time: units.second = -1.0
+
+        table = NetworkTableInstance.getDefault().getTable(table_name)
+        self._mean_correction_pub = table.getDoubleTopic("MeanCorrection").publish()
+        self._max_correction_pub = table.getDoubleTopic("MaxCorrection").publish()
+        self._drift_rate_pub = table.getDoubleTopic("DriftRate").publish()
+        self._since_last_pub = table.getDoubleTopic("TimeSinceMeasurement").publish()
+        self._sources_pub = table.getStringArrayTopic("Sources").publish()
+        self._contribution_pub = table.getDoubleArrayTopic("Contribution").publish()
+        self._localized_pub = table.getBooleanTopic("Localized").publish()
+
+    def record(
+        self,
+        correction: units.meter,
+        timestamp: units.second,
+        source: str,
+    ):
+        """
+        Record an accepted vision measurement.
+
+        :param correction: Distance between the vision pose and the estimated pose
+                           at the measurement timestamp
+        :type correction:  units.meter
+        :param timestamp:  Measurement timestamp in the current time base
+        :type timestamp:   units.second
+        :param source:     Name of the camera the measurement came from
+        :type source:      str
+        """
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = len(self._source_names)
+            self._source_ids[source] = source_id
+            self._source_names.append(source)
+
+        self._last_measurement_time = max(self._last_measurement_time, timestamp)
+
+        self._corrections[self._index] = correction
+        self._timestamps[self._index] = timestamp
+        self._sources[self._index] = source_id
+        self._index = (self._index + 1) % self._window
+        self._count = min(self._count + 1, self._window)
+
+    def mean_correction(self) -> units.meter:
+        """Mean vision correction over the window"""
+        if self._count == 0:
+            return 0.0
+        return float(self._corrections[: self._count].mean())
+
+    def max_correction(self) -> units.meter:
+        """Largest vision correction over the window"""
+        if self._count == 0:
+            return 0.0
+        return float(self._corrections[: self._count].max())
+
+    def drift_rate(self) -> units.meters_per_second:
+        """
+        Odometry drift rate implied by the corrections over the window: the
+        corrections after the oldest measurement divided by the time from it
+        to the newest. Zero until the window spans some time.
+        """
+        if self._count < 2:
+            return 0.0
+        timestamps = self._timestamps[: self._count]
+        oldest = timestamps.argmin()
+        span = timestamps.max() - timestamps[oldest]
+        if span <= 0:
+            return 0.0
+        corrections = self._corrections[: self._count]
+        return float((corrections.sum() - corrections[oldest]) / span)
+
+    def time_since_measurement(self, now: units.second) -> units.second:
+        """Time since the last accepted vision measurement, or infinity if none yet"""
+        if self._last_measurement_time < 0:
+            return float("inf")
+        return now - self._last_measurement_time
+
+    def contribution(self) -> List[float]:
+        """Fraction of the window contributed by each source, ordered as source_names"""
+        if self._count == 0:
+            return [0.0] * len(self._source_names)
+        counts = np.bincount(
+            self._sources[: self._count], minlength=len(self._source_names)
+        )
+        return (counts / self._count).tolist()
+
+    @property
+    def source_names(self) -> List[str]:
+        return self._source_names
+
+    def is_localized(
+        self,
+        now: units.second,
+        max_measurement_age: units.second,
+        max_correction: units.meter,
+    ) -> bool:
+        """
+        Whether the pose estimate is trustworthy enough for precise maneuvers
+        such as auto-align: vision has been seen recently and agrees with odometry.
+        """
+        return (
+            self.time_since_measurement(now) <= max_measurement_age
+            and self._count > 0
+            and self.mean_correction() <= max_correction
+        )
+
+    def publish(self, now: units.second, localized: bool):
+        """Publish the current metrics to NetworkTables and the signal log"""
+        mean_correction = self.mean_correction()
+        max_correction = self.max_correction()
+        drift_rate = self.drift_rate()
+        since_last = self.time_since_measurement(now)
+        contribution = self.contribution()
+
+        self._mean_correction_pub.set(mean_correction)
+        self._max_correction_pub.set(max_correction)
+        self._drift_rate_pub.set(drift_rate)
+        self._since_last_pub.set(since_last)
+        self._sources_pub.set(self._source_names)
+        self._contribution_pub.set(contribution)
+        self._localized_pub.set(localized)
+
+        SignalLogger.write_double("PoseQuality/MeanCorrection", mean_correction, "m")
+        SignalLogger.write_double("PoseQuality/MaxCorrection", max_correction, "m")
+        SignalLogger.write_double("PoseQuality/DriftRate", drift_rate, "m/s")
+        SignalLogger.write_double("PoseQuality/TimeSinceMeasurement", since_last, "s")
+        SignalLogger.write_double_array("PoseQuality/Contribution", contribution)
+        SignalLogger.write_boolean("PoseQuality/Localized", localized)
@@ -12,18 +12,127 @@ class MotorIDs:
     motor_id_head = 52
     motor_id_roller_top = 53
     motor_id_roller_bottom = 54
-    
+
     # SPINDEX
     motor_id_motor_spindex = 55
 
 
-
-
-
 class DriveConstants:
     TOTAL_WIDTH_INCHES = 27.0
     TOTAL_WIDTH_INCHES_BUMPERS = 34.5
 
+    # Pose estimate quality monitoring
+    POSE_QUALITY_WINDOW = 50  # vision measurements
+    POSE_QUALITY_PUBLISH_PERIOD_LOOPS = 10  # 5 Hz
+    LOCALIZED_MAX_MEASUREMENT_AGE = 1.0  # seconds
+    LOCALIZED_MAX_CORRECTION = 0.15  # meters
+
+    # Drivetrain profile selection and odometry rate limits
+    ROBORIO_SERIAL_PROFILES: dict[str, str] = {}  # roboRIO serial -> profile name
+    MIN_ODOMETRY_FREQUENCY = 50.0  # Hz
+    MAX_ODOMETRY_FREQUENCY_CAN_2 = 100.0  # Hz
+    MAX_ODOMETRY_FREQUENCY_CAN_FD = 1000.0  # Hz
+    ODOMETRY_RATE_WARNING_FRACTION = 0.9  # of the configured rate
+
+    # Drivetrain characterization, kept short so the robot stays within a practice field
+    SYSID_QUASISTATIC_TIMEOUT = 4.0  # seconds
+    SYSID_DYNAMIC_TIMEOUT = 1.5  # seconds
+    SYSID_SETTLE_TIME = 1.0  # seconds
+
+    # Swerve module health, sampled from each published drive state snapshot
+    MODULE_HEALTH_WINDOW = 250  # samples, 5 s at 50 Hz
+    MODULE_HEALTH_PUBLISH_PERIOD_SAMPLES = 25  # 2 Hz
+    MODULE_HEALTH_MIN_SPEED = 0.5  # m/s commanded before speed metrics count
+    MODULE_HEALTH_MIN_SAMPLES = 50  # moving samples before speed metrics count
+    MODULE_HEALTH_STEER_STEP = 20.0  # degrees of target change that starts a step
+    MODULE_HEALTH_STEER_TOLERANCE = 2.0  # degrees
+    MODULE_HEALTH_MIN_EFFICIENCY = 0.85
+    MODULE_HEALTH_MAX_SLIP = 0.3  # m/s
+    MODULE_HEALTH_MAX_SETTLING_TIME = 0.25  # seconds
+    MODULE_HEALTH_TRACKING_ERROR_RATIO = 2.0  # of the median module
+    MODULE_HEALTH_MIN_TRACKING_ERROR = 0.1  # m/s, floor for the median
+    MODULE_HEALTH_DEGRADED_PUBLISHES = 10  # 5 s of degraded publishes per match
+
+    # Traction control for the teleop drive request
+    TRACTION_MAX_ACCELERATION = 8.0  # m/s^2, about the wheel friction limit on carpet
+    TRACTION_OPTIMAL_SLIP = 0.1  # slip ratio above which a module counts as slipping
+    # Open-loop demand may lead the ground by about max acceleration times the
+    # drive time constant kA / kV, which still asks for full traction
+    TRACTION_DEMAND_LEAD = 1.2  # m/s
+    TRACTION_MIN_SLIP_SPEED = 0.5  # m/s, floor of the slip ratio denominator
+    # Seconds without updates before re-seeding the estimate
+    TRACTION_RESET_PERIOD = 0.1
+
+    # Collision and skid detection from the Pigeon 2 accelerometer
+    COLLISION_IMU_FREQUENCY = 100.0  # Hz
+    COLLISION_WINDOW = 25  # drive states, 0.1 s at 250 Hz
+    COLLISION_CHECK_PERIOD = 5  # drive states between threshold checks
+    COLLISION_MAX_SAMPLE_PERIOD = 0.05  # seconds; longer gaps restart differentiation
+    COLLISION_ACCELERATION = 15.0  # m/s^2 unexplained by the wheels in one sample
+    SKID_ACCELERATION = 4.0  # m/s^2 unexplained by the wheels over the window
+    COLLISION_HOLD_SECONDS = 1.0
+    COLLISION_ODOMETRY_STD_DEV_SCALE = 10.0  # x and y only; the gyro keeps heading
+
+
+class PowerConstants:
+    """Current budget constants for the power manager"""
+
+    BROWNOUT_THRESHOLD_VOLTS = 7.5  # stay above the roboRIO 6.8 V brownout
+    BATTERY_RESISTANCE_OHMS = 0.020  # battery, main breaker and wiring
+    CURRENT_LOOKAHEAD_SECONDS = 0.1
+    UPDATE_PERIOD_SECONDS = 0.1
+
+    MIN_STATOR_LIMIT = 20.0  # amps
+    LIMIT_HYSTERESIS_AMPS = 5.0
+    LIMIT_RECOVERY_AMPS = 5.0  # per update
+
+
+class MechanismVisualizationConstants:
+    """Geometry and publish rate of the intake and spindex visualization"""
+
+    PUBLISH_PERIOD_SECONDS = 0.05  # 20 Hz, independent of the robot loop
+    ANGLE_THRESHOLD_DEGREES = 1.0  # smaller changes are not republished
+
+    # Motor rotations per mechanism rotation; estimates until the mechanisms are built
+    ARM_GEAR_RATIO = 25.0
+    HEAD_GEAR_RATIO = 15.0
+    SPINDEX_GEAR_RATIO = 10.0
+
+    ARM_LENGTH_METERS = 0.35
+    HEAD_LENGTH_METERS = 0.2
+    SPINDEX_RADIUS_METERS = 0.25
+
+    # Robot-relative origins of the AdvantageScope 3D components
+    ARM_PIVOT = Translation3d(0.3, 0.0, 0.25)  # BW: NEED TO FIX
+    SPINDEX_CENTER = Translation3d(-0.1, 0.0, 0.15)  # BW: NEED TO FIX
+
+
+class AllocationConstants:
+    """Allocation tracking and garbage collection control for the main loop"""
+
+    # tracemalloc slows every allocation, so tracking is for diagnosis only
+    TRACK_ALLOCATIONS = False
+    TRACEMALLOC_FRAMES = 1  # only the allocating line is reported
+    PUBLISH_PERIOD_LOOPS = 50  # 1 Hz
+    REPORT_TOP_SITES = 10
+
+    # Collect only while disabled instead of whenever a threshold is crossed
+    MANUAL_GC = False
+    MAX_PENDING_OBJECTS = 50000  # young generation size that forces a collection
+    FULL_COLLECTION_PERIOD_LOOPS = 50  # while disabled
+
+
+class LogConstants:
+    """Structured binary log written by StructuredLogger"""
+
+    DIRECTORY = "logs"  # under the operating directory, /home/lvuser on the roboRIO
+    BUFFER_RECORDS = 4096  # 80 KiB per buffer, about 4 s of logging
+    BUFFER_COUNT = 16  # records are dropped if the writer falls this far behind
+    FLUSH_PERIOD_LOOPS = 50  # 1 Hz; bounds what a power cut can lose
+    PUBLISH_PERIOD_LOOPS = 50  # 1 Hz
+    MAX_FILE_BYTES = 64 * 1024 * 1024
+    MAX_TOTAL_BYTES = 512 * 1024 * 1024  # oldest logs are deleted past this
+
 
 class VisionConstants:
     """Vision subsystem constants"""
@@ -38,6 +147,31 @@ class VisionConstants:
     K_SINGLE_TAG_STD_DEVS = [4.0, 4.0, 8.0]
     K_MULTI_TAG_STD_DEVS = [0.5, 0.5, 1.0]
 
+    # Single-tag PnP is only used without gyro data, and only below this ambiguity
+    MAX_SINGLE_TAG_AMBIGUITY = 0.2
+
+    # Gyro-constrained single-tag solve: heading comes from the Pigeon 2, so vision
+    # only corrects translation
+    CONSTRAINED_MAX_DISTANCE = 6.0  # meters
+    CONSTRAINED_XY_STD_DEV = 0.3  # meters, scaled up with distance
+    CONSTRAINED_THETA_STD_DEV = 9999999.0  # never trust vision heading
+    HEADING_BUFFER_SECONDS = 1.0
+
+    # Camera health monitoring and processing budget
+    VISION_LOOP_BUDGET_SECONDS = 0.004  # CPU time vision may use per 20 ms loop
+    MAX_RESULTS_PER_CAMERA_PER_LOOP = 3  # Older unread results are discarded
+    LOW_VALUE_CAMERA_USEFULNESS = 0.1  # Accept ratio below which a camera is throttled
+    LOW_VALUE_CAMERA_PERIOD_LOOPS = 5  # Throttled cameras run once every N loops
+    CAMERA_HEALTH_EMA_ALPHA = 0.1
+    CAMERA_HEALTH_PUBLISH_PERIOD_LOOPS = 25  # 2 Hz
+
+    # Simulated camera performance (OV9281 at 1280x720)
+    SIM_CAMERA_FPS = 30.0
+    SIM_CALIB_ERROR_AVG_PX = 0.35
+    SIM_CALIB_ERROR_STD_DEV_PX = 0.10
+    SIM_AVG_LATENCY_SECONDS = 0.035
+    SIM_LATENCY_STD_DEV_SECONDS = 0.005
+
     # Vision strategies
 
     BACK_LEFT_SWERVE_TO_ROBOT = Transform3d(  # BW: NEED TO FIX
@@ -0,0 +1,160 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import commands2
+from ntcore import NetworkTableInstance
+
+
+class StartupProfiler:
+    """
+    Times the phases of robot startup and reports them once startup is done.
+
+    Each phase records its wall time and the modules it imported for the
+    first time, so a slow phase can be traced to the package that made it
+    slow. report() prints the phases slowest first to the console and
+    publishes their times to NetworkTables, where they are logged with the
+    rest of the match.
+    """
+
+    def __init__(self, table_name: str = "Startup"):
+        """
+        Construct a startup profiler.
+
+        :param table_name: NetworkTables table to publish under
+        :type table_name:  str
+        """
+        self._table = NetworkTableInstance.getDefault().getTable(table_name)
+        self._phases: List[Tuple[str, float, Sequence[str]]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time the body of a with statement as one startup phase.
+
+        :param name: Phase name, used as the NetworkTables key
+        :type name:  str
+        """
+        modules = set(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(
+                name,
+                time.perf_counter() - start,
+                [module for module in sys.modules if module not in modules],
+            )
+
+    def record(self, name: str, seconds: float, imported: Sequence[str] = ()):
+        """
+        Record a phase that was timed elsewhere, such as the top-level imports.
+
+        :param name:     Phase name, used as the NetworkTables key
+        :type name:      str
+        :param seconds:  Phase duration
+        :type seconds:   float
+        :param imported: Modules first imported during the phase
+        :type imported:  Sequence[str]
+        """
+        self._phases.append((name, seconds, imported))
+
+    def total(self) -> float:
+        """Total time of every recorded phase in seconds"""
+        return sum(seconds for _, seconds, _ in self._phases)
+
+    def report(self):
+        """Print every phase slowest first and publish the times in milliseconds"""
+        lines = [f"Startup took {self.total() * 1000:.0f} ms:"]
+        for name, seconds, imported in sorted(
+            self._phases, key=lambda phase: phase[1], reverse=True
+        ):
+            # Top-level packages are enough to tell which dependency was pulled in
+            packages = sorted({module.partition(".")[0] for module in imported})
+            lines.append(
+                f"  {name:<28} {seconds * 1000:8.1f} ms  {len(imported):4d} modules"
+                + (f"  ({', '.join(packages)})" if packages else "")
+            )
+            self._table.putNumber(name, seconds * 1000)
+        self._table.putNumber("Total", self.total() * 1000)
+        print("\n".join(lines))
+
+
+class DeferredInitializer:
+    """
+    Constructs non-critical parts of the robot after robotInit returns.
+
+    Everything the robot needs to drive is built in robotInit. The rest is
+    queued here and built one item per robotPeriodic call, so a code restart
+    during a match gets the drivetrain back as soon as possible and no single
+    loop is held up for long.
+    """
+
+    def __init__(self, profiler: StartupProfiler):
+        """
+        Construct a deferred initializer.
+
+        :param profiler: Profiler that times each deferred item and is
+                         reported once the queue is empty
+        :type profiler:  StartupProfiler
+        """
+        self._profiler = profiler
+        self._pending: List[Tuple[str, Callable[[], None]]] = []
+
+    def defer(self, name: str, factory: Callable[[], None]):
+        """
+        Queue a factory to run after robotInit.
+
+        :param name:    Name of the item, used for its startup phase
+        :type name:     str
+        :param factory: Builds the item and stores it where it is used
+        :type factory:  Callable[[], None]
+        """
+        self._pending.append((name, factory))
+
+    def pending(self) -> bool:
+        """Whether any factory has not run yet"""
+        return bool(self._pending)
+
+    def run_next(self):
+        """Run the oldest pending factory, and report startup after the last one"""
+        if not self._pending:
+            return
+        name, factory = self._pending.pop(0)
+        with self._profiler.phase(name):
+            factory()
+        if not self._pending:
+            self._profiler.report()
+
+    def run_all(self):
+        """Run every pending factory now, e.g. before a mode that needs them"""
+        while self._pending:
+            self.run_next()
+
+
+def deferred_command(
+    name: str,
+    supplier: Callable[[], commands2.Command],
+    *requirements: commands2.Subsystem,
+) -> commands2.Command:
+    """
+    A command that is only built when it is scheduled.
+
+    Composing a command makes the scheduler record where it was composed,
+    which walks the call stack for every command in the composition. Long
+    routines that are only run from the dashboard, like characterization,
+    would otherwise pay that cost on every startup.
+
+    :param name:         Command name shown on the dashboard
+    :type name:          str
+    :param supplier:     Builds a new command every time it is called
+    :type supplier:      Callable[[], commands2.Command]
+    :param requirements: Subsystems the built command requires
+    :type requirements:  commands2.Subsystem
+    :returns: Command to run
+    :rtype: commands2.Command
+    """
+    command = commands2.DeferredCommand(supplier, *requirements)
+    command.setName(name)
+    return command
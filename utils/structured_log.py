@@ -0,0 +1,379 @@
+import json
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import wpilib
+from ntcore import NetworkTableInstance
+from wpilib import DriverStation, Timer, reportWarning
+
+from .robot_constants import LogConstants
+
+FILE_EXTENSION = ".rlog"
+FILE_MAGIC = b"RLOG"
+FORMAT_VERSION = 1
+
+FILE_HEADER = struct.Struct("<4sHH")
+"""Magic, format version and record size at the start of every file"""
+
+BLOCK_HEADER = struct.Struct("<II")
+"""Block kind and payload size in bytes, before every block"""
+
+RECORD = struct.Struct("<dId")
+"""FPGA timestamp in seconds, signal id and value of one sample"""
+
+BLOCK_METADATA = 0
+"""JSON object describing the file, e.g. the match it was recorded in"""
+BLOCK_SIGNALS = 1
+"""JSON list of [id, name, unit] for signals first used since the last block"""
+BLOCK_RECORDS = 2
+"""Packed RECORDs in the order they were logged"""
+
+_MATCH_TYPE_LETTERS = {
+    DriverStation.MatchType.kPractice: "P",
+    DriverStation.MatchType.kQualification: "Q",
+    DriverStation.MatchType.kElimination: "E",
+}
+
+
+class StructuredLogger:
+    """
+    Binary log of numeric signals from every subsystem, written without
+    blocking the robot loop.
+
+    log() packs a fixed-width RECORD into one of a few preallocated buffers
+    and returns. Full buffers, and the partly filled one every
+    LogConstants.FLUSH_PERIOD_LOOPS, are handed to a writer thread that
+    writes each as one large block and then returns the buffer to the pool.
+    If flash stalls for long enough that every buffer is waiting to be
+    written, new records are dropped and counted instead of waiting.
+
+    A new file is started for every match the driver station reports, and
+    when a file reaches LogConstants.MAX_FILE_BYTES. Before a file is
+    opened, the oldest logs are deleted until there is room for it under
+    LogConstants.MAX_TOTAL_BYTES.
+
+    A file is a FILE_HEADER followed by blocks, each a BLOCK_HEADER and its
+    payload. Signal names are written once per file in signals blocks, so
+    records only carry a numeric id. ``python -m tools.log_index`` reads
+    these files.
+    """
+
+    _default: Optional["StructuredLogger"] = None
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        buffer_records: int = LogConstants.BUFFER_RECORDS,
+        buffer_count: int = LogConstants.BUFFER_COUNT,
+        table_name: str = "Logging",
+    ):
+        """
+        Construct a logger and start its writer thread. No file is created
+        until the first buffer is written.
+
+        :param directory:      Directory the logs are written to; defaults to
+                               LogConstants.DIRECTORY in the operating directory
+        :type directory:       str
+        :param buffer_records: Records per buffer
+        :type buffer_records:  int
+        :param buffer_count:   Number of preallocated buffers
+        :type buffer_count:    int
+        :param table_name:     NetworkTables table to publish statistics under
+        :type table_name:      str
+        """
+        self.directory = directory or os.path.join(
+            wpilib.getOperatingDirectory(), LogConstants.DIRECTORY
+        )
+
+        # Shared with the writer thread; the lock is never held during I/O
+        self._lock = threading.Lock()
+        self._free: Deque[bytearray] = deque(
+            bytearray(buffer_records * RECORD.size) for _ in range(buffer_count)
+        )
+        self._buffer: Optional[bytearray] = None
+        self._offset = 0
+        self._signal_ids: Dict[str, int] = {}
+        self._queue: "queue.SimpleQueue[Optional[Tuple[int, Any]]]" = (
+            queue.SimpleQueue()
+        )
+        self.dropped_records = 0
+
+        self._loops = 0
+        self._last_loop_time: Optional[float] = None
+        self._match: Optional[Tuple[str, int, int, int]] = None
+
+        # Owned by the writer thread
+        self._signals: List[Tuple[int, str, str]] = []
+        self._unwritten_signals: List[Tuple[int, str, str]] = []
+        self._metadata: Dict[str, Any] = {"label": "practice"}
+        self._file = None
+        self._file_bytes = 0
+        self.path = ""
+        self.bytes_written = 0
+        self.write_errors = 0
+
+        table = NetworkTableInstance.getDefault().getTable(table_name)
+        self._dropped_pub = table.getIntegerTopic("DroppedRecords").publish()
+        self._bytes_pub = table.getIntegerTopic("BytesWritten").publish()
+        self._errors_pub = table.getIntegerTopic("WriteErrors").publish()
+        self._free_pub = table.getIntegerTopic("FreeBuffers").publish()
+        self._path_pub = table.getStringTopic("File").publish()
+
+        self._writer_thread = threading.Thread(
+            target=self._write_loop, name="StructuredLogWriter", daemon=True
+        )
+        self._writer_thread.start()
+
+    @classmethod
+    def get_default(cls) -> "StructuredLogger":
+        """The logger shared by the whole robot"""
+        if cls._default is None:
+            cls._default = StructuredLogger()
+        return cls._default
+
+    def signal(self, name: str, unit: str = "") -> int:
+        """
+        The id records of a signal are written with, defining the signal the
+        first time it is used.
+
+        :param name: Signal name, e.g. "Intake/TargetVelocity"
+        :type name:  str
+        :param unit: Unit of the values, for analysis tools
+        :type unit:  str
+        :returns: Signal id
+        :rtype: int
+        """
+        with self._lock:
+            signal = self._signal_ids.get(name)
+            if signal is None:
+                signal = self._signal_ids[name] = len(self._signal_ids)
+                # Queued before any buffer holding its records
+                self._queue.put((BLOCK_SIGNALS, (signal, name, unit)))
+            return signal
+
+    def log(
+        self,
+        name: str,
+        value: float,
+        unit: str = "",
+        timestamp: Optional[float] = None,
+    ):
+        """
+        Append one sample. Safe to call from any thread.
+
+        :param name:      Signal name
+        :type name:       str
+        :param value:     Sample; booleans are logged as 0 or 1
+        :type value:      float
+        :param unit:      Unit of the values, only used the first time
+        :type unit:       str
+        :param timestamp: FPGA time of the sample; defaults to now
+        :type timestamp:  float
+        """
+        signal = self._signal_ids.get(name)
+        if signal is None:
+            signal = self.signal(name, unit)
+        if timestamp is None:
+            timestamp = Timer.getFPGATimestamp()
+
+        with self._lock:
+            if self._buffer is None:
+                if not self._free:
+                    self.dropped_records += 1
+                    return
+                self._buffer = self._free.popleft()
+            RECORD.pack_into(self._buffer, self._offset, timestamp, signal, value)
+            self._offset += RECORD.size
+            if self._offset == len(self._buffer):
+                self._submit()
+
+    def _submit(self):
+        """Hand the current buffer to the writer; the lock must be held"""
+        self._queue.put((BLOCK_RECORDS, (self._buffer, self._offset)))
+        self._buffer = None
+        self._offset = 0
+
+    def flush(self):
+        """Hand the partly filled buffer to the writer"""
+        with self._lock:
+            if self._buffer is not None and self._offset > 0:
+                self._submit()
+
+    def rotate(self, metadata: Dict[str, Any]):
+        """
+        Start a new file at the next write.
+
+        :param metadata: Written at the start of the new file; "label" is
+                         used in the file name
+        :type metadata:  Dict[str, Any]
+        """
+        self.flush()
+        self._queue.put((BLOCK_METADATA, metadata))
+
+    def periodic(self):
+        """
+        Rotate on a new match, log the loop period and whether the robot is
+        enabled, flush and publish; call once per loop.
+        """
+        disabled = DriverStation.isDisabled()
+        # Match info arrives while disabled; the first check also covers a
+        # restart in the middle of a match
+        if self._match is None or disabled:
+            self._check_match()
+
+        now = Timer.getFPGATimestamp()
+        if self._last_loop_time is not None:
+            self.log("Robot/LoopPeriod", now - self._last_loop_time, "s", now)
+        self.log("Robot/Enabled", not disabled, "", now)
+        self._last_loop_time = now
+
+        self._loops += 1
+        if self._loops % LogConstants.FLUSH_PERIOD_LOOPS == 0:
+            self.flush()
+        if self._loops % LogConstants.PUBLISH_PERIOD_LOOPS == 0:
+            self.publish()
+
+    def _check_match(self):
+        match_type = DriverStation.getMatchType()
+        if match_type == DriverStation.MatchType.kNone:
+            self._match = ("", 0, 0, 0)
+            return
+        event = DriverStation.getEventName()
+        number = DriverStation.getMatchNumber()
+        replay = DriverStation.getReplayNumber()
+        match = (event, int(match_type), number, replay)
+        if match == self._match:
+            return
+        self._match = match
+
+        label = f"{_MATCH_TYPE_LETTERS.get(match_type, 'M')}{number}"
+        if replay > 1:
+            label += f"r{replay}"
+        event_name = re.sub(r"[^A-Za-z0-9]+", "", event)
+        if event_name:
+            label = f"{event_name}_{label}"
+        self.rotate(
+            {
+                "label": label,
+                "event": event,
+                "match_type": match_type.name,
+                "match_number": number,
+                "replay_number": replay,
+            }
+        )
+
+    def publish(self):
+        """Publish how much was written and dropped"""
+        self._dropped_pub.set(self.dropped_records)
+        self._bytes_pub.set(self.bytes_written)
+        self._errors_pub.set(self.write_errors)
+        self._free_pub.set(len(self._free))
+        self._path_pub.set(self.path)
+
+    def stop(self):
+        """Write everything logged so far, close the file and stop the writer"""
+        self.flush()
+        self._queue.put(None)
+        self._writer_thread.join()
+
+    def _write_loop(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                self._close()
+                return
+
+            kind, payload = message
+            try:
+                if kind == BLOCK_SIGNALS:
+                    self._signals.append(payload)
+                    self._unwritten_signals.append(payload)
+                elif kind == BLOCK_METADATA:
+                    self._close()
+                    self._metadata = payload
+                else:
+                    self._write_records(*payload)
+            except OSError as error:
+                self.write_errors += 1
+                if self.write_errors == 1:
+                    reportWarning(f"Could not write log {self.path}: {error}")
+                self._close()
+            finally:
+                if kind == BLOCK_RECORDS:
+                    self._free.append(payload[0])
+
+    def _write_records(self, buffer: bytearray, length: int):
+        if self._file is None:
+            self._open()
+        elif self._unwritten_signals:
+            self._write_block(BLOCK_SIGNALS, self._encode(self._unwritten_signals))
+        self._unwritten_signals = []
+        self._write_block(BLOCK_RECORDS, memoryview(buffer)[:length])
+        if self._file_bytes >= LogConstants.MAX_FILE_BYTES:
+            self._close()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._enforce_disk_cap()
+
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{self._metadata['label']}"
+        path = os.path.join(self.directory, name + FILE_EXTENSION)
+        part = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}_{part}{FILE_EXTENSION}")
+            part += 1
+
+        # Held open across many writes and closed by _close()
+        self._file = open(path, "wb", buffering=0)  # noqa: SIM115
+        self.path = path
+        self._file_bytes = 0
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, RECORD.size))
+        self._file_bytes += FILE_HEADER.size
+        metadata = dict(self._metadata, started=time.time())
+        self._write_block(BLOCK_METADATA, json.dumps(metadata).encode())
+        # Every file carries every signal, so it can be read on its own
+        if self._signals:
+            self._write_block(BLOCK_SIGNALS, self._encode(self._signals))
+
+    def _write_block(self, kind: int, payload: bytes):
+        self._file.write(BLOCK_HEADER.pack(kind, len(payload)))
+        self._file.write(payload)
+        size = BLOCK_HEADER.size + len(payload)
+        self._file_bytes += size
+        self.bytes_written += size
+
+    @staticmethod
+    def _encode(signals: List[Tuple[int, str, str]]) -> bytes:
+        return json.dumps([list(signal) for signal in signals]).encode()
+
+    def _close(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+        except OSError:
+            self.write_errors += 1
+        self._file = None
+
+    def _enforce_disk_cap(self):
+        """Delete the oldest logs until a full new file fits under the cap"""
+        logs = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(FILE_EXTENSION) and entry.is_file():
+                stat = entry.stat()
+                logs.append((stat.st_mtime, stat.st_size, entry.path))
+        logs.sort()
+
+        total = sum(size for _, size, _ in logs)
+        while (
+            logs and total + LogConstants.MAX_FILE_BYTES > LogConstants.MAX_TOTAL_BYTES
+        ):
+            _, size, path = logs.pop(0)
+            os.remove(path)
+            total -= size
@@ -0,0 +1,97 @@
+from typing import Callable
+
+import commands2
+from commands2.sysid import SysIdRoutine
+from phoenix6 import BaseStatusSignal, controls
+from phoenix6.hardware import TalonFX
+from wpilib.sysid import SysIdRoutineLog
+
+
+def motor_sys_id_routine(
+    subsystem: commands2.Subsystem,
+    name: str,
+    motors: dict[str, TalonFX],
+    ramp_rate: float,
+    step_voltage: float,
+    timeout: float,
+) -> SysIdRoutine:
+    """
+    Build a voltage SysId routine that drives every motor with the same voltage.
+
+    Each loop the applied voltage, position and velocity of every motor are
+    written to the WPILib DataLog under the routine name, which is what
+    tools/mechanism_fit.py reads.
+
+    Args:
+        subsystem: Subsystem the routine's commands require
+        name: Routine name used in the log, e.g. "intake-arm"
+        motors: Motors to drive, keyed by the name to log them under
+        ramp_rate: Quasistatic ramp rate in volts per second
+        step_voltage: Dynamic step voltage
+        timeout: Safety timeout of each test in seconds
+
+    Returns:
+        The routine
+    """
+    request = controls.VoltageOut(0)
+    signals = {
+        motor_name: (
+            motor.get_motor_voltage(),
+            motor.get_position(),
+            motor.get_velocity(),
+        )
+        for motor_name, motor in motors.items()
+    }
+    all_signals = [signal for group in signals.values() for signal in group]
+
+    def drive(volts: float):
+        for motor in motors.values():
+            motor.set_control(request.with_output(volts))
+
+    def log(sys_id_log: SysIdRoutineLog):
+        BaseStatusSignal.refresh_all(all_signals)
+        for motor_name, (voltage, position, velocity) in signals.items():
+            sys_id_log.motor(motor_name).voltage(voltage.value).value(
+                "position", position.value, "rotations"
+            ).value("velocity", velocity.value, "rotations_per_second")
+
+    return SysIdRoutine(
+        SysIdRoutine.Config(
+            rampRate=ramp_rate, stepVoltage=step_voltage, timeout=timeout
+        ),
+        SysIdRoutine.Mechanism(drive, log, subsystem, name),
+    )
+
+
+def sys_id_tests(
+    routine: SysIdRoutine,
+    quasistatic_timeout: float,
+    dynamic_timeout: float,
+    rest: Callable[[], commands2.Command],
+) -> list[commands2.Command]:
+    """
+    The four tests of a routine, each followed by a rest so the next starts
+    from standstill. Forward tests go first so the reverse test brings the
+    mechanism back.
+
+    Args:
+        routine: Routine to test
+        quasistatic_timeout: Length of each quasistatic test in seconds
+        dynamic_timeout: Length of each dynamic test in seconds
+        rest: Factory for the command to run between tests
+
+    Returns:
+        Commands to run in sequence
+    """
+    commands = []
+    for direction in (SysIdRoutine.Direction.kForward, SysIdRoutine.Direction.kReverse):
+        commands += [
+            routine.quasistatic(direction).withTimeout(quasistatic_timeout),
+            rest(),
+        ]
+    for direction in (SysIdRoutine.Direction.kForward, SysIdRoutine.Direction.kReverse):
+        commands += [
+            routine.dynamic(direction).withTimeout(dynamic_timeout),
+            rest(),
+        ]
+    return commands
@@ -1,4 +1,5 @@
 from phoenix6 import StatusCode, configs, signals
+from phoenix6.hardware import TalonFX
 
 
 class TalonConfig:
@@ -96,3 +97,22 @@ class TalonConfig:
         else:
             # pass
             print("error! config not applying")
+
+
+def send_config(motor: TalonFX, config) -> bool:
+    """
+    Apply a config group without waiting for the device to acknowledge it,
+    for use inside the robot loop.
+
+    Phoenix reports TIMEOUT_CANNOT_BE_ZERO for a zero timeout even though the
+    config is still sent, so that counts as sent. Whether the device got it
+    can be checked on a later loop with motor.is_connected.
+
+    :param motor:  Motor to configure
+    :type motor:   TalonFX
+    :param config: Config group, e.g. configs.MotionMagicConfigs
+    :returns: Whether the config was sent
+    :rtype: bool
+    """
+    status = motor.configurator.apply(config, 0)
+    return status.is_ok() or status == StatusCode.TIMEOUT_CANNOT_BE_ZERO
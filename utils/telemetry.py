@@ -1,20 +1,45 @@
+import copy
+import threading
+import time
+from typing import Optional
+
 from ntcore import NetworkTableInstance
 from phoenix6 import SignalLogger, swerve, units
 from wpilib import Color, Color8Bit, Mechanism2d, MechanismLigament2d, SmartDashboard
 from wpimath.geometry import Pose2d
 from wpimath.kinematics import ChassisSpeeds, SwerveModulePosition, SwerveModuleState
 
+from .module_health import ModuleHealthMonitor
+from .structured_log import StructuredLogger
+
 
 class Telemetry:
-    def __init__(self, max_speed: units.meters_per_second):
+    def __init__(
+        self,
+        max_speed: units.meters_per_second,
+        publish_period: units.second = 0.02,
+        module_health: Optional[ModuleHealthMonitor] = None,
+    ):
         """
         Construct a telemetry object with the specified max speed of the robot.
 
+        telemeterize() is registered as the drivetrain telemetry callback and runs
+        on the odometry thread, so it only copies the state into a double buffer.
+        A separate daemon thread publishes the latest snapshot at most once every
+        publish_period, dropping any intermediate states.
+
         :param max_speed: Maximum speed
         :type max_speed: units.meters_per_second
+        :param publish_period: Minimum time between publishes
+        :type publish_period: units.second
+        :param module_health: Monitor fed with every published snapshot
+        :type module_health: Optional[ModuleHealthMonitor]
         """
         self._max_speed = max_speed
+        self._publish_period = publish_period
+        self._module_health = module_health
         SignalLogger.start()
+        self._log = StructuredLogger.get_default()
 
         # What to publish over networktables for telemetry
         self._inst = NetworkTableInstance.getDefault()
@@ -90,9 +115,93 @@ class Telemetry:
         for i, module_mechanism in enumerate(self._module_mechanisms):
             SmartDashboard.putData(f"Module {i}", module_mechanism)
 
+        self._skipped_snapshots_pub = self._drive_state_table.getIntegerTopic(
+            "SkippedSnapshots"
+        ).publish()
+
+        # Double buffer: the odometry thread fills the back snapshot and swaps it
+        # to the front under the lock; the publisher copies the front out
+        self._snapshots = [
+            swerve.SwerveDrivetrain.SwerveDriveState(),
+            swerve.SwerveDrivetrain.SwerveDriveState(),
+        ]
+        self._front = 0
+        self._fresh = False
+        self._skipped_snapshots = 0
+        self._lock = threading.Lock()
+        self._snapshot_ready = threading.Event()
+        self._running = True
+
+        self._publisher_thread = threading.Thread(
+            target=self._publish_loop, name="TelemetryPublisher", daemon=True
+        )
+        self._publisher_thread.start()
+
     def telemeterize(self, state: swerve.SwerveDrivetrain.SwerveDriveState):
         """
-        Accept the swerve drive state and telemeterize it to SmartDashboard and SignalLogger.
+        Accept the swerve drive state from the odometry thread.
+
+        Only copies the state, since anything slow here delays the next odometry
+        update. Module lists are copied because the drivetrain updates them in place.
+        """
+        back = self._snapshots[1 - self._front]
+        back.pose = state.pose
+        back.speeds = state.speeds
+        back.module_states = list(state.module_states)
+        back.module_targets = list(state.module_targets)
+        back.module_positions = list(state.module_positions)
+        back.raw_heading = state.raw_heading
+        back.timestamp = state.timestamp
+        back.odometry_period = state.odometry_period
+        back.successful_daqs = state.successful_daqs
+        back.failed_daqs = state.failed_daqs
+
+        with self._lock:
+            if self._fresh:
+                self._skipped_snapshots += 1
+            self._front = 1 - self._front
+            self._fresh = True
+        self._snapshot_ready.set()
+
+    def latest_snapshot(self) -> Optional[swerve.SwerveDrivetrain.SwerveDriveState]:
+        """
+        Take the most recent state if one arrived since the last call.
+
+        :returns: A private copy of the latest state, or None if nothing is new
+        :rtype: Optional[swerve.SwerveDrivetrain.SwerveDriveState]
+        """
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            # Shallow copy is enough: the writer replaces fields rather than mutating them
+            return copy.copy(self._snapshots[self._front])
+
+    def stop(self):
+        """Stop the publisher thread"""
+        self._running = False
+        self._snapshot_ready.set()
+        self._publisher_thread.join()
+
+    def _publish_loop(self):
+        while self._running:
+            self._snapshot_ready.wait()
+            self._snapshot_ready.clear()
+
+            state = self.latest_snapshot()
+            if state is not None:
+                self.publish(state)
+                # Analyzed here rather than on the odometry thread or main loop
+                if self._module_health is not None:
+                    self._module_health.record(state)
+
+            # Rate limit so publishing never competes with odometry for the GIL
+            # more often than the dashboard can use it
+            time.sleep(self._publish_period)
+
+    def publish(self, state: swerve.SwerveDrivetrain.SwerveDriveState):
+        """
+        Telemeterize a swerve drive state snapshot to SmartDashboard and SignalLogger.
         """
         # Telemeterize the swerve drive state
         self._drive_pose.set(state.pose)
@@ -101,7 +210,9 @@ class Telemetry:
         self._drive_module_targets.set(state.module_targets)
         self._drive_module_positions.set(state.module_positions)
         self._drive_timestamp.set(state.timestamp)
-        self._drive_odometry_frequency.set(1.0 / state.odometry_period)
+        if state.odometry_period > 0:
+            self._drive_odometry_frequency.set(1.0 / state.odometry_period)
+        self._skipped_snapshots_pub.set(self._skipped_snapshots)
 
         # Also write to log file
         SignalLogger.write_struct("DriveState/Pose", Pose2d, state.pose)
@@ -118,6 +229,13 @@ class Telemetry:
         SignalLogger.write_double(
             "DriveState/OdometryPeriod", state.odometry_period, "seconds"
         )
+        self._log.log("DriveState/PoseX", state.pose.x, "m")
+        self._log.log("DriveState/PoseY", state.pose.y, "m")
+        self._log.log("DriveState/Heading", state.pose.rotation().degrees(), "deg")
+        self._log.log("DriveState/SpeedX", state.speeds.vx, "m/s")
+        self._log.log("DriveState/SpeedY", state.speeds.vy, "m/s")
+        self._log.log("DriveState/AngularSpeed", state.speeds.omega, "rad/s")
+        self._log.log("DriveState/OdometryPeriod", state.odometry_period, "s")
 
         # Telemeterize the pose to a Field2d
         self._field_type_pub.set("Field2d")
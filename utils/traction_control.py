@@ -0,0 +1,187 @@
+import math
+import time
+
+from ntcore import NetworkTableInstance
+from phoenix6 import StatusCode, swerve
+from phoenix6.hardware import Pigeon2
+from wpimath.kinematics import ChassisSpeeds, SwerveDrive4Kinematics
+
+from .robot_constants import DriveConstants
+
+
+class TractionControl(swerve.requests.SwerveRequest):
+    """
+    Wraps a field-centric request and limits how far the wheels may lead the
+    ground, so the drive motors stay near peak traction instead of spinning.
+
+    The ground velocity of the chassis is estimated from the wheel-derived
+    chassis speed, but may change by no more than the traction limit
+    DriveConstants.TRACTION_MAX_ACCELERATION allows, so wheels that spin up
+    together during hard acceleration cannot drag it along. Rotation comes
+    from the gyro rather than the wheels. Each module's slip is its measured
+    wheel speed relative to the ground speed at that module.
+
+    While a module slips by more than the optimal slip ratio, its demand is
+    capped at the ground speed plus DriveConstants.TRACTION_DEMAND_LEAD, which
+    in open-loop voltage still asks for about the traction limit. Every module
+    demand is scaled down by the same factor, which keeps the direction of
+    travel the driver asked for. Deceleration is never limited.
+
+    apply() runs on the odometry thread for every control update, so it only
+    does scalar math on four modules; publish() sends the results from the
+    main loop.
+    """
+
+    def __init__(self, pigeon: Pigeon2, table_name: str = "TractionControl"):
+        """
+        Construct traction control around a field-centric request.
+
+        :param pigeon:     Drivetrain gyro, for the yaw rate
+        :type pigeon:      Pigeon2
+        :param table_name: NetworkTables table to publish under
+        :type table_name:  str
+        """
+        self.request = swerve.requests.FieldCentric()
+        """Field-centric request whose module demands are limited"""
+        self.enabled = True
+        """Whether to limit demands; estimates are still made when disabled"""
+
+        self._yaw_rate = pigeon.get_angular_velocity_z_world(False)
+        self._module_request = swerve.SwerveModule.ModuleRequest()
+
+        self._ground_vx = 0.0
+        self._ground_vy = 0.0
+        self._last_timestamp = -1.0
+
+        self._slip = [0.0, 0.0, 0.0, 0.0]
+        self._scale = 1.0
+        self._max_apply_time = 0.0
+
+        table = NetworkTableInstance.getDefault().getTable(table_name)
+        self._slip_pub = table.getDoubleArrayTopic("Slip").publish()
+        self._scale_pub = table.getDoubleTopic("Scale").publish()
+        self._ground_speed_pub = table.getDoubleTopic("GroundSpeed").publish()
+        self._apply_time_pub = table.getDoubleTopic("MaxApplyTime").publish()
+
+    def with_request(self, request: swerve.requests.FieldCentric) -> "TractionControl":
+        """
+        Modifies the wrapped request and returns itself.
+
+        :param request: Field-centric request to limit
+        :type request:  swerve.requests.FieldCentric
+        :returns: this object
+        :rtype: TractionControl
+        """
+        self.request = request
+        return self
+
+    def with_enabled(self, enabled: bool) -> "TractionControl":
+        """
+        Modifies whether demands are limited and returns itself.
+
+        :param enabled: Whether to limit demands
+        :type enabled:  bool
+        :returns: this object
+        :rtype: TractionControl
+        """
+        self.enabled = enabled
+        return self
+
+    def apply(
+        self,
+        parameters: swerve.SwerveControlParameters,
+        modules_to_apply: list[swerve.SwerveModule],
+    ) -> StatusCode:
+        start = time.perf_counter()
+        request = self.request
+        dt = parameters.timestamp - self._last_timestamp
+        self._last_timestamp = parameters.timestamp
+
+        # Chassis speed the request asks for, the same way FieldCentric computes it
+        vx, vy = request.velocity_x, request.velocity_y
+        omega = request.rotational_rate
+        if math.hypot(vx, vy) < request.deadband:
+            vx = vy = 0.0
+        if abs(omega) < request.rotational_deadband:
+            omega = 0.0
+        heading = parameters.current_pose.rotation()
+        if (
+            request.forward_perspective
+            == swerve.requests.ForwardPerspectiveValue.OPERATOR_PERSPECTIVE
+        ):
+            heading = heading - parameters.operator_forward_direction
+        speeds = ChassisSpeeds.discretize(
+            ChassisSpeeds.fromFieldRelativeSpeeds(vx, vy, omega, heading),
+            parameters.update_period,
+        )
+        states = parameters.kinematics.toSwerveModuleStates(
+            speeds, request.center_of_rotation
+        )
+        if request.desaturate_wheel_speeds and parameters.max_speed > 0:
+            states = SwerveDrive4Kinematics.desaturateWheelSpeeds(
+                states, parameters.max_speed
+            )
+
+        # Ground velocity: follows the wheels, but no faster than traction allows
+        wheel_vx = parameters.current_chassis_speed.vx
+        wheel_vy = parameters.current_chassis_speed.vy
+        if dt <= 0 or dt > DriveConstants.TRACTION_RESET_PERIOD:
+            self._ground_vx, self._ground_vy = wheel_vx, wheel_vy
+        else:
+            change_x = wheel_vx - self._ground_vx
+            change_y = wheel_vy - self._ground_vy
+            change = math.hypot(change_x, change_y)
+            max_change = DriveConstants.TRACTION_MAX_ACCELERATION * dt
+            if change > max_change:
+                change_x *= max_change / change
+                change_y *= max_change / change
+            self._ground_vx += change_x
+            self._ground_vy += change_y
+        yaw_rate = math.radians(self._yaw_rate.refresh().value)
+
+        scale = 1.0
+        for i, (module, state) in enumerate(zip(modules_to_apply, states)):
+            location = parameters.module_locations[i]
+            ground_speed = math.hypot(
+                self._ground_vx - yaw_rate * location.y,
+                self._ground_vy + yaw_rate * location.x,
+            )
+            wheel_speed = abs(module.get_current_state().speed)
+            self._slip[i] = (wheel_speed - ground_speed) / max(
+                ground_speed, DriveConstants.TRACTION_MIN_SLIP_SPEED
+            )
+
+            demand = abs(state.speed)
+            allowed = (
+                ground_speed * (1 + DriveConstants.TRACTION_OPTIMAL_SLIP)
+                + DriveConstants.TRACTION_DEMAND_LEAD
+            )
+            # Only limit slipping modules, and only demands that accelerate the wheel
+            if (
+                self._slip[i] > DriveConstants.TRACTION_OPTIMAL_SLIP
+                and demand > allowed
+                and demand > wheel_speed
+            ):
+                scale = min(scale, allowed / demand)
+        self._scale = scale
+
+        module_request = (
+            self._module_request.with_drive_request(request.drive_request_type)
+            .with_steer_request(request.steer_request_type)
+            .with_update_period(parameters.update_period)
+        )
+        for module, state in zip(modules_to_apply, states):
+            if self.enabled:
+                state.speed *= scale
+            module.apply(module_request.with_state(state))
+
+        self._max_apply_time = max(self._max_apply_time, time.perf_counter() - start)
+        return StatusCode.OK
+
+    def publish(self):
+        """Publish the latest estimates and the worst apply time since last publish"""
+        self._slip_pub.set(list(self._slip))
+        self._scale_pub.set(self._scale)
+        self._ground_speed_pub.set(math.hypot(self._ground_vx, self._ground_vy))
+        self._apply_time_pub.set(self._max_apply_time)
+        self._max_apply_time = 0.0
@@ -0,0 +1,333 @@
+import json
+import math
+import os
+from typing import Any, Callable, Dict, Optional, Union
+
+import wpilib
+from ntcore import EventFlags, NetworkTableInstance, NetworkTableListenerPoller, Value
+from wpilib import reportWarning
+
+TunableValue = Union[bool, int, float, str]
+
+
+class Tunable:
+    """
+    One value that can be changed from the dashboard while the robot runs.
+
+    value is a plain Python attribute; reading it never touches
+    NetworkTables. It only changes when TunableRegistry.update() receives
+    a valid new value from the dashboard.
+    """
+
+    def __init__(
+        self,
+        registry: "TunableRegistry",
+        name: str,
+        default: TunableValue,
+        value: TunableValue,
+        minimum: Optional[float],
+        maximum: Optional[float],
+        on_change: Optional[Callable[[TunableValue], None]],
+    ):
+        """
+        Construct a tunable; use TunableRegistry.add() or bind() instead.
+
+        :param registry:  Registry the tunable belongs to
+        :type registry:   TunableRegistry
+        :param name:      Entry name under the registry's table
+        :type name:       str
+        :param default:   Value when nothing is saved
+        :type default:    TunableValue
+        :param value:     Starting value
+        :type value:      TunableValue
+        :param minimum:   Smallest accepted number, if any
+        :type minimum:    float
+        :param maximum:   Largest accepted number, if any
+        :type maximum:    float
+        :param on_change: Called with each accepted new value
+        :type on_change:  Callable[[TunableValue], None]
+        """
+        self.name = name
+        self.default = default
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.on_change = on_change
+        self._registry = registry
+        self._entry = registry.table.getEntry(name)
+        # Attribute that mirrors the value, set by TunableRegistry.bind()
+        self._owner: Any = None
+        self._attribute = ""
+
+    def validate(self, value: Any) -> TunableValue:
+        """
+        Convert a value to this tunable's type and check its range.
+
+        :param value: Value from the dashboard or the saved file
+        :returns: The value, converted to the type of the default
+        :rtype: TunableValue
+        :raises ValueError: If the value has the wrong type or is out of range
+        """
+        kind = type(self.default)
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"{self.name} must be a boolean, got {value!r}")
+            return value
+        if kind is str:
+            if not isinstance(value, str):
+                raise ValueError(f"{self.name} must be a string, got {value!r}")
+            return value
+
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, (int, float))
+            or not math.isfinite(value)
+        ):
+            raise ValueError(f"{self.name} must be a number, got {value!r}")
+        if kind is int:
+            if not float(value).is_integer():
+                raise ValueError(f"{self.name} must be an integer, got {value!r}")
+            value = int(value)
+        else:
+            value = float(value)
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(
+                f"{self.name} must be at least {self.minimum}, got {value}"
+            )
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"{self.name} must be at most {self.maximum}, got {value}")
+        return value
+
+    def set(self, value: Any):
+        """
+        Validate and apply a new value, as if it came from the dashboard.
+
+        If on_change raises ValueError the old value is restored, so on_change
+        should raise before it changes anything.
+
+        :param value: New value
+        :raises ValueError: If the value is invalid or on_change rejected it
+        """
+        value = self.validate(value)
+        if value == self.value:
+            return
+        previous = self.value
+        self._store(value)
+        try:
+            if self.on_change is not None:
+                self.on_change(value)
+        except ValueError:
+            self._store(previous)
+            raise
+        finally:
+            self.publish()
+        self._registry.mark_changed()
+
+    def reset(self):
+        """
+        Go back to the default value without calling on_change, e.g. when a
+        saved value turns out to be unusable during construction.
+        """
+        self._store(self.default)
+        self.publish()
+        self._registry.mark_changed()
+
+    def _store(self, value: TunableValue):
+        self.value = value
+        if self._owner is not None:
+            setattr(self._owner, self._attribute, value)
+
+    def publish(self):
+        """Show the current value on the dashboard"""
+        if isinstance(self.value, bool):
+            self._entry.setBoolean(self.value)
+        elif isinstance(self.value, str):
+            self._entry.setString(self.value)
+        else:
+            self._entry.setDouble(float(self.value))
+
+
+class TunableRegistry:
+    """
+    Values the drive team can tune at an event without a redeploy.
+
+    Every tunable is a NetworkTables entry under the Tuning table. Instead of
+    reading each entry every loop, one listener poller queues the changes the
+    dashboard makes; update() drains that queue once per loop, validates each
+    change and applies it to the cached Python value, so a loop without
+    changes costs one empty readQueue() call. Changes are applied on the
+    main thread, so on_change callbacks may touch subsystems.
+
+    Accepted values are saved to a JSON file in the operating directory
+    (/home/lvuser on the roboRIO) by save(), and loaded again on the next
+    start. Saved values that no longer validate are ignored.
+    """
+
+    _default: Optional["TunableRegistry"] = None
+
+    FILE_NAME = "tunables.json"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        table_name: str = "Tuning",
+        instance: Optional[NetworkTableInstance] = None,
+    ):
+        """
+        Construct a registry and load the saved values.
+
+        :param path:       File the values are saved to; defaults to FILE_NAME
+                           in the operating directory
+        :type path:        str
+        :param table_name: NetworkTables table to publish under
+        :type table_name:  str
+        :param instance:   NetworkTables instance; defaults to the default one
+        :type instance:    NetworkTableInstance
+        """
+        instance = instance or NetworkTableInstance.getDefault()
+        self.path = path or os.path.join(wpilib.getOperatingDirectory(), self.FILE_NAME)
+        self.table = instance.getTable(table_name)
+        self._tunables: Dict[str, Tunable] = {}
+        self._changed = False
+
+        self._saved: Dict[str, Any] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as file:
+                    self._saved = json.load(file)
+            except (OSError, ValueError) as error:
+                reportWarning(f"Could not load tunables from {self.path}: {error}")
+
+        self._poller = NetworkTableListenerPoller(instance)
+        self._prefix = self.table.getPath() + "/"
+        self._poller.addListener([self._prefix], EventFlags.kValueAll)
+
+    @classmethod
+    def get_default(cls) -> "TunableRegistry":
+        """The registry shared by the whole robot"""
+        if cls._default is None:
+            cls._default = TunableRegistry()
+        return cls._default
+
+    def add(
+        self,
+        name: str,
+        default: TunableValue,
+        minimum: Optional[float] = None,
+        maximum: Optional[float] = None,
+        on_change: Optional[Callable[[TunableValue], None]] = None,
+    ) -> Tunable:
+        """
+        Register a tunable, starting from its saved value if there is a valid
+        one.
+
+        :param name:      Entry name under the Tuning table, e.g. "Intake/Speed"
+        :type name:       str
+        :param default:   Value when nothing is saved; its type is the
+                          tunable's type
+        :type default:    TunableValue
+        :param minimum:   Smallest accepted number, if any
+        :type minimum:    float
+        :param maximum:   Largest accepted number, if any
+        :type maximum:    float
+        :param on_change: Called on the main thread with each accepted new
+                          value; raising ValueError rejects the value
+        :type on_change:  Callable[[TunableValue], None]
+        :returns: The tunable
+        :rtype: Tunable
+        """
+        # Registering a name again, e.g. when a subsystem is rebuilt in tests,
+        # replaces the earlier tunable
+        tunable = Tunable(self, name, default, default, minimum, maximum, on_change)
+        if name in self._saved:
+            try:
+                tunable.value = tunable.validate(self._saved[name])
+            except ValueError as error:
+                reportWarning(f"Ignoring saved tunable: {error}")
+        self._tunables[name] = tunable
+        tunable.publish()
+        return tunable
+
+    def bind(
+        self,
+        name: str,
+        owner: Any,
+        attribute: str,
+        minimum: Optional[float] = None,
+        maximum: Optional[float] = None,
+        on_change: Optional[Callable[[TunableValue], None]] = None,
+    ) -> Tunable:
+        """
+        Register a tunable that is stored in an attribute, so code that reads a
+        constant like self.ARM_DEPLOYED_ROTATIONS picks up tuned values as-is.
+        The current attribute value is the default; a saved value is written
+        to the attribute right away.
+
+        :param name:      Entry name under the Tuning table
+        :type name:       str
+        :param owner:     Object or class that holds the attribute
+        :type owner:      Any
+        :param attribute: Attribute name
+        :type attribute:  str
+        :param minimum:   Smallest accepted number, if any
+        :type minimum:    float
+        :param maximum:   Largest accepted number, if any
+        :type maximum:    float
+        :param on_change: Called after the attribute is updated; raising
+                          ValueError restores the previous value
+        :type on_change:  Callable[[TunableValue], None]
+        :returns: The tunable
+        :rtype: Tunable
+        """
+        tunable = self.add(name, getattr(owner, attribute), minimum, maximum, on_change)
+        tunable._owner = owner
+        tunable._attribute = attribute
+        tunable._store(tunable.value)
+        return tunable
+
+    def get(self, name: str) -> Tunable:
+        """The tunable registered under a name"""
+        return self._tunables[name]
+
+    def mark_changed(self):
+        """Note that a value changed, so the next save() writes the file"""
+        self._changed = True
+
+    def update(self):
+        """Apply every change made on the dashboard since the last call"""
+        for event in self._poller.readQueue():
+            name = event.data.topic.getName()[len(self._prefix) :]
+            tunable = self._tunables.get(name)
+            if tunable is None:
+                continue
+            value: Value = event.data.value
+            try:
+                tunable.set(value.value())
+            except ValueError as error:
+                reportWarning(f"Rejected tunable: {error}")
+                tunable.publish()
+
+    def save(self) -> bool:
+        """
+        Write the current values to the file if any changed since the last
+        save. Writing to flash can stall, so call it while disabled.
+
+        :returns: Whether the file was written
+        :rtype: bool
+        """
+        if not self._changed:
+            return False
+        # Keep saved values of tunables that are not registered in this build
+        values = dict(self._saved)
+        values.update({name: t.value for name, t in self._tunables.items()})
+        temporary = self.path + ".tmp"
+        try:
+            with open(temporary, "w") as file:
+                json.dump(values, file, indent=2, sort_keys=True)
+            os.replace(temporary, self.path)
+        except OSError as error:
+            reportWarning(f"Could not save tunables to {self.path}: {error}")
+            return False
+        self._saved = values
+        self._changed = False
+        return True
@@ -2,6 +2,8 @@ from typing import TYPE_CHECKING, overload
 from phoenix6 import CANBus, configs, hardware, signals, swerve, units
 from wpimath.units import inchesToMeters
 
+from .drivetrain_profile import DrivetrainProfile, select_drivetrain_profile
+
 if TYPE_CHECKING:
     from subsystems.drivetrain import Drivetrain
 
@@ -226,15 +228,28 @@ class TunerConstants:
     )
 
     @classmethod
-    def create_drivetrain(cls) -> "Drivetrain":
+    def create_drivetrain(
+        cls, profile: DrivetrainProfile | None = None
+    ) -> "Drivetrain":
         """
         Creates a CommandSwerveDrivetrain instance.
         This should only be called once in your robot program.
+
+        :param profile: Odometry rate and estimator std devs to use; selected
+                        for the current robot if not given
+        :type profile:  DrivetrainProfile | None
         """
         from subsystems.drivetrain import Drivetrain
 
-        return Drivetrain(
+        if profile is None:
+            profile = select_drivetrain_profile()
+        profile = profile.validated(cls.canbus.is_network_fd())
+
+        # The std dev overload of the Python constructor rejects tuples, so the
+        # std devs are applied after construction instead
+        drivetrain = Drivetrain(
             cls.drivetrain_constants,
+            profile.odometry_frequency,
             [
                 cls.front_left,
                 cls.front_right,
@@ -242,6 +257,10 @@ class TunerConstants:
                 cls.back_right,
             ],
         )
+        drivetrain.set_state_std_devs(profile.odometry_std_devs)
+        drivetrain.set_vision_measurement_std_devs(profile.vision_std_devs)
+        drivetrain.set_profile(profile)
+        return drivetrain
 
 
 class TunerSwerveDrivetrain(